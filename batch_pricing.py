@@ -0,0 +1,214 @@
+# batch_pricing.py
+# Command-line batch pricing: loads the rate card once, prices many scenario files across
+# a process pool with the headless engine and streams one results row per scenario.
+#
+#   python batch_pricing.py scenarios/ "more/*.json" -o results.parquet --workers 8
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import engine
+import rate_card as rc
+
+try:
+    import yaml
+except ImportError:  # YAML scenarios are optional
+    yaml = None
+
+SCENARIO_EXTENSIONS = ('.json', '.yaml', '.yml', '.csv')
+
+RESULT_COLUMNS = [
+    'scenario', 'path', 'status', 'error', 'jobs', 'unknown_instances',
+    'databricks_dbx_cost', 'databricks_ec2_cost', 'databricks_dbus', 'databricks_total_cost',
+    's3_cost', 's3_projected_cost_12_months', 'sql_cost', 'sql_dbus', 'dev_cost', 'total_cost',
+]
+TEXT_COLUMNS = {'scenario', 'path', 'status', 'error'}
+COUNT_COLUMNS = {'jobs', 'unknown_instances'}
+
+# Rate card of the current worker process, set once by _init_worker
+_RATE_CARD = None
+
+
+def find_scenario_files(inputs):
+    """Expands directories and glob patterns into a sorted list of scenario files."""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.update(os.path.join(root, f) for f in files if f.lower().endswith(SCENARIO_EXTENSIONS))
+        else:
+            paths.update(p for p in glob.glob(item, recursive=True) if p.lower().endswith(SCENARIO_EXTENSIONS))
+    return sorted(paths)
+
+
+def load_scenario_file(path):
+    """
+    Reads one scenario file into an engine.Scenario.
+    JSON/YAML files hold the session state shape (dbx_jobs, s3_calc_method, s3_direct,
+    s3_table_based, sql_warehouses, dev_costs). CSV files hold jobs only, with a 'Tier' column.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        jobs = pd.read_csv(path)
+        if 'Tier' not in jobs.columns:
+            raise ValueError("CSV scenarios need a 'Tier' column")
+        mapping = {
+            'dbx_jobs': {
+                tier: group.drop(columns='Tier').reset_index(drop=True)
+                for tier, group in jobs.groupby('Tier', sort=False)
+            }
+        }
+    elif extension in ('.yaml', '.yml'):
+        if yaml is None:
+            raise ValueError("PyYAML is not installed, cannot read YAML scenarios")
+        with open(path) as f:
+            mapping = yaml.safe_load(f) or {}
+    else:
+        with open(path) as f:
+            mapping = json.load(f)
+
+    if not isinstance(mapping, dict):
+        raise ValueError("Scenario file must contain a mapping")
+    return engine.Scenario.from_mapping(mapping)
+
+
+def summarize_result(result):
+    """Flattens a ScenarioResult into one results row."""
+    return {
+        'jobs': sum(len(t.df) for t in result.tiers.values()),
+        'unknown_instances': sum(len(t.unknown_instances) for t in result.tiers.values()),
+        'databricks_dbx_cost': float(sum(t.dbx_cost for t in result.tiers.values())),
+        'databricks_ec2_cost': float(sum(t.ec2_cost for t in result.tiers.values())),
+        'databricks_dbus': float(sum(t.dbus for t in result.tiers.values())),
+        'databricks_total_cost': float(result.databricks_total_cost),
+        's3_cost': float(result.s3.total_cost),
+        's3_projected_cost_12_months': float(result.s3.projected_cost_12_months),
+        'sql_cost': float(result.sql.total_cost),
+        'sql_dbus': float(result.sql.total_dbus),
+        'dev_cost': float(result.dev.total_cost),
+        'total_cost': float(result.total_cost),
+    }
+
+
+def _init_worker(rate_card):
+    global _RATE_CARD
+    _RATE_CARD = rate_card
+
+
+def price_file(path):
+    """Prices one scenario file with the worker's rate card. Errors are reported, not raised."""
+    row = dict.fromkeys(RESULT_COLUMNS)
+    row.update(scenario=os.path.splitext(os.path.basename(path))[0], path=path)
+    try:
+        scenario = load_scenario_file(path)
+        row.update(summarize_result(engine.price_scenario(scenario, _RATE_CARD)))
+        row.update(status='ok', error='')
+    except Exception as e:
+        row.update(status='error', error=f"{type(e).__name__}: {e}")
+    return row
+
+
+class ResultWriter:
+    """Streams result rows to CSV or Parquet (chosen by the output extension) in batches."""
+
+    def __init__(self, path, batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        self.format = 'parquet' if path.lower().endswith('.parquet') else 'csv'
+        self._rows = []
+        self._file = None
+        self._writer = None
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        if self.format == 'csv':
+            if self._writer is None:
+                self._file = open(self.path, 'w', newline='')
+                self._writer = csv.DictWriter(self._file, fieldnames=RESULT_COLUMNS)
+                self._writer.writeheader()
+            self._writer.writerows(self._rows)
+            self._file.flush()
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            schema = pa.schema([
+                (col, pa.string() if col in TEXT_COLUMNS else pa.int64() if col in COUNT_COLUMNS else pa.float64())
+                for col in RESULT_COLUMNS
+            ])
+            table = pa.Table.from_pandas(pd.DataFrame(self._rows, columns=RESULT_COLUMNS), schema=schema, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, schema)
+            self._writer.write_table(table)
+        self._rows = []
+
+    def close(self):
+        self.flush()
+        if self.format == 'csv':
+            if self._file is not None:
+                self._file.close()
+        elif self._writer is not None:
+            self._writer.close()
+
+
+def run_batch(paths, output, workers=None, chunksize=16, rate_card=None):
+    """
+    Prices every scenario file and streams the results to `output`.
+    Returns (priced, errors, elapsed_seconds).
+    """
+    if rate_card is None:
+        rate_card = rc.load_rate_card()
+
+    writer = ResultWriter(output)
+    priced = errors = 0
+    start = time.perf_counter()
+    try:
+        if workers == 1:
+            _init_worker(rate_card)
+            for row in map(price_file, paths):
+                writer.write(row)
+                priced += 1
+                errors += row['status'] != 'ok'
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rate_card,)) as pool:
+                for row in pool.map(price_file, paths, chunksize=chunksize):
+                    writer.write(row)
+                    priced += 1
+                    errors += row['status'] != 'ok'
+    finally:
+        writer.close()
+    return priced, errors, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Price scenario files in parallel with the DBU cost engine.")
+    parser.add_argument('inputs', nargs='+', help="Scenario files, directories or glob patterns (JSON, YAML or CSV).")
+    parser.add_argument('-o', '--output', default='batch_results.csv', help="Results file, .csv or .parquet.")
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help="Worker processes (1 runs in-process).")
+    parser.add_argument('--chunksize', type=int, default=16, help="Scenario files handed to a worker at a time.")
+    args = parser.parse_args(argv)
+
+    paths = find_scenario_files(args.inputs)
+    if not paths:
+        parser.error("no scenario files found")
+
+    priced, errors, elapsed = run_batch(paths, args.output, workers=args.workers, chunksize=args.chunksize)
+    rate = priced / elapsed if elapsed > 0 else float('inf')
+    print(f"Priced {priced} scenarios in {elapsed:.2f}s ({rate:,.1f} scenarios/s), {errors} failed -> {args.output}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+# benchmark.py
+# Benchmarks the calculation and export paths on synthetic scenarios of increasing size and
+# writes the timings and peak memory to a JSON file. With --compare, results are checked
+# against a stored baseline and regressions are reported (exit code 1).
+#
+#   python benchmark.py -o bench.json
+#   python benchmark.py --scales small medium --compare bench.json
+import argparse
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import calculations
+import engine
+import file_exportor
+import rate_card as rc
+import rate_card_cache
+import state as s
+
+# jobs per tier, S3 tables per zone, SQL warehouses, development clusters
+SCALES = {
+    'small': {'jobs': 10, 'tables': 10, 'warehouses': 1, 'dev': 10},
+    'medium': {'jobs': 1_000, 'tables': 1_000, 'warehouses': 50, 'dev': 100},
+    'large': {'jobs': 10_000, 'tables': 10_000, 'warehouses': 200, 'dev': 1_000},
+    'xlarge': {'jobs': 100_000, 'tables': 50_000, 'warehouses': 500, 'dev': 10_000},
+}
+DEFAULT_REPEAT = 3
+# A benchmark regresses when its median is this much slower than the baseline...
+DEFAULT_THRESHOLD = 0.20
+# ...and by at least this many seconds, so sub-millisecond noise is not flagged
+MIN_REGRESSION_SECONDS = 0.002
+S3_ZONES = ["Source System Table", "L0 / Raw", "L1 / Curated", "L2 / Data Product"]
+
+
+def synthetic_jobs(global_data, tier, count, rng):
+    """A tier's jobs DataFrame with rate card instances valid for the tier's compute types."""
+    compute_types = global_data['COMPUTE_TYPES_L2'] if tier == "L2 / Data Product" else global_data['COMPUTE_TYPES_L0_L1']
+    compute_type = rng.choice(np.array(compute_types, dtype=object), count)
+    instance = np.empty(count, dtype=object)
+    for ct in compute_types:
+        mask = compute_type == ct
+        labels = np.array(list(global_data['INSTANCE_PRICES'].get(ct, {})), dtype=object)
+        instance[mask] = rng.choice(labels, mask.sum()) if len(labels) else None
+    return pd.DataFrame({
+        "Job Name": [f"{tier.replace('/', ' ')} Job {j + 1}" for j in range(count)],
+        "Runtime (hrs)": rng.uniform(0.1, 4, count).round(2),
+        "Runs/Month": rng.integers(1, 90, count),
+        "Compute type": compute_type,
+        "Instance Type": instance,
+        "Nodes": rng.integers(0, 16, count),
+        "Photon": rng.random(count) < 0.5,
+        "Spot": rng.random(count) < 0.3,
+    })
+
+
+def synthetic_scenario(global_data, scale, seed=0):
+    """Session-state shaped inputs (dbx_jobs, s3_*, sql_warehouses, dev_costs) for one scale."""
+    rng = np.random.default_rng(seed)
+    dbx_jobs = {tier: synthetic_jobs(global_data, tier, scale['jobs'], rng) for tier in s.TIERS}
+
+    s3_table_based = {
+        zone: [
+            {"Table Name": f"{zone} Table {t + 1}", "Records": int(records), "Columns": int(columns), "Table": 1}
+            for t, (records, columns) in enumerate(zip(
+                rng.integers(1_000, 10_000_000, scale['tables']), rng.integers(2, 200, scale['tables'])
+            ))
+        ]
+        for zone in S3_ZONES
+    }
+    s3_direct = {
+        zone: {"class": "Standard", "amount": float(rng.uniform(1, 500)), "unit": "TB", "monthly_growth_percent": 2.0}
+        for zone in S3_ZONES
+    }
+
+    types = global_data['SQL_WAREHOUSE_TYPES_FROM_DATA']
+    sql_warehouses = []
+    for w in range(scale['warehouses']):
+        warehouse_type = types[w % len(types)]
+        sizes = list(global_data['SQL_WAREHOUSE_SIZES_BY_TYPE'][warehouse_type])
+        sql_warehouses.append({
+            "id": f"warehouse_{w}", "name": f"Warehouse {w + 1}", "type": warehouse_type,
+            "size": sizes[w % len(sizes)], 'SQL_nodes': int(rng.integers(1, 4)),
+            "hours_per_day": int(rng.integers(1, 24)), "days_per_month": int(rng.integers(1, 31)),
+            "auto_suspend": True,
+        })
+
+    dev_labels = np.array(list(global_data['FLAT_INSTANCE_LIST_DEV']), dtype=object)
+    dev_costs = pd.DataFrame({
+        "Compute_type": "All-Purpose Compute",
+        "Driver type": rng.choice(dev_labels, scale['dev']),
+        "Worker Type": rng.choice(dev_labels, scale['dev']),
+        "Nodes": rng.integers(1, 8, scale['dev']),
+        "hr_per_month": rng.integers(1, 160, scale['dev']),
+        "no_of_Month": rng.integers(1, 12, scale['dev']),
+        "DBX": 0.0,
+    })
+    return {
+        'dbx_jobs': dbx_jobs,
+        's3_calc_method': "Table-Based",
+        's3_direct': s3_direct,
+        's3_table_based': s3_table_based,
+        'sql_warehouses': sql_warehouses,
+        'dev_costs': dev_costs,
+    }
+
+
+def _measure(func, repeat):
+    """Wall times of `repeat` calls, then the traced peak memory of one more call."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return times, peak
+
+
+def _benchmarks(global_data, frames, scenario, export):
+    """(name, callable) pairs for one scale."""
+    job_rate_card = global_data['JOB_RATE_CARD']
+
+    def databricks_tiers():
+        # The rate card is passed so every call prices the tier instead of hitting the session memo
+        for jobs_df in scenario['dbx_jobs'].values():
+            calculations.calculate_databricks_costs_for_tier(jobs_df, job_rate_card)
+
+    benchmarks = [
+        ('populate_global_data', lambda: s.populate_global_data(*frames)),
+        ('calculate_databricks_costs_for_tier', databricks_tiers),
+        ('price_s3', lambda: engine.price_s3(
+            scenario['s3_calc_method'], scenario['s3_direct'], scenario['s3_table_based'], global_data
+        )),
+        ('price_sql_warehouses', lambda: engine.price_sql_warehouses(scenario['sql_warehouses'], global_data)),
+        ('price_dev_costs', lambda: engine.price_dev_costs(scenario['dev_costs'], global_data)),
+    ]
+    if export:
+        calculated_dbx_data = {
+            tier: {'df': calculations.calculate_databricks_costs_for_tier(jobs_df, job_rate_card)[0]}
+            for tier, jobs_df in scenario['dbx_jobs'].items()
+        }
+        export_args = (
+            calculated_dbx_data, scenario['s3_calc_method'], scenario['s3_direct'],
+            scenario['s3_table_based'], scenario['sql_warehouses'],
+        )
+        benchmarks.append((
+            'stream_consolidated_export',
+            lambda: file_exportor.stream_consolidated_export(*export_args, export_format='xlsx', global_data=global_data).close(),
+        ))
+    return benchmarks
+
+
+def run_benchmarks(scales, repeat=DEFAULT_REPEAT, export=True, seed=0, progress=None):
+    """Runs every benchmark at every scale. Returns the results document (see write_results)."""
+    frames = rc.split_rate_card(rate_card_cache.load_frame('rate_card'), rate_card_cache.load_frame('s3'))
+    global_data = s.populate_global_data(*frames)
+
+    results = []
+    for scale_name in scales:
+        scale = SCALES[scale_name]
+        scenario = synthetic_scenario(global_data, scale, seed)
+
+        for name, func in _benchmarks(global_data, frames, scenario, export):
+            times, peak = _measure(func, repeat)
+            result = {
+                'name': name,
+                'scale': scale_name,
+                'params': scale,
+                'repeat': repeat,
+                'min_s': min(times),
+                'median_s': statistics.median(times),
+                'peak_mb': peak / (1024 * 1024),
+            }
+            results.append(result)
+            if progress:
+                progress(result)
+
+    return {
+        'meta': {
+            'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'rate_card_version': global_data.get('RATE_CARD_VERSION'),
+        },
+        'results': results,
+    }
+
+
+def write_results(document, path):
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2, default=str)
+
+
+def compare(document, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Median time of each (benchmark, scale) against the baseline document.
+    Returns a DataFrame with the ratio and a 'regression' flag.
+    """
+    base = {(r['name'], r['scale']): r for r in baseline.get('results', [])}
+    rows = []
+    for result in document['results']:
+        previous = base.get((result['name'], result['scale']))
+        if previous is None:
+            continue
+        ratio = result['median_s'] / previous['median_s'] if previous['median_s'] > 0 else float('inf')
+        rows.append({
+            'name': result['name'],
+            'scale': result['scale'],
+            'baseline_s': previous['median_s'],
+            'median_s': result['median_s'],
+            'ratio': ratio,
+            'peak_mb': result['peak_mb'],
+            'baseline_peak_mb': previous.get('peak_mb'),
+            'regression': ratio > 1 + threshold and result['median_s'] - previous['median_s'] > MIN_REGRESSION_SECONDS,
+        })
+    return pd.DataFrame(rows, columns=[
+        'name', 'scale', 'baseline_s', 'median_s', 'ratio', 'peak_mb', 'baseline_peak_mb', 'regression',
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the calculation and export paths on synthetic scenarios.")
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=list(SCALES), help="Scenario sizes to run.")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="Timed runs per benchmark (the median is compared).")
+    parser.add_argument('--no-export', action='store_true', help="Skip the export benchmarks.")
+    parser.add_argument('-o', '--output', default='benchmark_results.json', help="Results file (JSON).")
+    parser.add_argument('--compare', metavar='BASELINE', help="Baseline results file to check for regressions.")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown, 0.2 = 20%%.")
+    args = parser.parse_args(argv)
+
+    # st.session_state works without a running app; silence the bare-mode warnings
+    logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').setLevel(logging.ERROR)
+
+    def progress(result):
+        print(f"{result['scale']:>7} {result['name']:<38} {result['median_s'] * 1000:10.2f} ms "
+              f"(min {result['min_s'] * 1000:.2f}) peak {result['peak_mb']:8.2f} MB")
+
+    document = run_benchmarks(args.scales, repeat=args.repeat, export=not args.no_export, progress=progress)
+    write_results(document, args.output)
+    print(f"Results -> {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        comparison = compare(document, baseline, args.threshold)
+        with pd.option_context('display.width', 200, 'display.max_columns', None):
+            print(comparison.to_string(index=False, float_format='{:,.4f}'.format))
+        regressions = comparison[comparison['regression']]
+        if not regressions.empty:
+            print(f"{len(regressions)} regression(s) over {args.threshold:.0%} against {args.compare}")
+            return 1
+        print(f"No regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
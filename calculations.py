@@ -1,178 +1,134 @@
 # calculations.py
+# Session-state adapters over the headless engine (engine.py).
 import streamlit as st
-import pandas as pd
-import state as s
-def calculate_databricks_costs_for_tier(jobs_df):
-    """Calculates the costs for a given list of job dictionaries."""
-    if jobs_df.empty:
-        cols = ["Job Name", "Runtime (hrs)", "Runs/Month", "Compute type", "Instance Type", "Nodes", "Photon","Spot", "DBU", "DBX", "EC2"]
-        return pd.DataFrame(columns=cols), 0, 0
-
-    df = jobs_df.copy()
-    
-    def get_rates(row):
-        instance_name = s.FLAT_INSTANCE_LIST.get(row['Instance Type'])
-        rate_card_row = s.FLAT_RATE_CARD.get(instance_name)
-        if rate_card_row is not None:
-            return rate_card_row.get('DBU/hour', 0), rate_card_row.get('Rate/hour', 0),rate_card_row.get('onDemandLinuxHr', 0)
-        return 0, 0
-
-    df[['dbu_per_hour', 'rate_per_hour', 'EC2_hr_rate']] = df.apply(lambda row: pd.Series(get_rates(row)), axis=1)
-    
-    # Calculate DBU units
-    df['DBU_Units'] = (df["Nodes"] + 1) * df["Runtime (hrs)"] * df["Runs/Month"]
-    
-    # Calculate costs
-    df['DBU'] = df['dbu_per_hour'] * (df["Nodes"] + 1) * df["Runtime (hrs)"] * df["Runs/Month"]
-    df['EC2'] = df['EC2_hr_rate'] * (df["Nodes"] + 1) 
-    df['DBX'] = df['rate_per_hour'] * (df["Nodes"] + 1) * df["Runtime (hrs)"] * df["Runs/Month"]
-    
-    total_dbx_cost = df['DBX'].sum()
-    total_ec2_cost = df['EC2'].sum()
-    total_dbus = df['DBU'].sum()
-    
-    # Clean up intermediate columns before returning
-    df = df.drop(columns=['dbu_per_hour', 'rate_per_hour', 'DBU_Units', 'EC2_hr_rate'], errors='ignore')
-
-    
-    return df, total_dbx_cost, total_ec2_cost,total_dbus 
-
-def calculate_s3_cost_per_zone():
+import tracing
+import engine
+from tier_cache import TierCostCache, frame_fingerprint
+from dependency_graph import DependencyGraph, update_scenario
+import simulation
+import rightsizing
+import job_schema
+
+# Per-session bound on memoized tier results (a few versions of each tier)
+TIER_CACHE_SIZE = 32
+
+
+def tier_cost_cache():
+    """Returns this session's memo of per-tier results (bounded LRU with hit/miss counters)."""
+    if 'tier_cost_cache' not in st.session_state:
+        st.session_state.tier_cost_cache = TierCostCache(max_entries=TIER_CACHE_SIZE)
+    return st.session_state.tier_cost_cache
+
+def scenario_graph():
+    """Returns this session's dependency graph of cost nodes (see dependency_graph.py)."""
+    if 'scenario_graph' not in st.session_state:
+        st.session_state.scenario_graph = DependencyGraph()
+    return st.session_state.scenario_graph
+
+@tracing.traced
+def price_session_scenario(active_tiers, months, growth_percents, changed=None):
     """
-    Calculates S3 cost for each individual zone, the total current cost,
-    and the total 12-month projected cost.
+    Prices the session's scenario and its N-month projection, recomputing only the cost
+    nodes whose inputs changed since the last rerun. Returns (ScenarioResult, Projection).
+    `changed` limits the inputs checked for changes (see update_scenario).
+    The arguments and the result are kept for session_scenario.
     """
-    current_costs_per_zone = {}
-    projected_costs_per_zone = {} # Keep this for S3 tab display if needed, or remove if not displayed individually
-    total_s3_cost = 0
-    total_projected_s3_cost_12_months = 0
-
-    # Get the S3 pricing data from the global state
-    global_data = st.session_state.get('global_data', {})
-    S3_PRICING = global_data.get('S3_PRICING', {})
-    DEFAULT_KB_PER_RECORD_PER_COLUMN = 1.0
-
-    if st.session_state.s3_calc_method == "Direct Storage":
-        for zone, config in st.session_state.s3_direct.items():
-            pricing = S3_PRICING.get(config["class"], {"storage_gb": 0})
-
-            # Convert TB to GB for calculation
-            storage_gb = config["amount"] * 1024 if config["unit"] == "TB" else config["amount"]
-            
-            # Current monthly cost for the zone
-            storage_cost = storage_gb * pricing["storage_gb"]
-            
-            zone_current_cost = storage_cost 
-            current_costs_per_zone[zone] = zone_current_cost
-            total_s3_cost += zone_current_cost
-
-            # Calculate 12-month projected cost for this zone (per-zone S3 growth is kept)
-            monthly_growth_percent = config.get("monthly_growth_percent", 0.0)
-            # if monthly_growth_percent > 0:
-            #     growth_factor = 1 + (monthly_growth_percent / 100)
-            #     if growth_factor != 1:
-            #         zone_projected_cost = zone_current_cost * (growth_factor**12 - 1) / (growth_factor - 1)
-            #     else:
-            #         zone_projected_cost = zone_current_cost * 12
-            # else:
-            #     zone_projected_cost = zone_current_cost * 12
-
-            # projected_costs_per_zone[zone] = zone_projected_cost
-            # total_projected_s3_cost_12_months += zone_projected_cost
-
-            # Use geometric series formula for a factor > 1
-            if monthly_growth_percent > 0:
-                growth_factor = 1 + (monthly_growth_percent / 100)
-                
-                # Quarterly cost (3 months)
-                quarterly_projected_cost = zone_current_cost * ((growth_factor**3 - 1) / (growth_factor - 1))
-                
-                # Half-yearly cost (6 months)
-                half_yearly_projected_cost = zone_current_cost * ((growth_factor**6 - 1) / (growth_factor - 1))
-            else:
-                # If no growth, cost is just current cost * number of months
-                quarterly_projected_cost = zone_current_cost * 3
-                half_yearly_projected_cost = zone_current_cost * 6
-            
-            # Store the new costs in the configuration dictionary
-            config['quarterly_cost'] = quarterly_projected_cost
-            config['half_yearly_cost'] = half_yearly_projected_cost
-            
-    else: # Table-Based
-        standard_pricing = S3_PRICING.get("Standard", {"storage_gb": 0})
-        for zone, list_of_table_configs in st.session_state.s3_table_based.items():
-            zone_estimated_gb = 0
-            if isinstance(list_of_table_configs, list):            
-                for table_config in list_of_table_configs:
-                    if isinstance(table_config, dict):
-                        records = float(table_config.get("Records", 0) or 0)
-                        num_columns = float(table_config.get("Columns", 0) or 0)
-                        num_tables = float(table_config.get("Table", 0) or 0) # Retrieve the new 'Table' valu
-                        # Calculate estimated GB: (records * num_columns * DEFAULT_KB_PER_RECORD_PER_COLUMN) / (1024 * 1024)
-                        # Assuming DEFAULT_KB_PER_RECORD_PER_COLUMN is in KB
-                        estimated_gb_for_table = (records * num_columns * DEFAULT_KB_PER_RECORD_PER_COLUMN) / (1024 * 1024)
-                        zone_estimated_gb += estimated_gb_for_table * num_tables
-
-            zone_current_cost = zone_estimated_gb * standard_pricing["storage_gb"]
-            current_costs_per_zone[zone] = zone_current_cost
-            total_s3_cost += zone_current_cost
-            
-            total_projected_s3_cost_12_months += zone_current_cost * 12
-            projected_costs_per_zone[zone] = zone_current_cost * 12
-
-
-    return current_costs_per_zone, total_s3_cost, total_projected_s3_cost_12_months
-
-def calculate_sql_warehouse_cost():
-    """Calculates total SQL Warehouse cost and DBUs from session state."""
-    total_sql_cost = 0
-    total_dbus = 0  
-    
-    global_data = st.session_state.get('global_data', {})
-    sql_rates_by_type_and_instance = global_data.get('SQL_RATES_BY_TYPE_AND_INSTANCE', {})
-    sql_flat_instance_list = global_data.get('SQL_FLAT_INSTANCE_LIST', {})
-
-    for warehouse in st.session_state.sql_warehouses:
-        sql_nodes = warehouse.get("SQL_nodes", 1)
-        
-        if warehouse.get("hours_per_day", 0) > 0 and warehouse.get("days_per_month", 0) > 0 and sql_nodes > 0:
-            warehouse_type = warehouse.get("type")
-            size_string = warehouse.get("size")
-            
-            instance_name = sql_flat_instance_list.get(size_string)
-            rates = sql_rates_by_type_and_instance.get(warehouse_type, {}).get(instance_name, {})
-            
-            hourly_rate = rates.get('Rate/hour', 0)
-            dbt_per_hr = rates.get('DBU/hour', 0)
-            
-            cost = hourly_rate * warehouse.get("hours_per_day", 0) * warehouse.get("days_per_month", 0) * sql_nodes
-            dbus_used = dbt_per_hr * warehouse.get("hours_per_day", 0) * warehouse.get("days_per_month", 0) * sql_nodes
-            
-            total_sql_cost += cost
-            total_dbus += dbus_used
-            
-    return total_sql_cost, total_dbus
-
-def calculate_dev_costs():
-    """Calculates the total cost for the development tools tab."""
-    if 'dev_costs' not in st.session_state or st.session_state.dev_costs.empty:
-        return 0
-    
-    dev_df = st.session_state.dev_costs.copy()
+    result, projection = update_scenario(
+        scenario_graph(), st.session_state, st.session_state.global_data, active_tiers,
+        months, growth_percents, tier_cache=tier_cost_cache(), changed=changed,
+    )
+
+    # The S3 tab reads the per-zone projections from the zone configs
+    for zone, config in st.session_state.s3_direct.items():
+        if zone in result.s3.quarterly_cost_per_zone:
+            config['quarterly_cost'] = result.s3.quarterly_cost_per_zone[zone]
+            config['half_yearly_cost'] = result.s3.half_yearly_cost_per_zone[zone]
+
+    st.session_state.scenario_args = (list(active_tiers), months, dict(growth_percents))
+    st.session_state.scenario_priced = (result, projection)
+    st.session_state.scenario_changed = set()
+    return result, projection
+
+def mark_scenario_stale(*inputs):
+    """Marks the priced scenario out of date after an edit of `inputs` (graph input names, e.g. 'jobs/L0 / Raw')."""
+    st.session_state.setdefault('scenario_changed', set()).update(inputs)
+
+def session_scenario():
+    """
+    The session's (ScenarioResult, Projection) as of the last pricing. After an edit marked
+    it stale (e.g. during a fragment rerun, where main.py does not run), the scenario is
+    repriced with the last arguments, checking only the edited inputs.
+    """
+    changed = st.session_state.get('scenario_changed')
+    if changed or 'scenario_priced' not in st.session_state:
+        return price_session_scenario(*st.session_state.scenario_args, changed=changed)
+    return st.session_state.scenario_priced
+
+@tracing.traced
+def calculate_databricks_costs_for_tier(jobs_df, job_rate_card=None):
+    """
+    Calculates the costs for a tier's jobs DataFrame. See engine.price_databricks_tier.
+    Results are memoized per session, so repeated calls for an unchanged tier are free.
+    With a `job_rate_card` (a RateCard, e.g. global_data['JOB_RATE_CARD']) the tier is priced
+    against it directly, without the session or its memo.
+    """
+    if job_rate_card is not None:
+        return engine.price_databricks_tier(jobs_df, job_rate_card)
+
+    global_data = st.session_state.global_data
+    return tier_cost_cache().get_or_compute(
+        jobs_df, global_data.get('RATE_CARD_VERSION'),
+        lambda: engine.price_databricks_tier(jobs_df, global_data['JOB_RATE_CARD'])
+    )
+
+@tracing.traced
+def simulate_databricks_costs(active_tiers, samples=simulation.DEFAULT_SAMPLES):
+    """
+    Monte Carlo percentiles of the Databricks cost for the active tiers (see simulation.py).
+    The last result is kept in the session and reused while the jobs and rate card are unchanged.
+    """
+    dbx_jobs = st.session_state.dbx_jobs
+    fingerprints = tuple(frame_fingerprint(dbx_jobs[tier]) for tier in active_tiers if tier in dbx_jobs)
+    key = (tuple(active_tiers), fingerprints, st.session_state.global_data.get('RATE_CARD_VERSION'), samples)
+
+    cached = st.session_state.get('simulation_result')
+    if cached is not None and cached[0] == key and None not in fingerprints:
+        return cached[1]
+
+    result = simulation.simulate_costs(
+        dbx_jobs, st.session_state.global_data['JOB_RATE_CARD'], active_tiers=active_tiers, samples=samples
+    )
+    st.session_state.simulation_result = (key, result)
+    return result
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def rightsizing_index(rate_card_version, _rate_card):
+    """Candidate instances per compute type, built once per process and rate card version."""
+    return rightsizing.build_index(_rate_card)
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def tier_choices(rate_card_version, tier, _global_data):
+    """Compute types and valid instances of a tier, built once per process and rate card version."""
+    return job_schema.tier_choices(_global_data, tier)
+
+@tracing.traced
+def normalize_tier_jobs(tier, jobs_df):
+    """
+    Fills defaults and replaces invalid instances in a tier's jobs, in place (see job_schema.py).
+    Edits replace the session's frame, so a frame already normalized for this rate card is skipped.
+    """
+    global_data = st.session_state.global_data
+    version = global_data.get('RATE_CARD_VERSION')
+    normalized = st.session_state.setdefault('normalized_jobs', {})
+    if normalized.get(tier) == (id(jobs_df), version) and st.session_state.dbx_jobs.get(tier) is jobs_df:
+        return jobs_df
+    job_schema.normalize_jobs(jobs_df, tier, tier_choices(version, tier, global_data))
+    normalized[tier] = (id(jobs_df), version)
+    return jobs_df
+
+@tracing.traced
+def suggest_right_sizing(jobs_df):
+    """Cheapest instance and node count per job that keeps its vCPU and memory (see rightsizing.py)."""
     global_data = st.session_state.global_data
-    
-    def get_rate(instance_key):
-        instance_name = global_data['FLAT_INSTANCE_LIST_DEV'].get(instance_key)
-        rate_info = global_data['FLAT_RATE_CARD_DEV'].get(instance_name, {})
-        return rate_info.get('Rate/hour', 0.0)
-    
-    driver_rate = dev_df['Driver type'].apply(get_rate)
-    worker_rate = dev_df['Worker Type'].apply(get_rate)
-
-    D_cal= (driver_rate * dev_df['Nodes'] + 1) * dev_df['hr_per_month'] * dev_df['no_of_Month']
-    w_cal = (worker_rate * dev_df['Nodes'] + 1) * dev_df['hr_per_month'] * dev_df['no_of_Month']
-    dev_df['DBX'] = D_cal + w_cal
-    
-    # Update the session state with the calculated DBX values
-    st.session_state.dev_costs = dev_df
-    return 
\ No newline at end of file
+    index = rightsizing_index(global_data.get('RATE_CARD_VERSION'), global_data)
+    return rightsizing.suggest_instances(jobs_df, global_data, index)
@@ -0,0 +1,315 @@
+# catalog_importer.py
+# Table-based S3 sizing from a metastore / information_schema.columns export (one row per
+# table column, with the table's row count). The file is streamed in chunks; each column is
+# sized from its data type, and bytes, tables and records are summed per zone with
+# vectorized counts. Only the zone aggregates, a sample of tables and the reject counts are
+# kept, so memory does not grow with the catalog. Headless, like engine.py.
+import os
+import re
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from job_importer import CHUNK_ROWS, file_format_of, map_columns, read_chunks, read_columns
+
+# Parquet / Delta files are typically 3-4x smaller than the raw values
+DEFAULT_COMPRESSION_RATIO = 3.0
+SAMPLE_TABLES = 100
+REJECT_SAMPLE_ROWS = 100
+
+# Bytes per value of fixed-width types, before compression
+TYPE_BYTES = {
+    'boolean': 1, 'tinyint': 1, 'byte': 1, 'smallint': 2, 'short': 2, 'int': 4, 'integer': 4,
+    'bigint': 8, 'long': 8, 'float': 4, 'real': 4, 'double': 8, 'date': 4,
+    'timestamp': 8, 'timestamp_ntz': 8, 'timestamp_ltz': 8, 'interval': 16,
+}
+STRING_TYPES = ('string', 'varchar', 'char', 'text')
+COMPLEX_TYPES = ('array', 'map', 'struct', 'variant', 'object')
+DECIMAL_TYPES = ('decimal', 'dec', 'numeric')
+# Assumed average widths of variable-length values
+STRING_BYTES = 32
+BINARY_BYTES = 64
+COMPLEX_BYTES = 128
+
+ZONE_COLUMNS = ["Zone", "Tables", "Columns", "Records", "Raw GB", "Estimated GB"]
+SAMPLE_COLUMNS = ["Zone", "Table Name", "Records", "Columns", "Estimated GB"]
+REJECT_COLUMNS = ["Row", "Table Name", "Reason"]
+
+# Source column names recognised without an explicit mapping (compared lower-case)
+CATALOG_COLUMN_ALIASES = {
+    'table_catalog': "Catalog", 'catalog': "Catalog", 'catalog_name': "Catalog",
+    'table_schema': "Schema", 'schema': "Schema", 'schema_name': "Schema", 'database': "Schema", 'database_name': "Schema",
+    'table_name': "Table", 'table': "Table",
+    'data_type': "Data Type", 'full_data_type': "Data Type", 'column_type': "Data Type", 'type_name': "Data Type",
+    'num_rows': "Records", 'row_count': "Records", 'numrows': "Records", 'records': "Records", 'record_count': "Records",
+    'zone': "Zone",
+}
+_TYPE_PATTERN = re.compile(r'^\s*([a-z_]+)\s*(?:\(\s*(\d+))?')
+
+
+@dataclass(frozen=True)
+class ZoneRule:
+    """
+    How catalog tables are assigned to zones, applied in this order: the file's zone column
+    (values must be zone names), then the first regex in `patterns` that matches the
+    "catalog.schema.table" name ({pattern: zone}), then `default`. Rows left without a
+    zone are rejected.
+    """
+    column: str = "Zone"
+    patterns: dict = field(default_factory=dict)
+    default: str = None
+
+
+@dataclass(frozen=True)
+class CatalogImportResult:
+    zones: pd.DataFrame         # ZONE_COLUMNS, one row per zone with tables
+    sample: pd.DataFrame        # SAMPLE_COLUMNS, the first tables of the file
+    rejects: pd.DataFrame       # Reason -> Rows
+    reject_sample: pd.DataFrame  # REJECT_COLUMNS, the first rejected rows
+    unknown_types: tuple        # data types sized as strings
+    rows_read: int
+    compression_ratio: float
+    source_name: str = ""
+
+    @property
+    def tables_imported(self):
+        return int(self.zones["Tables"].sum())
+
+    @property
+    def rows_rejected(self):
+        return int(self.rejects["Rows"].sum())
+
+
+def data_type_bytes(data_type):
+    """Uncompressed bytes per value of a SQL / Spark data type ("bigint", "decimal(10,2)", ...), None when unknown."""
+    match = _TYPE_PATTERN.match(str(data_type).lower())
+    if match is None:
+        return None
+    name, size = match.group(1), match.group(2)
+    if name in TYPE_BYTES:
+        return TYPE_BYTES[name]
+    if name in DECIMAL_TYPES:
+        # Decimals are stored as 4, 8 or 16 byte integers depending on their precision
+        precision = int(size) if size else 10
+        return 4 if precision <= 9 else 8 if precision <= 18 else 16
+    if name in STRING_TYPES:
+        return min(int(size), STRING_BYTES) if size else STRING_BYTES
+    if name == 'binary':
+        return BINARY_BYTES
+    if name in COMPLEX_TYPES:
+        return COMPLEX_BYTES
+    return None
+
+
+def _column(chunk, name):
+    return chunk[name] if name in chunk.columns else pd.Series(None, index=chunk.index, dtype=object)
+
+
+def _text(values):
+    return values.astype(object).where(values.notna(), "").astype(str).to_numpy(dtype=object)
+
+
+class _Accumulator:
+    """Running per-zone totals, the sample and the reject counts over the chunks of one file."""
+
+    def __init__(self, zones):
+        self.zones = list(zones)
+        self.tables = np.zeros(len(self.zones), dtype=np.int64)
+        self.columns = np.zeros(len(self.zones), dtype=np.int64)
+        self.records = np.zeros(len(self.zones))
+        self.raw_bytes = np.zeros(len(self.zones))
+        self.type_bytes = {}
+        self.unknown_types = set()
+        self.reject_counts = {}
+        self.reject_sample = []
+        self.sample = {}            # table ordinal -> [zone, name, records, columns, raw bytes]
+        self.last_table = None      # (name parts, table values) of the last table, continued by the next chunk
+        self.rows_read = 0
+
+    def widths(self, data_types):
+        # A catalog has a few hundred distinct types, each is parsed once per file
+        codes, uniques = pd.factorize(data_types)
+        for data_type in uniques:
+            if data_type not in self.type_bytes:
+                width = data_type_bytes(data_type)
+                if width is None:
+                    self.unknown_types.add(str(data_type))
+                self.type_bytes[data_type] = STRING_BYTES if width is None else width
+        widths = np.array([self.type_bytes[t] for t in uniques] + [STRING_BYTES], dtype=float)
+        return widths[codes]
+
+    def _zone_codes(self, names, zones, rule):
+        zones = zones.where(zones.notna(), None).reset_index(drop=True)
+        names = pd.Series(names, dtype=object)
+        for pattern, zone in reversed(list(rule.patterns.items())):
+            # Reversed so that the first matching pattern is written last and wins
+            matched = names.str.contains(pattern, flags=re.IGNORECASE, regex=True, na=False)
+            zones = zones.where(zones.notna() | ~matched, zone)
+        if rule.default is not None:
+            zones = zones.fillna(rule.default)
+        return pd.Index(self.zones, dtype=object).get_indexer(zones)
+
+    def add(self, chunk, rule):
+        count = len(chunk)
+        if not count:
+            return
+        rows = np.arange(self.rows_read, self.rows_read + count)
+        self.rows_read += count
+        parts = [_text(_column(chunk, c)) for c in ("Catalog", "Schema", "Table")]
+
+        # Rows of a table are contiguous in a catalog export, a table starts where its name changes.
+        # Names, zones and row counts are resolved once per table and broadcast to its rows.
+        changed = np.zeros(count, dtype=bool)
+        for i, part in enumerate(parts):
+            previous = np.empty(count, dtype=object)
+            previous[0] = self.last_table[0][i] if self.last_table else None
+            previous[1:] = part[:-1]
+            changed |= part != previous
+        starts = np.flatnonzero(changed)
+        last_parts = tuple(part[-1] for part in parts)
+
+        catalog, schema, table = (part[starts] for part in parts)
+        names = np.array([name.lstrip(".") for name in catalog + "." + schema + "." + table], dtype=object)
+        zone_codes = self._zone_codes(names, _column(chunk, rule.column).astype(object).iloc[starts], rule)
+        records = pd.to_numeric(_column(chunk, "Records").iloc[starts], errors='coerce').to_numpy(dtype=float)
+        checks = [
+            (table == "", "Missing table name"),
+            (zone_codes < 0, "Unknown or missing zone"),
+            (np.isnan(records), "Missing row count"),
+            (records < 0, "Invalid row count"),
+        ]
+        reasons = np.select([failed for failed, _ in checks], [text for _, text in checks], default="")
+
+        # Ordinal of each accepted table in the file, -1 for rejected ones
+        new_tables = reasons == ""
+        ordinals = np.where(new_tables, self.tables.sum() + np.cumsum(new_tables) - 1, -1)
+        if not changed[0]:
+            # The first rows continue the last table of the previous chunk
+            carried = self.last_table[1]
+            names, zone_codes, records, reasons, ordinals = (
+                np.concatenate([[value], values])
+                for value, values in zip(carried, (names, zone_codes, records, reasons, ordinals))
+            )
+            new_tables = np.concatenate([[False], new_tables])
+        self.last_table = (last_parts, (names[-1], zone_codes[-1], records[-1], reasons[-1], ordinals[-1]))
+        table_of_row = np.cumsum(changed) - (1 if changed[0] else 0)
+
+        reason = reasons[table_of_row]
+        rejected = reason != ""
+        if rejected.any():
+            for text, rejected_rows in zip(*np.unique(reason[rejected], return_counts=True)):
+                self.reject_counts[text] = self.reject_counts.get(text, 0) + int(rejected_rows)
+            room = REJECT_SAMPLE_ROWS - len(self.reject_sample)
+            if room > 0:
+                positions = np.flatnonzero(rejected)[:room]
+                self.reject_sample.extend(zip(rows[positions] + 1, names[table_of_row[positions]], reason[positions]))
+
+        accepted = np.flatnonzero(~rejected)
+        if not len(accepted):
+            return
+        row_tables = table_of_row[accepted]
+        row_zones = zone_codes[row_tables]
+        raw_bytes = records[row_tables] * self.widths(_column(chunk, "Data Type").to_numpy(dtype=object)[accepted])
+
+        zone_count = len(self.zones)
+        self.tables += np.bincount(zone_codes[new_tables], minlength=zone_count)
+        self.records += np.bincount(zone_codes[new_tables], weights=records[new_tables], minlength=zone_count)
+        self.columns += np.bincount(row_zones, minlength=zone_count)
+        self.raw_bytes += np.bincount(row_zones, weights=raw_bytes, minlength=zone_count)
+
+        row_ordinals = ordinals[row_tables]
+        in_sample = np.flatnonzero(row_ordinals < SAMPLE_TABLES)
+        if not len(in_sample):
+            return
+        sample_tables, columns = np.unique(row_tables[in_sample], return_counts=True)
+        table_bytes = np.bincount(np.searchsorted(sample_tables, row_tables[in_sample]), weights=raw_bytes[in_sample])
+        for t, table_columns, table_raw_bytes in zip(sample_tables, columns, table_bytes):
+            entry = self.sample.setdefault(
+                int(ordinals[t]), [self.zones[zone_codes[t]], names[t], float(records[t]), 0, 0.0]
+            )
+            entry[3] += int(table_columns)
+            entry[4] += float(table_raw_bytes)
+
+    def result(self, compression_ratio, source_name):
+        gb = 1024 ** 3
+        zones = pd.DataFrame({
+            "Zone": self.zones,
+            "Tables": self.tables,
+            "Columns": self.columns,
+            "Records": self.records,
+            "Raw GB": self.raw_bytes / gb,
+            "Estimated GB": self.raw_bytes / gb / compression_ratio,
+        }, columns=ZONE_COLUMNS)
+        sample = pd.DataFrame(
+            [entry[:4] + [entry[4] / gb / compression_ratio] for _, entry in sorted(self.sample.items())],
+            columns=SAMPLE_COLUMNS,
+        )
+        rejects = pd.DataFrame(sorted(self.reject_counts.items()), columns=["Reason", "Rows"])
+        return CatalogImportResult(
+            zones=zones[zones["Tables"] > 0].reset_index(drop=True),
+            sample=sample,
+            rejects=rejects,
+            reject_sample=pd.DataFrame(self.reject_sample, columns=REJECT_COLUMNS),
+            unknown_types=tuple(sorted(self.unknown_types)),
+            rows_read=self.rows_read,
+            compression_ratio=compression_ratio,
+            source_name=source_name,
+        )
+
+
+def import_catalog(source, zones, rule=None, column_mapping=None, compression_ratio=DEFAULT_COMPRESSION_RATIO,
+                   file_format=None, chunk_rows=CHUNK_ROWS):
+    """
+    Sizes the tables of a catalog export (CSV, Parquet or JSON lines, a path or a file object)
+    and returns a CatalogImportResult with the totals of each of `zones` that has tables.
+    A table's size is records x the sum of its column widths / `compression_ratio`.
+    """
+    if compression_ratio <= 0:
+        raise ValueError("Compression ratio must be positive")
+    rule = rule or ZoneRule()
+    column_mapping = dict(column_mapping or {})
+    aliases = dict(CATALOG_COLUMN_ALIASES, **{rule.column.strip().lower(): rule.column})
+
+    # Exports have many more columns (comments, ordinal positions, ...), only parse the mapped ones
+    file_format = file_format or file_format_of(source)
+    wanted = [
+        column for column in read_columns(source, file_format)
+        if column_mapping.get(column) or aliases.get(str(column).strip().lower())
+    ]
+
+    accumulator = _Accumulator(zones)
+    for chunk in read_chunks(source, file_format, chunk_rows, columns=wanted):
+        accumulator.add(map_columns(chunk, column_mapping, aliases), rule)
+    source_name = os.path.basename(source) if isinstance(source, str) else getattr(source, 'name', '')
+    return accumulator.result(float(compression_ratio), source_name)
+
+
+def catalog_table_rows(result):
+    """
+    {zone: table config} rows for st.session_state.s3_table_based: one "average table" per
+    zone, with the number of tables and the estimated GB of one table (see engine.price_s3).
+    """
+    rows = {}
+    for zone in result.zones.to_dict(orient='records'):
+        tables = int(zone["Tables"])
+        rows[zone["Zone"]] = {
+            "Table Name": f"Catalog {result.source_name}".strip(),
+            "Records": int(round(zone["Records"] / tables)),
+            "Columns": int(round(zone["Columns"] / tables)),
+            "Table": tables,
+            "Estimated GB": zone["Estimated GB"] / tables,
+        }
+    return rows
+
+
+def merge_catalog_rows(s3_table_based, result, replace=False):
+    """New s3_table_based dict with each zone's catalog row appended (or replacing the zone's tables)."""
+    merged = dict(s3_table_based)
+    for zone, row in catalog_table_rows(result).items():
+        current = merged.get(zone)
+        if replace or not isinstance(current, list):
+            merged[zone] = [row]
+        else:
+            merged[zone] = current + [row]
+    return merged
@@ -1,5 +1,3 @@
-import streamlit as st
-import pandas as pd
 # data.py
 
     
@@ -0,0 +1,221 @@
+# dependency_graph.py
+# Incremental recomputation of a scenario. Session inputs (the rate card, each tier's jobs,
+# S3, SQL, dev and projection settings) are versioned by a content fingerprint, and every
+# cost is a node that is only recomputed when the version of one of its inputs changed:
+#
+#   rate card ─┬─ tier/<tier> (one per tier, with jobs/<tier>) ── databricks ─┐
+#              ├─ s3_cost (with s3) ──────────────────────────────────────────┤
+#              ├─ sql_cost (with sql_warehouses) ─────────────────────────────┼─ result ── projection
+#              └─ dev_cost (with dev_costs) ──────────────────────────────────┘
+#
+# Headless, like engine.py; calculations.scenario_graph keeps one graph per session.
+import hashlib
+import json
+
+import pandas as pd
+
+import engine
+from engine import FrozenDict, ScenarioResult, TierResult
+from projection import project_costs, scenario_lines
+from tier_cache import frame_fingerprint
+
+# Keys the app writes back into the S3 zone configs, not inputs
+S3_DERIVED_KEYS = {'quarterly_cost', 'half_yearly_cost'}
+# Calculated column of dev_costs (e.g. in scenario files), not an input
+DEV_DERIVED_COLUMNS = ['DBX']
+
+
+def slice_fingerprint(value):
+    """Content hash of an input slice (DataFrame, or JSON-like data). None when it cannot be hashed."""
+    if isinstance(value, pd.DataFrame):
+        return frame_fingerprint(value)
+    try:
+        encoded = json.dumps(value, sort_keys=True, default=str).encode()
+    except (TypeError, ValueError):
+        return None
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+class DependencyGraph:
+    """
+    Versioned inputs and cached nodes. set_input() bumps an input's version when its
+    fingerprint changes; get() recomputes a node only when an input version differs from
+    the ones it was computed with. Counters cover the last rerun and the graph's lifetime.
+    """
+
+    def __init__(self):
+        self._inputs = {}       # name -> [fingerprint, version, value]
+        self._nodes = {}        # name -> (input names, func)
+        self._computed = {}     # name -> (input versions, version, value)
+        self._evaluated = set()
+        self.recomputed = []
+        self.reused = 0
+        self.recomputed_total = 0
+        self.reused_total = 0
+
+    def begin_rerun(self):
+        self._evaluated = set()
+        self.recomputed = []
+        self.reused = 0
+
+    def set_input(self, name, value, fingerprint=None):
+        """Sets an input slice. `fingerprint` overrides the content hash (e.g. a rate card version)."""
+        fingerprint = slice_fingerprint(value) if fingerprint is None else fingerprint
+        entry = self._inputs.get(name)
+        if entry is None:
+            self._inputs[name] = [fingerprint, 1, value]
+        elif fingerprint is None or fingerprint != entry[0]:
+            # Unhashable values are always treated as changed
+            self._inputs[name] = [fingerprint, entry[1] + 1, value]
+        else:
+            entry[2] = value
+
+    def has_input(self, name):
+        return name in self._inputs
+
+    def define(self, name, inputs, func):
+        """Defines node `name` = func(*values of `inputs`). Redefining with other inputs drops its cache."""
+        inputs = tuple(inputs)
+        current = self._nodes.get(name)
+        if current is not None and current[0] != inputs:
+            self._computed.pop(name, None)
+        self._nodes[name] = (inputs, func)
+
+    def version(self, name):
+        if name in self._inputs:
+            return self._inputs[name][1]
+        self.get(name)
+        return self._computed[name][1]
+
+    def get(self, name):
+        if name in self._inputs:
+            return self._inputs[name][2]
+
+        inputs, func = self._nodes[name]
+        versions = tuple(self.version(i) for i in inputs)
+        cached = self._computed.get(name)
+        if cached is not None and cached[0] == versions:
+            if name not in self._evaluated:
+                self._evaluated.add(name)
+                self.reused += 1
+                self.reused_total += 1
+            return cached[2]
+
+        value = func(*(self.get(i) for i in inputs))
+        self._computed[name] = (versions, (cached[1] + 1) if cached else 1, value)
+        self._evaluated.add(name)
+        self.recomputed.append(name)
+        self.recomputed_total += 1
+        return value
+
+    def stats(self):
+        return {
+            'inputs': len(self._inputs),
+            'nodes': len(self._nodes),
+            'recomputed': len(self.recomputed),
+            'reused': self.reused,
+            'recomputed_nodes': list(self.recomputed),
+            'recomputed_total': self.recomputed_total,
+            'reused_total': self.reused_total,
+        }
+
+
+def _tier_node(tier, tier_cache):
+    def price_tier(rate_card, jobs):
+        jobs_df = jobs if isinstance(jobs, pd.DataFrame) else pd.DataFrame(list(jobs or []))
+        if jobs_df.empty:
+            return TierResult(df=pd.DataFrame(), dbx_cost=0, ec2_cost=0, dbus=0)
+        if tier_cache is not None:
+            df, dbx_cost, ec2_cost, dbus = tier_cache.get_or_compute(
+                jobs_df, rate_card.get('RATE_CARD_VERSION'),
+                lambda: engine.price_databricks_tier(jobs_df, rate_card['JOB_RATE_CARD'])
+            )
+        else:
+            df, dbx_cost, ec2_cost, dbus = engine.price_databricks_tier(jobs_df, rate_card['JOB_RATE_CARD'])
+        return TierResult(
+            df=df, dbx_cost=dbx_cost, ec2_cost=ec2_cost, dbus=dbus,
+            unknown_instances=tuple(df.attrs.get('unknown_instances', [])),
+        )
+    return price_tier
+
+
+def _result(databricks, s3, sql, dev):
+    tier_results, databricks_total_cost = databricks
+    return ScenarioResult(
+        tiers=tier_results,
+        s3=s3,
+        sql=sql,
+        dev=dev,
+        databricks_total_cost=databricks_total_cost,
+        total_cost=databricks_total_cost + s3.total_cost + sql.total_cost + dev.total_cost,
+    )
+
+
+def _projection(result, s3, settings):
+    s3_calc_method, s3_direct, _ = s3
+    months, growth_percents = settings
+    scenario = engine.Scenario(s3_calc_method=s3_calc_method, s3_direct=s3_direct)
+    return project_costs(scenario_lines(scenario, result, dict(growth_percents)), months)
+
+
+def update_scenario(graph, mapping, rate_card, active_tiers, months, growth_percents, tier_cache=None, changed=None):
+    """
+    Sets the inputs from `mapping` (st.session_state or a dict of the same shape) and
+    returns (ScenarioResult, Projection), recomputing only the nodes whose inputs changed.
+    The result equals engine.price_scenario plus projection.project_scenario.
+
+    `changed` names the inputs ('jobs/<tier>', 's3', 'sql_warehouses', 'dev_costs') the
+    caller knows were edited since the last call. The other inputs then keep their version
+    without being copied or hashed, so the cost of a call follows the size of the edit.
+    None checks every input.
+    """
+    graph.begin_rerun()
+    active_tiers = tuple(active_tiers)
+    dbx_jobs = mapping.get('dbx_jobs') or {}
+
+    def set_input(name, build):
+        if changed is not None and name not in changed and graph.has_input(name):
+            return
+        graph.set_input(name, build())
+
+    graph.set_input('rate_card', rate_card, fingerprint=rate_card.get('RATE_CARD_VERSION'))
+    for tier in active_tiers:
+        set_input(f"jobs/{tier}", lambda: dbx_jobs.get(tier))
+        graph.define(f"tier/{tier}", ('rate_card', f"jobs/{tier}"), _tier_node(tier, tier_cache))
+
+    def databricks(*tier_results):
+        results = FrozenDict(zip(active_tiers, tier_results))
+        return results, sum(r.dbx_cost + r.ec2_cost for r in results.values())
+    graph.define('databricks', [f"tier/{tier}" for tier in active_tiers], databricks)
+
+    # S3, SQL and dev inputs, frozen (and dev costs copied) the same way engine.Scenario does it
+    def s3():
+        inputs = engine.Scenario.from_mapping({
+            's3_calc_method': mapping.get('s3_calc_method'),
+            's3_direct': {
+                zone: {k: v for k, v in config.items() if k not in S3_DERIVED_KEYS}
+                for zone, config in (mapping.get('s3_direct') or {}).items()
+            },
+            's3_table_based': mapping.get('s3_table_based'),
+        })
+        return inputs.s3_calc_method, inputs.s3_direct, inputs.s3_table_based
+    set_input('s3', s3)
+    graph.define('s3_cost', ('s3', 'rate_card'), lambda s3, rate_card: engine.price_s3(*s3, rate_card))
+
+    set_input('sql_warehouses', lambda: engine.Scenario.from_mapping({'sql_warehouses': mapping.get('sql_warehouses')}).sql_warehouses)
+    graph.define('sql_cost', ('sql_warehouses', 'rate_card'), engine.price_sql_warehouses)
+
+    def dev_costs():
+        dev_costs = engine.Scenario.from_mapping({'dev_costs': mapping.get('dev_costs')}).dev_costs
+        if dev_costs is not None:
+            dev_costs = dev_costs.drop(columns=DEV_DERIVED_COLUMNS, errors='ignore')
+        return dev_costs
+    set_input('dev_costs', dev_costs)
+    graph.define('dev_cost', ('dev_costs', 'rate_card'), engine.price_dev_costs)
+
+    graph.define('result', ('databricks', 's3_cost', 'sql_cost', 'dev_cost'), _result)
+
+    graph.set_input('projection_settings', (int(months), tuple(sorted((growth_percents or {}).items()))))
+    graph.define('projection', ('result', 's3', 'projection_settings'), _projection)
+
+    return graph.get('result'), graph.get('projection')
@@ -0,0 +1,388 @@
+# engine.py
+# Headless cost engine: prices a Scenario against a loaded rate card (the dict built by
+# rate_card.build_global_data) without touching st.session_state, so it can be used
+# from the Streamlit app, scripts and worker processes alike.
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+import tracing
+from projection import cumulative_costs
+from data import DEFAULT_KB_PER_RECORD_PER_COLUMN
+
+DBX_JOB_COLUMNS = ["Job Name", "Runtime (hrs)", "Runs/Month", "Compute type", "Instance Type", "Nodes", "Photon", "Spot", "DBU", "DBX", "EC2"]
+# Warehouse config fields and the defaults of missing numbers
+SQL_WAREHOUSE_FIELDS = {"name": None, "type": None, "size": None, "SQL_nodes": 1, "hours_per_day": 0, "days_per_month": 0}
+SQL_WAREHOUSE_COLUMNS = list(SQL_WAREHOUSE_FIELDS) + [
+    "Instance", "DBUs per Hour", "Hourly Rate ($)", "Monthly DBUs", "Monthly Cost ($)",
+]
+DEV_COST_COLUMNS = ["Compute_type", "Driver type", "Worker Type", "Nodes", "hr_per_month", "no_of_Month", "DBX"]
+
+
+class FrozenDict(dict):
+    """Read-only dict for scenario inputs, so pricing code cannot mutate them."""
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Scenario inputs are read-only")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def _freeze(value):
+    """Recursively copies dicts/lists into FrozenDicts/tuples. DataFrames are copied."""
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, dict):
+        return FrozenDict((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _jobs_frame(jobs):
+    if isinstance(jobs, pd.DataFrame):
+        return jobs.copy()
+    return pd.DataFrame(list(jobs or []))
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """
+    Everything needed to price one estimate. The field names and shapes match
+    st.session_state (dbx_jobs, s3_calc_method, s3_direct, s3_table_based,
+    sql_warehouses, dev_costs).
+    """
+    dbx_jobs: FrozenDict = field(default_factory=FrozenDict)
+    s3_calc_method: str = "Direct Storage"
+    s3_direct: FrozenDict = field(default_factory=FrozenDict)
+    s3_table_based: FrozenDict = field(default_factory=FrozenDict)
+    sql_warehouses: tuple = ()
+    dev_costs: pd.DataFrame = None
+    # Tiers to price, None means every tier in dbx_jobs
+    active_tiers: tuple = None
+
+    @classmethod
+    def from_mapping(cls, mapping, active_tiers=None):
+        """
+        Builds a Scenario from st.session_state or any dict of the same shape
+        (e.g. a parsed scenario file). Job tables may be DataFrames or lists of records.
+        """
+        dbx_jobs = FrozenDict(
+            (tier, _jobs_frame(jobs)) for tier, jobs in (mapping.get('dbx_jobs') or {}).items()
+        )
+        dev_costs = mapping.get('dev_costs')
+        if dev_costs is not None and not isinstance(dev_costs, pd.DataFrame):
+            dev_costs = pd.DataFrame(list(dev_costs))
+        return cls(
+            dbx_jobs=dbx_jobs,
+            s3_calc_method=mapping.get('s3_calc_method') or "Direct Storage",
+            s3_direct=_freeze(dict(mapping.get('s3_direct') or {})),
+            s3_table_based=_freeze(dict(mapping.get('s3_table_based') or {})),
+            sql_warehouses=_freeze(list(mapping.get('sql_warehouses') or [])),
+            dev_costs=None if dev_costs is None else dev_costs.copy(),
+            active_tiers=None if active_tiers is None else tuple(active_tiers),
+        )
+
+
+@dataclass(frozen=True)
+class TierResult:
+    df: pd.DataFrame
+    dbx_cost: float
+    ec2_cost: float
+    dbus: float
+    unknown_instances: tuple = ()
+
+
+@dataclass(frozen=True)
+class S3Result:
+    costs_per_zone: FrozenDict
+    total_cost: float
+    projected_cost_12_months: float
+    quarterly_cost_per_zone: FrozenDict
+    half_yearly_cost_per_zone: FrozenDict
+
+
+@dataclass(frozen=True)
+class SqlResult:
+    total_cost: float
+    total_dbus: float
+    # One row per warehouse, in config order (SQL_WAREHOUSE_COLUMNS)
+    warehouses: pd.DataFrame = None
+
+
+@dataclass(frozen=True)
+class DevResult:
+    df: pd.DataFrame
+    total_cost: float
+
+
+@dataclass(frozen=True)
+class ScenarioResult:
+    tiers: FrozenDict
+    s3: S3Result
+    sql: SqlResult
+    dev: DevResult
+    databricks_total_cost: float
+    total_cost: float
+
+    def dbx_data(self):
+        """Per-tier results in the {"df", "dbu_cost", "ec2_cost"} shape used by the UI and the export."""
+        return {
+            tier: {"df": result.df, "dbu_cost": result.dbx_cost, "ec2_cost": result.ec2_cost}
+            for tier, result in self.tiers.items()
+        }
+
+
+@tracing.traced
+def price_databricks_tier(jobs_df, rate_card):
+    """
+    Calculates the costs for a tier's jobs DataFrame.
+    Rates are gathered from the job RateCard (by instance label) in one vectorized
+    lookup and all costs are computed column-wise. Instance labels that are not in the rate card
+    are priced at 0 and listed in `df.attrs['unknown_instances']`.
+    Returns (df, total_dbx_cost, total_ec2_cost, total_dbus).
+    """
+    if jobs_df.empty:
+        df = pd.DataFrame(columns=DBX_JOB_COLUMNS)
+        df.attrs['unknown_instances'] = []
+        return df, 0, 0, 0
+
+    df = jobs_df.copy()
+
+    # One lookup for the whole tier instead of a dict lookup per row
+    rows = rate_card.label_rows(df['Instance Type'].to_numpy())
+    known = rows >= 0
+
+    dbu_per_hour = rate_card.take('dbu_per_hour', rows)
+    rate_per_hour = rate_card.take('rate_per_hour', rows)
+    ec2_hr_rate = rate_card.take('ec2_per_hour', rows)
+
+    # Driver + workers
+    node_count = pd.to_numeric(df["Nodes"], errors='coerce').to_numpy(dtype=float) + 1
+    monthly_hours = (
+        pd.to_numeric(df["Runtime (hrs)"], errors='coerce').to_numpy(dtype=float)
+        * pd.to_numeric(df["Runs/Month"], errors='coerce').to_numpy(dtype=float)
+    )
+
+    # Calculate costs
+    df['DBU'] = dbu_per_hour * node_count * monthly_hours
+    df['EC2'] = ec2_hr_rate * node_count
+    df['DBX'] = rate_per_hour * node_count * monthly_hours
+
+    total_dbx_cost = df['DBX'].sum()
+    total_ec2_cost = df['EC2'].sum()
+    total_dbus = df['DBU'].sum()
+
+    df.attrs['unknown_instances'] = df.loc[~known, 'Instance Type'].drop_duplicates().tolist()
+
+    return df, total_dbx_cost, total_ec2_cost, total_dbus
+
+
+@tracing.traced
+def table_estimated_gb(table_config):
+    """GB of one table of an S3 table-based row: its catalog "Estimated GB", else Records x Columns."""
+    # Rows imported from a catalog carry their size (see catalog_importer.py)
+    estimated_gb = table_config.get("Estimated GB")
+    if estimated_gb is None or pd.isna(estimated_gb):
+        records = float(table_config.get("Records", 0) or 0)
+        num_columns = float(table_config.get("Columns", 0) or 0)
+        # Calculate estimated GB: (records * num_columns * KB per value) / (1024 * 1024)
+        estimated_gb = (records * num_columns * DEFAULT_KB_PER_RECORD_PER_COLUMN) / (1024 * 1024)
+    return float(estimated_gb)
+
+
+def price_s3(s3_calc_method, s3_direct, s3_table_based, rate_card):
+    """
+    Calculates S3 cost for each individual zone, the total current cost,
+    the total 12-month projected cost and the per-zone quarterly/half-yearly projections.
+    """
+    current_costs_per_zone = {}
+    quarterly_costs_per_zone = {}
+    half_yearly_costs_per_zone = {}
+    total_s3_cost = 0
+    total_projected_s3_cost_12_months = 0
+
+    S3_PRICING = rate_card.get('S3_PRICING', {})
+
+    if s3_calc_method == "Direct Storage":
+        for zone, config in s3_direct.items():
+            pricing = S3_PRICING.get(config["class"], {"storage_gb": 0})
+
+            # Convert TB to GB for calculation
+            storage_gb = config["amount"] * 1024 if config["unit"] == "TB" else config["amount"]
+
+            # Current monthly cost for the zone
+            zone_current_cost = storage_gb * pricing["storage_gb"]
+            current_costs_per_zone[zone] = zone_current_cost
+            total_s3_cost += zone_current_cost
+
+        # Quarterly (3 months) and half-yearly (6 months) cost of every zone, growing geometrically
+        zones = list(current_costs_per_zone)
+        growth = [max(s3_direct[zone].get("monthly_growth_percent", 0.0), 0.0) for zone in zones]
+        horizons = cumulative_costs([current_costs_per_zone[zone] for zone in zones], growth, (3, 6))
+        quarterly_costs_per_zone.update(zip(zones, horizons[3].tolist()))
+        half_yearly_costs_per_zone.update(zip(zones, horizons[6].tolist()))
+
+    else: # Table-Based
+        standard_pricing = S3_PRICING.get("Standard", {"storage_gb": 0})
+        for zone, list_of_table_configs in s3_table_based.items():
+            zone_estimated_gb = 0
+            if isinstance(list_of_table_configs, (list, tuple)):
+                for table_config in list_of_table_configs:
+                    if isinstance(table_config, dict):
+                        num_tables = float(table_config.get("Table", 0) or 0)
+                        zone_estimated_gb += table_estimated_gb(table_config) * num_tables
+
+            zone_current_cost = zone_estimated_gb * standard_pricing["storage_gb"]
+            current_costs_per_zone[zone] = zone_current_cost
+            total_s3_cost += zone_current_cost
+
+        # No growth input for table-based storage, the 12-month cost is flat
+        zone_costs = list(current_costs_per_zone.values())
+        total_projected_s3_cost_12_months = float(cumulative_costs(zone_costs, [0.0] * len(zone_costs), (12,))[12].sum())
+
+    return S3Result(
+        costs_per_zone=FrozenDict(current_costs_per_zone),
+        total_cost=total_s3_cost,
+        projected_cost_12_months=total_projected_s3_cost_12_months,
+        quarterly_cost_per_zone=FrozenDict(quarterly_costs_per_zone),
+        half_yearly_cost_per_zone=FrozenDict(half_yearly_costs_per_zone),
+    )
+
+
+def _warehouse_columns(sql_warehouses):
+    """Warehouse config fields as typed arrays; missing numbers get their SQL_WAREHOUSE_FIELDS default."""
+    columns = {}
+    for column, default in SQL_WAREHOUSE_FIELDS.items():
+        values = [w.get(column) for w in sql_warehouses]
+        if default is None:
+            columns[column] = np.array(values, dtype=object)
+            continue
+        values = [default if v is None else v for v in values]
+        array = np.asarray(values)
+        if array.dtype.kind not in 'biuf':
+            array = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').fillna(default).to_numpy()
+        columns[column] = array
+    return columns
+
+
+@tracing.traced
+def price_sql_warehouses(sql_warehouses, rate_card):
+    """
+    Prices warehouse configs in one pass over their columns: the (type, size label) pairs are
+    resolved to rate card rows together and the costs are array arithmetic. Warehouses
+    without hours, days or nodes cost nothing. Returns a SqlResult with the per-warehouse table.
+    """
+    columns = _warehouse_columns(list(sql_warehouses or []))
+    count = len(columns["size"])
+    sql_card = rate_card.get('SQL_RATE_CARD')
+    if sql_card is None:
+        rows = np.full(count, -1)
+        columns["Instance"] = np.full(count, None, dtype=object)
+    else:
+        label_ids = sql_card.label_ids(columns["size"])
+        rows = sql_card.label_pair_rows(label_ids, sql_card.compute_type_ids(columns["type"]))
+        columns["Instance"] = sql_card.label_instances(label_ids)
+
+    nodes, hours_per_day, days_per_month = columns["SQL_nodes"], columns["hours_per_day"], columns["days_per_month"]
+    active = (hours_per_day > 0) & (days_per_month > 0) & (nodes > 0)
+    usage_hours = np.where(active, hours_per_day * days_per_month * nodes, 0.0)
+
+    dbu_per_hour = sql_card.take('dbu_per_hour', rows) if sql_card is not None else np.zeros(count)
+    rate_per_hour = sql_card.take('rate_per_hour', rows) if sql_card is not None else np.zeros(count)
+    columns["DBUs per Hour"] = dbu_per_hour
+    columns["Hourly Rate ($)"] = rate_per_hour
+    columns["Monthly DBUs"] = dbu_per_hour * usage_hours
+    columns["Monthly Cost ($)"] = rate_per_hour * usage_hours
+
+    return SqlResult(
+        total_cost=float(columns["Monthly Cost ($)"].sum()),
+        total_dbus=float(columns["Monthly DBUs"].sum()),
+        warehouses=pd.DataFrame(columns, columns=SQL_WAREHOUSE_COLUMNS),
+    )
+
+
+def label_rates(card, *label_columns):
+    """
+    Hourly rates of several label columns of a rate card (e.g. driver and worker), 0 for
+    unknown labels. The columns are factorized together, so each distinct label is looked
+    up once and the rates are joined back by code.
+    """
+    labels = np.concatenate([np.asarray(column, dtype=object) for column in label_columns])
+    codes, uniques = pd.factorize(labels)
+    rates = np.append(card.take('rate_per_hour', card.label_rows(uniques)), 0.0)
+    # Missing labels have code -1, which picks the appended 0
+    return np.split(rates[codes], len(label_columns))
+
+
+def _dev_column(dev_df, column):
+    return pd.to_numeric(dev_df[column], errors='coerce').to_numpy(dtype=float)
+
+
+@tracing.traced
+def price_dev_costs(dev_df, rate_card):
+    """
+    Calculates the DBX cost of each development cluster. Returns a new DevResult, `dev_df`
+    is not modified; its DBX column, if any, is replaced.
+    """
+    if dev_df is None or dev_df.empty:
+        return DevResult(df=pd.DataFrame(columns=DEV_COST_COLUMNS), total_cost=0)
+
+    driver_rate, worker_rate = label_rates(rate_card['DEV_RATE_CARD'], dev_df['Driver type'], dev_df['Worker Type'])
+    nodes, hr_per_month, no_of_month = (_dev_column(dev_df, c) for c in ('Nodes', 'hr_per_month', 'no_of_Month'))
+
+    D_cal = (driver_rate * nodes + 1) * hr_per_month * no_of_month
+    w_cal = (worker_rate * nodes + 1) * hr_per_month * no_of_month
+    dbx = D_cal + w_cal
+
+    return DevResult(df=dev_df.assign(DBX=dbx), total_cost=float(np.nansum(dbx)))
+
+
+@tracing.traced
+def price_scenario(scenario, rate_card, tier_cache=None):
+    """
+    Prices every component of a Scenario and returns a ScenarioResult.
+    `tier_cache` (a tier_cache.TierCostCache) skips tiers whose jobs have not changed.
+    """
+    tiers = scenario.active_tiers if scenario.active_tiers is not None else tuple(scenario.dbx_jobs)
+
+    tier_results = {}
+    for tier in tiers:
+        jobs_df = scenario.dbx_jobs.get(tier)
+        if jobs_df is None or jobs_df.empty:
+            # If the tier is active but has no jobs, initialize it with empty costs
+            tier_results[tier] = TierResult(df=pd.DataFrame(), dbx_cost=0, ec2_cost=0, dbus=0)
+            continue
+        if tier_cache is not None:
+            df, dbx_cost, ec2_cost, dbus = tier_cache.get_or_compute(
+                jobs_df, rate_card.get('RATE_CARD_VERSION'),
+                lambda: price_databricks_tier(jobs_df, rate_card['JOB_RATE_CARD'])
+            )
+        else:
+            df, dbx_cost, ec2_cost, dbus = price_databricks_tier(jobs_df, rate_card['JOB_RATE_CARD'])
+        tier_results[tier] = TierResult(
+            df=df, dbx_cost=dbx_cost, ec2_cost=ec2_cost, dbus=dbus,
+            unknown_instances=tuple(df.attrs.get('unknown_instances', [])),
+        )
+
+    s3 = price_s3(scenario.s3_calc_method, scenario.s3_direct, scenario.s3_table_based, rate_card)
+    sql = price_sql_warehouses(scenario.sql_warehouses, rate_card)
+    dev = price_dev_costs(scenario.dev_costs, rate_card)
+
+    databricks_total_cost = sum(r.dbx_cost + r.ec2_cost for r in tier_results.values())
+    total_cost = databricks_total_cost + s3.total_cost + sql.total_cost + dev.total_cost
+
+    return ScenarioResult(
+        tiers=FrozenDict(tier_results),
+        s3=s3,
+        sql=sql,
+        dev=dev,
+        databricks_total_cost=databricks_total_cost,
+        total_cost=total_cost,
+    )
@@ -1,178 +1,259 @@
+import hashlib
 import io
+import json
+import shutil
+import tempfile
+import threading
+import zipfile
 import pandas as pd
 import xlsxwriter
 import streamlit as st
+import engine
+import tracing
+from projection import PROJECTION_EXPORT_COLUMNS
+from tier_cache import frame_fingerprint
 
+# Number of built exports kept per session (see get_cached_export)
+EXPORT_CACHE_SIZE = 4
+_export_cache_lock = threading.Lock()
 
-def generate_consolidated_excel_export(calculated_dbx_data, s3_calc_method, s3_direct_config, s3_table_based_config, sql_warehouses_config):
+# Streaming export settings
+STREAM_CHUNK_ROWS = 10_000
+SPOOL_MAX_BYTES = 8 * 1024 * 1024  # Exports larger than this spill from memory to a temp file
+EXPORT_FORMATS = {
+    'xlsx': ("cloud_cost_report.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    'csv': ("cloud_cost_report_csv.zip", "application/zip"),
+    'parquet': ("cloud_cost_report_parquet.zip", "application/zip"),
+}
+
+# Layout of the Databricks_Jobs sheet
+DBX_EXPORT_RENAME = {
+    'Job Name': 'Name',
+    'Runtime (hrs)': 'Runtime Hours',
+    'Runs/Month': 'Runs per Month',
+    'Compute type': 'Compute Type',
+    'Instance Type': 'Instance',
+    'Nodes': 'worker_Nodes',
+    'Photon': 'Photon Enabled',
+    'Spot': 'Spot Instance',
+    'DBU': 'Calculated DBU',
+    'DBX': 'Calculated DBX Cost ($)',
+    'EC2': 'Calculated EC2 Cost ($)'
+}
+DBX_EXPORT_COLUMNS = [
+    'Tier', 'Name', 'Runtime Hours', 'Runs per Month', 'Compute Type',
+    'Instance', 'worker_Nodes', 'Photon Enabled', 'Spot Instance',
+    'Calculated DBU', 'Calculated DBX Cost ($)', 'Calculated EC2 Cost ($)'
+]
+DBX_TEXT_COLUMNS = {'Tier', 'Name', 'Compute Type', 'Instance'}
+DBX_BOOL_COLUMNS = {'Photon Enabled', 'Spot Instance'}
+S3_DIRECT_EXPORT_COLUMNS = ["Zone", "Storage Class", "Storage Amount", "Unit", "Monthly Growth %"]
+S3_TABLE_EXPORT_COLUMNS = ["Zone", "Table Name", "Records", "Columns", "Table", "Estimated GB"]
+SQL_EXPORT_COLUMNS = [
+    "Name", "Type", "Size", "DBUs per Hour", "Hourly Rate ($)", "Nodes",
+    "Hours per Day", "Days per Month", "Monthly Cost ($)"
+]
+
+
+def scenario_fingerprint(calculated_dbx_data, s3_calc_method, s3_direct_config, s3_table_based_config, sql_warehouses_config, rate_card_version=None, projection=None):
+    """Content hash of everything that goes into the export, used to key cached workbooks."""
+    digest = hashlib.blake2b(digest_size=16)
+    for tier, data in calculated_dbx_data.items():
+        digest.update(str(tier).encode())
+        digest.update(str(frame_fingerprint(data['df'])).encode())
+    if projection is not None:
+        digest.update(str(frame_fingerprint(projection.monthly.reset_index())).encode())
+    digest.update(json.dumps(
+        [s3_calc_method, s3_direct_config, s3_table_based_config, sql_warehouses_config, rate_card_version],
+        sort_keys=True, default=str
+    ).encode())
+    return digest.hexdigest()
+
+
+def get_cached_export(export_cache, fingerprint, export_format, *export_args, **export_kwargs):
     """
-    Generates a consolidated Excel file with multiple sheets for different cost categories.
+    Returns the export bytes for (`fingerprint`, `export_format`) from `export_cache`
+    (an OrderedDict), building it with stream_consolidated_export on a miss.
+    The cache holds the spooled files, so large exports live on disk rather than in the session.
     """
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-
-        # 1. Databricks Jobs Sheet (All Tiers Combined)
-        all_dbx_dfs = []
-        for tier, data in calculated_dbx_data.items():
-            df_to_export = data['df'].copy()
-
-            # Add a 'Tier' column to identify the original tier for each job
-            # if 'Spot' not in df_to_export.columns:
-            #     df_to_export['Spot'] = False
-            df_to_export['Tier'] = tier
-
-            all_dbx_dfs.append(df_to_export)
-
-        if all_dbx_dfs:
-            combined_dbx_df = pd.concat(all_dbx_dfs, ignore_index=True)
-
-            # Rename columns for clarity in Excel
-            combined_dbx_df = combined_dbx_df.rename(columns={
-                'Job Name': 'Name',
-                #'Job_Number': 'Job No',
-                'Runtime (hrs)': 'Runtime Hours',
-                'Runs/Month': 'Runs per Month',
-                'Compute type': 'Compute Type',
-                'Instance Type': 'Instance',
-                'Nodes': 'worker_Nodes',
-                'Photon': 'Photon Enabled',
-                'Spot': 'Spot Instance',
-                'DBU': 'Calculated DBU', # Assuming DBU is DBU cost
-                #'EC2': 'Calculated EC2 Cost ($)',
-                'DBX': 'Calculated DBX Cost ($)',
-                'EC2': 'Calculated EC2 Cost ($)'
-            })
-
-            # Define the final order of columns for export.
-            # Only include columns that are actually present in your DataFrame.
-            ordered_cols_dbx = [
-                'Tier', 'Name', 'Runtime Hours', 'Runs per Month', 'Compute Type',
-                'Instance', 'worker_Nodes', 'Photon Enabled', 'Spot Instance',
-                'Calculated DBU', 'Calculated DBX Cost ($)', 'Calculated EC2 Cost ($)'
-            ]
-
-            # Reorder the DataFrame, dropping any columns not in the final list.
-            combined_dbx_df = combined_dbx_df[ordered_cols_dbx]
-
-                        # This prevents the KeyError.
-            present_cols = [col for col in ordered_cols_dbx if col in combined_dbx_df.columns]
-            combined_dbx_df = combined_dbx_df[present_cols]
-
-            combined_dbx_df.to_excel(writer, sheet_name="Databricks_Jobs", index=False)
-        else:
-            # Create an empty DataFrame with expected columns if no data
-            empty_dbx_df = pd.DataFrame(columns=[
-                'Tier', 'Name', 'Runtime Hours', 'Runs per Month', 'Compute Type',
-                'Instance', 'worker_Nodes', 'Photon Enabled', 'Spot Instance',
-                'Calculated DBU', 'Calculated DBX Cost ($)', 'Calculated EC2 Cost ($)'
-            ])
-            empty_dbx_df.to_excel(writer, sheet_name="Databricks_Jobs", index=False)
-
-
-        # 2. S3 Storage Sheets (based on active method)
-        if s3_calc_method == "Direct Storage":
-            direct_data = []
-            for zone, config in s3_direct_config.items():
-                direct_data.append({
+    key = (fingerprint, export_format)
+    with _export_cache_lock:
+        spooled = export_cache.get(key)
+        if spooled is not None:
+            export_cache.move_to_end(key)
+            spooled.seek(0)
+            return spooled.read()
+
+    spooled = stream_consolidated_export(*export_args, export_format=export_format, **export_kwargs)
+
+    with _export_cache_lock:
+        export_cache[key] = spooled
+        while len(export_cache) > EXPORT_CACHE_SIZE:
+            _, evicted = export_cache.popitem(last=False)
+            evicted.close()
+        spooled.seek(0)
+        return spooled.read()
+
+
+def s3_direct_rows(s3_direct_config):
+    """Rows of the S3_Direct_Storage sheet."""
+    direct_data = []
+    for zone, config in s3_direct_config.items():
+        direct_data.append({
+            "Zone": zone,
+            "Storage Class": config["class"],
+            "Storage Amount": config["amount"],
+            "Unit": config["unit"],
+            "Monthly Growth %": config["monthly_growth_percent"]
+        })
+    return direct_data
+
+
+def s3_table_rows(s3_table_based_config):
+    """Rows of the S3_Table_Based_Storage sheet."""
+    consolidated_table_data_for_export = []
+    for zone, list_of_table_configs in s3_table_based_config.items():
+        if not isinstance(list_of_table_configs, (list, tuple)):
+            list_of_table_configs = [list_of_table_configs] if isinstance(list_of_table_configs, dict) else []
+
+        for table_config in list_of_table_configs:
+            if isinstance(table_config, dict):
+                row = {
                     "Zone": zone,
-                    "Storage Class": config["class"],
-                    "Storage Amount": config["amount"],
-                    "Unit": config["unit"],
-                    "Monthly Growth %": config["monthly_growth_percent"]
-                })
-            if direct_data:
-                df_direct = pd.DataFrame(direct_data)
-                df_direct.to_excel(writer, sheet_name='S3_Direct_Storage', index=False)
-            else:
-                empty_s3_direct_df = pd.DataFrame(columns=["Zone", "Storage Class", "Storage Amount", "Unit", "Monthly Growth %"])
-                empty_s3_direct_df.to_excel(writer, sheet_name='S3_Direct_Storage', index=False)
-
-        else: # Table-Based
-            consolidated_table_data_for_export = []
-            for zone, list_of_table_configs in s3_table_based_config.items():
-                if not isinstance(list_of_table_configs, list):
-                    list_of_table_configs = [list_of_table_configs] if isinstance(list_of_table_configs, dict) else []
-
-                for table_config in list_of_table_configs:
-                    if isinstance(table_config, dict):
-                        row = {
-                            "Zone": zone,
-                            "Table Name": table_config.get("Table Name", ""),
-                            "Records": table_config.get("Records", 0),
-                            "Columns": table_config.get("Columns", 0)
-                        }
-                        consolidated_table_data_for_export.append(row)
-
-            if consolidated_table_data_for_export:
-                df_table = pd.DataFrame(consolidated_table_data_for_export)
-                ordered_cols_s3_table = ["Zone", "Table Name", "Records", "Columns"]
-                df_table = df_table[ordered_cols_s3_table]
-                df_table.to_excel(writer, sheet_name='S3_Table_Based_Storage', index=False)
-            else:
-                empty_s3_table_df = pd.DataFrame(columns=["Zone", "Table Name", "Records", "Columns"])
-                empty_s3_table_df.to_excel(writer, sheet_name='S3_Table_Based_Storage', index=False)
-
-        # 3. SQL Warehouses Sheet
+                    "Table Name": table_config.get("Table Name", ""),
+                    "Records": table_config.get("Records", 0),
+                    "Columns": table_config.get("Columns", 0),
+                    "Table": table_config.get("Table", 0),
+                    "Estimated GB": engine.table_estimated_gb(table_config),
+                }
+                consolidated_table_data_for_export.append(row)
+    return consolidated_table_data_for_export
+
+
+def sql_warehouse_frame(sql_warehouses_config, global_data):
+    """The SQL_Warehouses sheet, from the same priced warehouse table as the totals (engine.price_sql_warehouses)."""
+    table = engine.price_sql_warehouses(sql_warehouses_config, global_data).warehouses
+    # Sizes that are not "<Instance> - <DBUs> - <rate>" labels are exported as "N/A"
+    labelled = table["size"].fillna("").astype(str).str.contains(" - ", regex=False)
+    return pd.DataFrame({
+        "Name": table["name"],
+        "Type": table["type"],
+        "Size": table["Instance"].where(labelled, "N/A"),
+        "DBUs per Hour": table["DBUs per Hour"],
+        "Hourly Rate ($)": table["Hourly Rate ($)"],
+        "Nodes": table["SQL_nodes"],
+        "Hours per Day": table["hours_per_day"],
+        "Days per Month": table["days_per_month"],
+        "Monthly Cost ($)": table["Monthly Cost ($)"],
+    }, columns=SQL_EXPORT_COLUMNS)
+
+
+def _dbx_chunks(calculated_dbx_data, chunk_rows=STREAM_CHUNK_ROWS):
+    """Yields the Databricks_Jobs sheet tier by tier, in slices of at most `chunk_rows` rows."""
+    for tier, data in calculated_dbx_data.items():
+        df = data['df']
+        for start in range(0, len(df), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows].rename(columns=DBX_EXPORT_RENAME)
+            chunk = chunk.reindex(columns=DBX_EXPORT_COLUMNS)
+            chunk['Tier'] = tier
+            yield chunk
+
+
+def _export_sheets(calculated_dbx_data, s3_calc_method, s3_direct_config, s3_table_based_config, sql_warehouses_config, global_data, projection=None):
+    """The export's sheets in workbook order, as (sheet_name, columns, iterable of DataFrame chunks)."""
+    yield "Databricks_Jobs", DBX_EXPORT_COLUMNS, _dbx_chunks(calculated_dbx_data)
+
+    if s3_calc_method == "Direct Storage":
+        rows = s3_direct_rows(s3_direct_config)
+        yield 'S3_Direct_Storage', S3_DIRECT_EXPORT_COLUMNS, [pd.DataFrame(rows, columns=S3_DIRECT_EXPORT_COLUMNS)]
+    else:
+        rows = s3_table_rows(s3_table_based_config)
+        yield 'S3_Table_Based_Storage', S3_TABLE_EXPORT_COLUMNS, [pd.DataFrame(rows, columns=S3_TABLE_EXPORT_COLUMNS)]
+
+    sql_frame = sql_warehouse_frame(sql_warehouses_config, global_data) if sql_warehouses_config else pd.DataFrame(columns=SQL_EXPORT_COLUMNS)
+    yield 'SQL_Warehouses', SQL_EXPORT_COLUMNS, [sql_frame]
+
+    if projection is not None:
+        yield 'Projection', PROJECTION_EXPORT_COLUMNS, [projection.to_frame()]
+
+
+def _write_xlsx(sheets, output):
+    # constant_memory flushes each row to disk as it is written and uses inline strings,
+    # so neither the row data nor a shared-string table grows with the inventory size
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    # Same header style pandas' ExcelWriter uses
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    for sheet_name, columns, chunks in sheets:
+        worksheet = workbook.add_worksheet(sheet_name)
+        worksheet.write_row(0, 0, columns, header_format)
+        row_number = 1
+        for chunk in chunks:
+            values = chunk.astype(object).where(chunk.notna(), None)
+            for row in values.itertuples(index=False, name=None):
+                worksheet.write_row(row_number, 0, row)
+                row_number += 1
+    workbook.close()
+
+
+def _write_csv_zip(sheets, output):
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for sheet_name, columns, chunks in sheets:
+            with archive.open(f"{sheet_name}.csv", 'w') as member:
+                text = io.TextIOWrapper(member, encoding='utf-8', newline='')
+                pd.DataFrame(columns=columns).to_csv(text, index=False)
+                for chunk in chunks:
+                    chunk.to_csv(text, header=False, index=False)
+                text.flush()
+                text.detach()
+
+
+def _parquet_schema(sheet_name, first_chunk):
+    import pyarrow as pa
+    if sheet_name == "Databricks_Jobs":
+        return pa.schema([
+            (col, pa.string() if col in DBX_TEXT_COLUMNS else pa.bool_() if col in DBX_BOOL_COLUMNS else pa.float64())
+            for col in DBX_EXPORT_COLUMNS
+        ])
+    return pa.Schema.from_pandas(first_chunk, preserve_index=False)
+
+
+def _write_parquet_zip(sheets, output):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    with zipfile.ZipFile(output, 'w') as archive:
+        for sheet_name, columns, chunks in sheets:
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as sheet_file:
+                writer = None
+                for chunk in chunks:
+                    if writer is None:
+                        writer = pq.ParquetWriter(sheet_file, _parquet_schema(sheet_name, chunk))
+                    writer.write_table(pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False, safe=False))
+                if writer is None:
+                    writer = pq.ParquetWriter(sheet_file, _parquet_schema(sheet_name, pd.DataFrame(columns=columns)))
+                writer.close()
+                sheet_file.seek(0)
+                with archive.open(f"{sheet_name}.parquet", 'w') as member:
+                    shutil.copyfileobj(sheet_file, member)
+
+
+@tracing.traced
+def stream_consolidated_export(calculated_dbx_data, s3_calc_method, s3_direct_config, s3_table_based_config, sql_warehouses_config, export_format='xlsx', global_data=None, projection=None):
+    """
+    Writes the consolidated report (Databricks jobs, S3, SQL warehouses and, with a
+    projection.Projection, a Projection sheet), streaming the Databricks jobs tier by tier
+    instead of concatenating them, so peak memory does not depend on the number of jobs.
+    Pass `global_data` when calling outside the script thread (e.g. from a download callback). `export_format` is 'xlsx' (constant_memory workbook), 'csv' or 'parquet'
+    (a zip with one file per sheet). Returns a SpooledTemporaryFile positioned at the start.
+    """
+    if global_data is None:
         global_data = st.session_state.get('global_data', {})
-        sql_flat_rate_card = global_data.get('SQL_FLAT_RATE_CARD', {})
-        sql_rates_by_type_and_instance = global_data.get('SQL_RATES_BY_TYPE_AND_INSTANCE', {})
-        sql_flat_instance_list = global_data.get('SQL_FLAT_INSTANCE_LIST', {})
-        if sql_warehouses_config:
-            warehouse_data = []
-            for wh in sql_warehouses_config:
-                # FIX 2: Add a check to prevent AttributeError
-                if wh["size"] and " - " in wh["size"]:
-                    # Get the instance name (e.g., '2X-Small') from the size string
-                    warehouse_type = wh.get("type")
-                    size_string = wh.get("size")
-
-                    instance_name = sql_flat_instance_list.get(size_string)
-                    
-                    # Use the nested dictionary for a reliable lookup
-                    rates = sql_rates_by_type_and_instance.get(warehouse_type, {}).get(instance_name, {})
-                    
-                    dbt_per_hr = rates.get("DBU/hour", 0)
-                    hourly_rate = rates.get("Rate/hour", 0)
-                    nodes = wh.get("SQL_nodes", 1)
-                    
-                    warehouse_data.append({
-                        "Name": wh["name"],
-                        "Type": wh["type"],
-                        "Size": instance_name,
-                        "DBUs per Hour": dbt_per_hr,
-                        "Hourly Rate ($)": hourly_rate,
-                        "Nodes": nodes,
-                        "Hours per Day": wh["hours_per_day"],
-                        "Days per Month": wh["days_per_month"],
-                        "Monthly Cost ($)": hourly_rate * wh["hours_per_day"] * wh["days_per_month"] * nodes,
-                    })
-                else:
-                    # Handle cases with no valid size data
-                    warehouse_data.append({
-                        "Name": wh["name"],
-                        "Type": wh["type"],
-                        "Size": "N/A",
-                        "DBUs per Hour": 0,
-                        "Hourly Rate ($)": 0,
-                        "Nodes": wh["SQL_nodes"],
-                        "Hours per Day": wh["hours_per_day"],
-                        "Days per Month": wh["days_per_month"],
-                        "Monthly Cost ($)": 0,
-                    })
-
-            df_sql = pd.DataFrame(warehouse_data)
-            ordered_cols_sql = [
-                "Name", "Type", "Size", "DBUs per Hour", "Hourly Rate ($)","Nodes",
-                "Hours per Day", "Days per Month", "Monthly Cost ($)"
-            ]
-            df_sql = df_sql[ordered_cols_sql]
-            df_sql.to_excel(writer, sheet_name='SQL_Warehouses', index=False)
-        else:
-            empty_sql_df = pd.DataFrame(columns=[
-                "Name", "Type", "Size", "DBUs per Hour", "Hourly Rate ($)","Nodes",
-                "Hours per Day", "Days per Month", "Monthly Cost ($)"
-            ])
-            empty_sql_df.to_excel(writer, sheet_name='SQL_Warehouses', index=False)
 
+    sheets = _export_sheets(calculated_dbx_data, s3_calc_method, s3_direct_config, s3_table_based_config, sql_warehouses_config, global_data, projection)
+    writers = {'xlsx': _write_xlsx, 'csv': _write_csv_zip, 'parquet': _write_parquet_zip}
+    if export_format not in writers:
+        raise ValueError(f"Unknown export format: {export_format}")
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    writers[export_format](sheets, output)
     output.seek(0)
-    return output.getvalue()
\ No newline at end of file
+    return output
@@ -0,0 +1,251 @@
+# job_importer.py
+# Bulk import of a job inventory (e.g. a Jobs API export) from CSV, Parquet or JSON lines.
+# Files are read in chunks, columns are mapped onto the dbx_jobs schema, tiers are assigned
+# by a rule and every chunk is validated against the rate card with vectorized checks.
+import os
+import re
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+JOB_COLUMNS = ["Job Name", "Runtime (hrs)", "Runs/Month", "Compute type", "Instance Type", "Nodes", "Photon", "Spot"]
+TIERS = ["L0 / Raw", "L1 / Curated", "L2 / Data Product"]
+TIER_COMPUTE_TYPES_KEYS = {
+    "L0 / Raw": 'COMPUTE_TYPES_L0_L1',
+    "L1 / Curated": 'COMPUTE_TYPES_L0_L1',
+    "L2 / Data Product": 'COMPUTE_TYPES_L2',
+}
+CHUNK_ROWS = 50_000
+IMPORT_EXTENSIONS = ('.csv', '.parquet', '.jsonl', '.json')
+REJECT_COLUMNS = ["Row", "Tier", "Job Name", "Instance Type", "Reason"]
+
+# Source column names recognised without an explicit mapping (compared lower-case)
+DEFAULT_COLUMN_ALIASES = {
+    'job name': "Job Name", 'job_name': "Job Name", 'name': "Job Name",
+    'runtime (hrs)': "Runtime (hrs)", 'runtime_hrs': "Runtime (hrs)", 'runtime_hours': "Runtime (hrs)",
+    'avg_runtime_hours': "Runtime (hrs)",
+    'runs/month': "Runs/Month", 'runs_per_month': "Runs/Month", 'monthly_runs': "Runs/Month",
+    'compute type': "Compute type", 'compute_type': "Compute type", 'sku': "Compute type",
+    'instance type': "Instance Type", 'instance_type': "Instance Type", 'node_type_id': "Instance Type",
+    'nodes': "Nodes", 'num_workers': "Nodes", 'workers': "Nodes",
+    'photon': "Photon", 'photon_enabled': "Photon",
+    'spot': "Spot", 'spot_instances': "Spot",
+    'tier': "Tier",
+}
+TRUE_STRINGS = {'true', 't', 'yes', 'y', '1'}
+
+
+@dataclass(frozen=True)
+class TierRule:
+    """
+    How imported jobs are assigned to tiers, applied in this order: the file's tier column
+    (values must be tier names), then the first job-name regex in `patterns` that matches
+    ({pattern: tier}), then `default`. Rows left without a tier are rejected.
+    """
+    column: str = "Tier"
+    patterns: dict = field(default_factory=dict)
+    default: str = None
+
+
+@dataclass(frozen=True)
+class ImportResult:
+    jobs: dict          # tier -> DataFrame with JOB_COLUMNS
+    rejects: pd.DataFrame
+    rows_read: int
+
+    @property
+    def rows_imported(self):
+        return sum(len(df) for df in self.jobs.values())
+
+
+def file_format_of(source):
+    """'csv', 'parquet', 'jsonl', ... from the extension of a path or a named file object."""
+    name = source if isinstance(source, str) else getattr(source, 'name', '')
+    return os.path.splitext(name)[1].lower().lstrip('.')
+
+
+def read_columns(source, file_format=None):
+    """Column names of a CSV, Parquet or JSON-lines file, without reading its rows."""
+    file_format = file_format or file_format_of(source)
+    if file_format == 'csv':
+        columns = pd.read_csv(source, nrows=0).columns
+    elif file_format == 'parquet':
+        import pyarrow.parquet as pq
+        columns = pq.ParquetFile(source).schema_arrow.names
+    elif file_format in ('jsonl', 'json'):
+        columns = pd.read_json(source, lines=True, nrows=1).columns
+    else:
+        raise ValueError(f"Unsupported file format: {file_format!r}")
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return list(columns)
+
+
+def read_chunks(source, file_format=None, chunk_rows=CHUNK_ROWS, columns=None):
+    """
+    Yields DataFrame chunks of a CSV, Parquet or JSON-lines file (a path or a file object,
+    e.g. a Streamlit upload). `file_format` defaults to the file extension. With `columns`,
+    CSV and Parquet files only parse those columns.
+    """
+    file_format = file_format or file_format_of(source)
+    if file_format == 'csv':
+        wanted = set(columns) if columns is not None else None
+        usecols = (lambda column: column in wanted) if wanted is not None else None
+        yield from pd.read_csv(source, chunksize=chunk_rows, usecols=usecols)
+    elif file_format == 'parquet':
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(source)
+        if columns is not None:
+            columns = [column for column in parquet.schema_arrow.names if column in columns]
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    elif file_format in ('jsonl', 'json'):
+        for chunk in pd.read_json(source, lines=True, chunksize=chunk_rows):
+            yield chunk[[column for column in chunk.columns if column in columns]] if columns is not None else chunk
+    else:
+        raise ValueError(f"Unsupported file format: {file_format!r}")
+
+
+def map_columns(chunk, column_mapping=None, aliases=DEFAULT_COLUMN_ALIASES):
+    """Renames source columns onto the job schema: explicit `column_mapping` first, then the aliases."""
+    column_mapping = dict(column_mapping or {})
+    renames = {}
+    for source in chunk.columns:
+        target = column_mapping.get(source) or aliases.get(str(source).strip().lower())
+        if target and target not in renames.values():
+            renames[source] = target
+    return chunk[list(renames)].rename(columns=renames)
+
+
+def _assign_tiers(chunk, rule):
+    tiers = pd.Series(None, index=chunk.index, dtype=object)
+    if rule.column in chunk.columns:
+        tiers = chunk[rule.column].astype(object).where(chunk[rule.column].notna(), None)
+    if rule.patterns and "Job Name" in chunk.columns:
+        names = chunk["Job Name"].astype(str)
+        for pattern, tier in reversed(list(rule.patterns.items())):
+            # Reversed so that the first matching pattern is written last and wins
+            matched = names.str.contains(pattern, flags=re.IGNORECASE, regex=True, na=False)
+            tiers = tiers.where(tiers.notna() | ~matched, tier)
+    if rule.default is not None:
+        tiers = tiers.fillna(rule.default)
+    return tiers
+
+
+def _as_bool(values):
+    if values.dtype == bool:
+        return values
+    return values.astype(str).str.strip().str.lower().isin(TRUE_STRINGS)
+
+
+def _instance_labels(rate_card):
+    """(compute type, instance or label) -> label, so files may hold either the UI label or the bare instance."""
+    keys, labels = [], []
+    for compute_type, instances in rate_card['INSTANCE_PRICES'].items():
+        for label, instance in instances.items():
+            keys.append((compute_type, label))
+            labels.append(label)
+        for label, instance in reversed(list(instances.items())):
+            # The first label of an instance wins, as in the UI dropdowns
+            keys.append((compute_type, instance))
+            labels.append(label)
+    lookup = pd.Series(labels, index=pd.MultiIndex.from_tuples(keys))
+    return lookup[~lookup.index.duplicated(keep='last')]
+
+
+def normalize_chunk(chunk, rate_card, rule, label_lookup, row_offset=0):
+    """
+    Maps, tiers and validates one chunk. Returns (accepted jobs with a 'Tier' column, rejects).
+    All checks are column-wise; the reject reason is the first failing check of each row.
+    """
+    rows = pd.RangeIndex(row_offset, row_offset + len(chunk))
+    chunk = chunk.set_axis(rows)
+    tiers = _assign_tiers(chunk, rule)
+    jobs = pd.DataFrame(index=rows)
+    jobs["Tier"] = tiers
+
+    # Compute type defaults to the first one offered for the tier
+    default_compute_type = tiers.map(
+        {tier: (rate_card.get(key) or [None])[0] for tier, key in TIER_COMPUTE_TYPES_KEYS.items()}
+    )
+    compute_type = chunk["Compute type"] if "Compute type" in chunk.columns else pd.Series(None, index=rows, dtype=object)
+    jobs["Compute type"] = compute_type.astype(object).where(compute_type.notna(), default_compute_type)
+
+    instance = chunk["Instance Type"].astype(object) if "Instance Type" in chunk.columns else pd.Series(None, index=rows, dtype=object)
+    keys = pd.MultiIndex.from_arrays([jobs["Compute type"].astype(str), instance.astype(str)])
+    positions = label_lookup.index.get_indexer(keys)
+    jobs["Instance Type"] = np.where(positions >= 0, label_lookup.to_numpy()[positions], None)
+
+    for column, default in (("Runtime (hrs)", 0.0), ("Runs/Month", 0.0), ("Nodes", 1)):
+        values = chunk[column] if column in chunk.columns else pd.Series(default, index=rows)
+        jobs[column] = pd.to_numeric(values, errors='coerce')
+    for column in ("Photon", "Spot"):
+        jobs[column] = _as_bool(chunk[column]) if column in chunk.columns else False
+
+    names = chunk["Job Name"] if "Job Name" in chunk.columns else pd.Series(None, index=rows, dtype=object)
+    jobs["Job Name"] = names.astype(object).where(names.notna() & (names.astype(str) != ""), "Imported Job " + (rows + 1).astype(str))
+
+    allowed_compute_types = {
+        (tier, compute_type)
+        for tier, key in TIER_COMPUTE_TYPES_KEYS.items() for compute_type in rate_card.get(key, [])
+    }
+    checks = [
+        (~jobs["Tier"].isin(TIERS), "Unknown or missing tier"),
+        (~pd.MultiIndex.from_arrays([jobs["Tier"], jobs["Compute type"]]).isin(allowed_compute_types), "Compute type not available for the tier"),
+        (positions < 0, "Instance not in the rate card for the compute type"),
+        (jobs["Runtime (hrs)"].isna() | (jobs["Runtime (hrs)"] < 0), "Invalid runtime"),
+        (jobs["Runs/Month"].isna() | (jobs["Runs/Month"] < 0), "Invalid runs per month"),
+        (jobs["Nodes"].isna() | (jobs["Nodes"] < 0) | (jobs["Nodes"] % 1 != 0), "Invalid node count"),
+    ]
+    reason = np.select([np.asarray(failed) for failed, _ in checks], [text for _, text in checks], default="")
+    rejected = reason != ""
+
+    rejects = pd.DataFrame({
+        "Row": rows[rejected] + 1,
+        "Tier": jobs["Tier"].to_numpy()[rejected],
+        "Job Name": jobs["Job Name"].to_numpy()[rejected],
+        "Instance Type": instance.to_numpy()[rejected],
+        "Reason": reason[rejected],
+    }, columns=REJECT_COLUMNS)
+
+    accepted = jobs[~rejected].copy()
+    accepted["Nodes"] = accepted["Nodes"].astype(int)
+    return accepted[["Tier"] + JOB_COLUMNS], rejects
+
+
+def import_jobs(source, rate_card, rule=None, column_mapping=None, file_format=None, chunk_rows=CHUNK_ROWS):
+    """
+    Imports a job inventory file into {tier: jobs DataFrame} plus a reject report.
+    `rate_card` is the dict built by rate_card.build_global_data.
+    """
+    rule = rule or TierRule()
+    label_lookup = _instance_labels(rate_card)
+    accepted_chunks, reject_chunks = [], []
+    rows_read = 0
+    for chunk in read_chunks(source, file_format, chunk_rows):
+        accepted, rejects = normalize_chunk(map_columns(chunk, column_mapping), rate_card, rule, label_lookup, rows_read)
+        rows_read += len(chunk)
+        accepted_chunks.append(accepted)
+        if not rejects.empty:
+            reject_chunks.append(rejects)
+
+    accepted = pd.concat(accepted_chunks, ignore_index=True) if accepted_chunks else pd.DataFrame(columns=["Tier"] + JOB_COLUMNS)
+    jobs = {
+        tier: group.drop(columns="Tier").reset_index(drop=True)
+        for tier, group in accepted.groupby("Tier", sort=False)
+    }
+    rejects = pd.concat(reject_chunks, ignore_index=True) if reject_chunks else pd.DataFrame(columns=REJECT_COLUMNS)
+    return ImportResult(jobs=jobs, rejects=rejects, rows_read=rows_read)
+
+
+def merge_jobs(existing_jobs, imported_jobs, replace=False):
+    """New dbx_jobs dict with the imported jobs appended to (or replacing) each tier's jobs."""
+    merged = dict(existing_jobs)
+    for tier, jobs_df in imported_jobs.items():
+        current = merged.get(tier)
+        if replace or current is None or current.empty:
+            merged[tier] = jobs_df
+        else:
+            merged[tier] = pd.concat([current, jobs_df], ignore_index=True)
+    return merged
@@ -0,0 +1,112 @@
+# job_schema.py
+# Defaults and validation for the Databricks job editor. A tier's jobs frame is normalized in
+# one column-wise pass: missing values get their defaults, numeric and flag columns are
+# coerced, and (compute type, instance) pairs the tier does not offer are replaced by the
+# compute type's first instance. Headless, like engine.py.
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+EDITOR_COLUMNS = ["Job Name", "Runtime (hrs)", "Runs/Month", "Compute type", "Instance Type", "Nodes", "Photon", "Spot"]
+L0_L1_TIERS = ("L0 / Raw", "L1 / Curated")
+# Numeric column -> default for missing values
+NUMERIC_DEFAULTS = {"Runtime (hrs)": 0.0, "Runs/Month": 0.0, "Nodes": 1}
+FLAG_COLUMNS = ("Photon", "Spot")
+
+
+@dataclass(frozen=True)
+class TierChoices:
+    """Compute types and instances offered for a tier, with the valid pairs precomputed."""
+    compute_options: list
+    instance_prices: dict
+    valid_instances: dict       # compute type -> Index of its instances
+    first_instance: dict        # compute type -> first instance offered
+
+
+def tier_choices(global_data, tier):
+    if tier in L0_L1_TIERS:
+        compute_options, instance_prices = global_data['COMPUTE_TYPES_L0_L1'], global_data['INSTANCE_PRICES_L0_L1']
+    elif tier == "L2 / Data Product":
+        compute_options, instance_prices = global_data['COMPUTE_TYPES_L2'], global_data['INSTANCE_PRICES_L2']
+    else:
+        compute_options, instance_prices = [], {}
+    return TierChoices(
+        compute_options=list(compute_options),
+        instance_prices=instance_prices,
+        valid_instances={ct: pd.Index(list(instances), dtype=object) for ct, instances in instance_prices.items()},
+        first_instance={ct: next(iter(instances)) for ct, instances in instance_prices.items() if instances},
+    )
+
+
+def _set(jobs_df, mask, column, values):
+    """jobs_df.loc[mask, column] = values, widening a numeric or boolean column to object first."""
+    if is_numeric_dtype(jobs_df[column]) or is_bool_dtype(jobs_df[column]):
+        jobs_df[column] = jobs_df[column].astype(object)
+    jobs_df.loc[mask, column] = values
+
+
+def _coerce_numeric(values):
+    # Editor columns can come back as objects (e.g. None in new rows); coerce them when nothing is lost
+    if values.dtype == object:
+        numeric = pd.to_numeric(values, errors='coerce')
+        if numeric.isna().equals(values.isna()):
+            return numeric
+    return values
+
+
+def normalize_jobs(jobs_df, tier, choices):
+    """
+    Fills and validates a tier's jobs in place and returns the frame: missing runtime and
+    runs are 0, nodes 1, job names "<tier> Job <row label + 1>", compute types the tier's
+    first one, and unknown or missing instances the compute type's first instance (None when
+    it has none). Photon and Spot are not offered for L0 / L1 and are switched off there.
+    """
+    if jobs_df.empty:
+        return jobs_df
+    for column in EDITOR_COLUMNS:
+        if column not in jobs_df.columns:
+            jobs_df[column] = None
+
+    for column, default in NUMERIC_DEFAULTS.items():
+        values = _coerce_numeric(jobs_df[column])
+        if values.hasnans:
+            values = values.fillna(default)
+        if values is not jobs_df[column]:
+            jobs_df[column] = values
+
+    for column in FLAG_COLUMNS:
+        if tier in L0_L1_TIERS:
+            jobs_df[column] = False
+            continue
+        values = jobs_df[column]
+        if values.hasnans:
+            values = values.fillna(False)
+        if values.dtype == object and values.map(type).eq(bool).all():
+            values = values.astype(bool)
+        if values is not jobs_df[column]:
+            jobs_df[column] = values
+
+    names = jobs_df["Job Name"]
+    missing = (names.isna() | names.eq("")).to_numpy(dtype=bool, na_value=True)
+    if missing.any():
+        prefix = tier.replace('/', ' ')
+        _set(jobs_df, missing, "Job Name", [f"{prefix} Job {j + 1}" for j in jobs_df.index[missing]])
+
+    missing = jobs_df["Compute type"].isna().to_numpy()
+    if missing.any() and choices.compute_options:
+        _set(jobs_df, missing, "Compute type", choices.compute_options[0])
+
+    # A tier has a handful of compute types, each checks its rows against its own instances
+    compute_type = jobs_df["Compute type"]
+    instance = jobs_df["Instance Type"].to_numpy(dtype=object)
+    valid = np.zeros(len(jobs_df), dtype=bool)
+    for ct, instances in choices.valid_instances.items():
+        rows = compute_type.eq(ct).to_numpy(dtype=bool, na_value=False)
+        if rows.any():
+            valid[rows] = instances.get_indexer(instance[rows]) >= 0
+    if not valid.all():
+        replacement = compute_type[~valid].map(choices.first_instance).astype(object)
+        _set(jobs_df, ~valid, "Instance Type", replacement.where(replacement.notna(), None).to_numpy())
+    return jobs_df
@@ -1,11 +1,12 @@
 # main.py
+import uuid
+from collections import deque
 import streamlit as st
 import state as s
-from calculations import calculate_databricks_costs_for_tier, calculate_s3_cost_per_zone, calculate_sql_warehouse_cost, calculate_dev_costs
-from ui_components import render_summary_column, render_databricks_tab, render_s3_tab, render_sql_warehouse_tab, render_configuration_guide, render_export_button , render_devepoment_tools 
-from file_exportor import generate_consolidated_excel_export 
-import io 
-import pandas as pd
+import tracing
+from calculations import price_session_scenario, scenario_graph
+from projection import DATABRICKS, S3, SQL
+from ui_components import render_summary, render_databricks_tab, render_s3_tab, render_sql_warehouse_tab, render_configuration_guide, render_export_button , render_devepoment_tools, render_projection_tab, render_developer_panel
 
 
 # --- Page Configuration ---
@@ -15,21 +16,30 @@ st.set_page_config(
     layout="wide"
 )
 
-s.initialize_state()
-df_rate_card, df_sql_rate_card, df_dev, s3_data = s.load_rate_card_data()
-
-# Check if data loaded successfully (either df could be None)
-if df_rate_card is None or df_sql_rate_card is None or df_dev is None:
-    st.stop()
-
-# --- CORRECTED LINE ---
-# Now, pass both dataframes to populate_global_data()
-s.populate_global_data(df_rate_card, df_sql_rate_card, df_dev, s3_data)
+# Per-rerun timing spans, enabled with DBU_TRACE=1 or ?trace=1 (see tracing.py)
+trace_enabled = tracing.ENABLED or st.query_params.get("trace") == "1"
+if trace_enabled and 'trace_history' not in st.session_state:
+    st.session_state.trace_session_id = uuid.uuid4().hex[:12]
+    st.session_state.trace_history = deque(maxlen=tracing.HISTORY_SIZE)
+    st.session_state.trace_reruns = 0
+# A rerun cut short by st.rerun()/st.stop() never reached the end, record it now
+if st.session_state.get('trace_open') is not None:
+    st.session_state.trace_history.append(tracing.finish_rerun(st.session_state.trace_open, interrupted=True))
+if trace_enabled:
+    st.session_state.trace_reruns += 1
+st.session_state.trace_open = tracing.start_rerun(
+    trace_enabled, st.session_state.get('trace_session_id'), st.session_state.get('trace_reruns')
+)
 
 # --- 1. Initialize Session State ---
 # This is the most important part. It MUST be called before any calculations.
+# Loads the shared rate card (once per rate card version) and sets session defaults.
 s.initialize_state()
 
+# Check if data loaded successfully
+if not st.session_state.get('global_data_populated'):
+    st.stop()
+
 # This is for Databricks overall growth, not S3 per-zone growth
 if 'monthly_growth_percent' not in st.session_state:
     st.session_state.monthly_growth_percent = 0.0
@@ -38,8 +48,6 @@ if 'theme' not in st.session_state:
     st.session_state.theme = 'light'
     
 # --- 2. Perform All Calculations ---
-calculated_dbx_data = {}
-
 # A safe way to handle the toggle is to build a list of active tiers first.
 # Ensure 'enable_bronze' is initialized
 if 'enable_bronze' not in st.session_state:
@@ -49,32 +57,21 @@ active_tiers = s.TIERS.copy()
 if not st.session_state.enable_bronze:
     active_tiers.remove("L0 / RAW")
 
-for tier in active_tiers:
-    # Use .get() to safely retrieve the DataFrame, defaulting to an empty DataFrame if the key doesn't exist.
-    jobs_df = st.session_state.dbx_jobs.get(tier, pd.DataFrame())
-    if not jobs_df.empty:
-        df_with_costs, dbu_cost, ec2_cost, _ = calculate_databricks_costs_for_tier(jobs_df)
-        calculated_dbx_data[tier] = {
-            "df": df_with_costs,
-            "dbu_cost": dbu_cost,
-            "ec2_cost": ec2_cost
-        }
-    else:
-        # If the tier is active but has no jobs, initialize it with empty costs
-        calculated_dbx_data[tier] = {
-            "df": pd.DataFrame(),
-            "dbu_cost": 0,
-            "ec2_cost": 0
-        }
-
-# This line unpacks the return values, which are now correctly handled
-s3_costs_per_zone, s3_cost, projected_s3_cost_12_months = calculate_s3_cost_per_zone()
-sql_cost, sql_dbu = calculate_sql_warehouse_cost()
-dev_cost = calculate_dev_costs()
-databricks_total_cost = sum(data['dbu_cost'] + data['ec2_cost'] for data in calculated_dbx_data.values())
-total_cost = databricks_total_cost + s3_cost + sql_cost
+# Price the session inputs with the headless engine, plus the N-month projection of every
+# component for the Projection tab and the export. Only the cost nodes whose inputs changed
+# since the last rerun are recomputed (see dependency_graph.py).
+result, projection = price_session_scenario(active_tiers, int(st.session_state.projection_months), {
+    DATABRICKS: st.session_state.monthly_growth_percent,
+    S3: st.session_state.s3_growth_percent,
+    SQL: st.session_state.sql_growth_percent,
+})
+
+calculated_dbx_data = result.dbx_data()
 
 # --- 3. Render Main Layout ---
+# A full rerun draws every section and total from the priced scenario (see ui_components._rerun_section)
+st.session_state.summary_stale = False
+
 title_col, controls_col = st.columns([4, 1])
 
 with title_col:
@@ -92,7 +89,8 @@ with controls_col:
             st.session_state.s3_calc_method,
             st.session_state.s3_direct,
             st.session_state.s3_table_based,
-            st.session_state.sql_warehouses
+            st.session_state.sql_warehouses,
+            projection
         )
     with theme_col:
         # Custom theme toggle using a button
@@ -115,20 +113,29 @@ st.config.set_option("theme.base", st.session_state.theme)
 main_col, summary_col = st.columns([3, 1])
 
 with main_col:
-    tab1, tab2, tab3 ,tab4= st.tabs(["Databricks & Compute", "S3 Storage", "SQL Warehouse", "Development Cost"])
+    tab1, tab2, tab3 ,tab4, tab5 = st.tabs(["Databricks & Compute", "S3 Storage", "SQL Warehouse", "Development Cost", "Projection"])
 
     with tab1:
         # render_databricks_tab(FLAT_RATE_CARD, FLAT_INSTANCE_LIST, INSTANCE_PRICES, COMPUTE_TYPE_LIST)
         render_databricks_tab()
         render_configuration_guide()
     with tab2:
-        # Pass the projected_s3_cost_12_months to render_s3_tab
-        render_s3_tab(s3_costs_per_zone, s3_cost, projected_s3_cost_12_months)
+        # The S3 and SQL tabs read their costs from the priced scenario (session_scenario)
+        render_s3_tab()
     with tab3:
-        render_sql_warehouse_tab(sql_cost,sql_dbu)
+        render_sql_warehouse_tab()
     with tab4:
         render_devepoment_tools()   
+    with tab5:
+        render_projection_tab(projection)
 
 with summary_col:
-    # Pass the projected_s3_cost_12_months to render_summary_column
-    render_summary_column(total_cost, databricks_total_cost, s3_cost, sql_cost, projected_s3_cost_12_months)
\ No newline at end of file
+    # A fragment, rerun after an edit in a tier, S3 zone or SQL warehouse fragment
+    render_summary(active_tiers)
+
+# --- 4. Record this rerun's spans ---
+if st.session_state.trace_open is not None:
+    st.session_state.trace_history.append(tracing.finish_rerun(st.session_state.trace_open))
+    st.session_state.trace_open = None
+    with summary_col:
+        render_developer_panel(st.session_state.trace_history, scenario_graph().stats())
@@ -0,0 +1,120 @@
+# memory_report.py
+# Per-session memory footprint: how much of a session's state is private and how much is
+# only a reference to the process-wide rate card (state.shared_global_data).
+#
+#   python memory_report.py --sessions 100
+import argparse
+import sys
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+import rate_card as rc
+
+
+def deep_size(obj, seen=None):
+    """
+    Approximate bytes reachable from `obj`. Objects whose id is already in `seen`
+    are not counted again, so passing the ids of shared objects excludes them.
+    """
+    seen = set() if seen is None else seen
+    size = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+
+        if isinstance(item, (pd.DataFrame, pd.Series, pd.Index)):
+            usage = item.memory_usage(deep=True)
+            size += int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+        elif isinstance(item, np.ndarray):
+            # Views are charged to the array that owns the buffer
+            size += sys.getsizeof(item) if item.base is not None else item.nbytes + sys.getsizeof(item)
+            if item.dtype == object:
+                stack.extend(item.ravel().tolist())
+        elif isinstance(item, (dict, MappingProxyType)):
+            size += sys.getsizeof(item)
+            for key, value in item.items():
+                stack.append(key)
+                stack.append(value)
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            size += sys.getsizeof(item)
+            stack.extend(item)
+        else:
+            size += sys.getsizeof(item)
+            for slot in getattr(type(item), '__slots__', ()):
+                if hasattr(item, slot):
+                    stack.append(getattr(item, slot))
+            if hasattr(item, '__dict__'):
+                stack.append(vars(item))
+    return size
+
+
+def reachable_ids(obj):
+    """Ids of every object counted by deep_size(obj)."""
+    seen = set()
+    deep_size(obj, seen)
+    return seen
+
+
+def session_footprint(session, shared=None):
+    """
+    Bytes held by each key of a session mapping (e.g. st.session_state), excluding
+    anything reachable from `shared` (the process-wide rate card).
+    Returns a DataFrame with one row per key, largest first.
+    """
+    shared_ids = reachable_ids(shared) if shared is not None else set()
+    rows = []
+    for key in list(session.keys()):
+        value = session[key]
+        rows.append({
+            'key': key,
+            'bytes': deep_size(value, set(shared_ids)),
+            'shared': shared is not None and id(value) in shared_ids,
+        })
+    report = pd.DataFrame(rows, columns=['key', 'bytes', 'shared'])
+    return report.sort_values('bytes', ascending=False, ignore_index=True)
+
+
+def rate_card_report(sessions=100):
+    """
+    Per-session footprint of the rate card lookups before (a private copy per session)
+    and after (one shared copy per process, sessions hold a reference).
+    """
+    shared = rc.freeze_rate_card(rc.load_rate_card())
+    private_copy = rc.build_global_data(*rc.split_rate_card(
+        rc.rate_card_cache.load_frame('rate_card'), rc.rate_card_cache.load_frame('s3')
+    ))
+    per_session_before = deep_size(private_copy)
+    per_session_after = deep_size({'global_data': shared}, reachable_ids(shared))
+    shared_once = deep_size(shared)
+    return {
+        'sessions': sessions,
+        'per_session_before_bytes': per_session_before,
+        'per_session_after_bytes': per_session_after,
+        'shared_bytes': shared_once,
+        'total_before_bytes': per_session_before * sessions,
+        'total_after_bytes': per_session_after * sessions + shared_once,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the per-session memory footprint of the rate card.")
+    parser.add_argument('--sessions', type=int, default=100, help="Concurrent sessions to project the totals for.")
+    args = parser.parse_args(argv)
+
+    report = rate_card_report(args.sessions)
+    mib = 1024 * 1024
+    print(f"Rate card per session, before (private copy): {report['per_session_before_bytes'] / mib:8.2f} MiB")
+    print(f"Rate card per session, after (shared ref):    {report['per_session_after_bytes'] / mib:8.2f} MiB")
+    print(f"Shared rate card, once per process:           {report['shared_bytes'] / mib:8.2f} MiB")
+    print(f"{report['sessions']} sessions, before: {report['total_before_bytes'] / mib:.2f} MiB, "
+          f"after: {report['total_after_bytes'] / mib:.2f} MiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# projection.py
+# N-month cost projections. Every cost line (Databricks tier, S3 zone, SQL warehouses, development) becomes
+# one row of a (line x month) matrix, built in a single vectorized pass from the current
+# monthly costs and their monthly growth rates. Headless, like engine.py.
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+MAX_MONTHS = 60
+DEFAULT_MONTHS = 12
+
+DATABRICKS = "Databricks & Compute"
+S3 = "S3 Storage"
+SQL = "SQL Warehouse"
+DEVELOPMENT = "Development"
+COMPONENTS = [DATABRICKS, S3, SQL, DEVELOPMENT]
+
+PROJECTION_EXPORT_COLUMNS = ["Component", "Item", "Month", "Monthly Cost ($)", "Cumulative Cost ($)"]
+
+
+def growth_matrix(base_costs, growth_percents, months):
+    """
+    costs[i, m] = base_costs[i] * (1 + growth_percents[i] / 100) ** m for m = 0 .. months - 1,
+    i.e. month 1 is the current monthly cost and each following month grows geometrically.
+    """
+    base = np.asarray(base_costs, dtype=float)
+    factor = 1 + np.asarray(growth_percents, dtype=float) / 100
+    return base[:, None] * factor[:, None] ** np.arange(months)[None, :]
+
+
+def cumulative_costs(base_costs, growth_percents, horizons):
+    """Total cost of each line over each horizon in months, e.g. (3, 6) -> {3: quarterly, 6: half-yearly}."""
+    cumulative = growth_matrix(base_costs, growth_percents, max(horizons)).cumsum(axis=1)
+    return {months: cumulative[:, months - 1] for months in horizons}
+
+
+@dataclass(frozen=True)
+class Projection:
+    """Monthly costs indexed by (Component, Item), one column per month (1 .. months)."""
+    monthly: pd.DataFrame
+
+    @property
+    def months(self):
+        return self.monthly.shape[1]
+
+    @property
+    def cumulative(self):
+        return self.monthly.cumsum(axis=1)
+
+    def by_component(self, cumulative=False):
+        """Component x month totals (monthly, or running totals with `cumulative`)."""
+        frame = self.cumulative if cumulative else self.monthly
+        return frame.groupby(level="Component", sort=False).sum()
+
+    def total(self, cumulative=False):
+        """Month -> total cost across all components."""
+        frame = self.cumulative if cumulative else self.monthly
+        return frame.sum(axis=0)
+
+    def to_frame(self):
+        """Long format for the export: one row per line and month."""
+        long = self.monthly.stack().rename("Monthly Cost ($)").to_frame()
+        long["Cumulative Cost ($)"] = self.cumulative.stack().to_numpy()
+        return long.reset_index()[PROJECTION_EXPORT_COLUMNS]
+
+
+def project_costs(lines, months=DEFAULT_MONTHS):
+    """
+    Projects (component, item, current_monthly_cost, monthly_growth_percent) lines
+    over `months` (1 .. MAX_MONTHS) and returns a Projection.
+    """
+    if not 1 <= months <= MAX_MONTHS:
+        raise ValueError(f"Projection horizon must be between 1 and {MAX_MONTHS} months")
+
+    lines = list(lines)
+    index = pd.MultiIndex.from_tuples([line[:2] for line in lines], names=["Component", "Item"])
+    matrix = growth_matrix([line[2] for line in lines], [line[3] for line in lines], months)
+    monthly = pd.DataFrame(matrix.reshape(len(lines), months), index=index, columns=pd.RangeIndex(1, months + 1, name="Month"))
+    return Projection(monthly=monthly)
+
+
+def scenario_lines(scenario, result, growth_percents=None):
+    """
+    Projection lines of a priced scenario (engine.Scenario and its ScenarioResult).
+    `growth_percents` maps component -> monthly growth %; Direct Storage S3 zones use
+    their own 'monthly_growth_percent' instead.
+    """
+    growth_percents = growth_percents or {}
+    lines = [
+        (DATABRICKS, tier, tier_result.dbx_cost + tier_result.ec2_cost, growth_percents.get(DATABRICKS, 0.0))
+        for tier, tier_result in result.tiers.items()
+    ]
+    for zone, cost in result.s3.costs_per_zone.items():
+        growth = growth_percents.get(S3, 0.0)
+        if scenario.s3_calc_method == "Direct Storage" and zone in scenario.s3_direct:
+            growth = scenario.s3_direct[zone].get("monthly_growth_percent", 0.0)
+        lines.append((S3, zone, cost, growth))
+    lines.append((SQL, "All warehouses", result.sql.total_cost, growth_percents.get(SQL, 0.0)))
+    lines.append((DEVELOPMENT, "All clusters", result.dev.total_cost, growth_percents.get(DEVELOPMENT, 0.0)))
+    return lines
+
+
+def project_scenario(scenario, result, months=DEFAULT_MONTHS, growth_percents=None):
+    """Projection of every cost component of a priced scenario."""
+    return project_costs(scenario_lines(scenario, result, growth_percents), months)
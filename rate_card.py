@@ -0,0 +1,263 @@
+# rate_card.py
+import hashlib
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+import rate_card_cache
+
+# Compute types priced by each part of the app
+JOB_COMPUTE_TYPES = ['DLT Advanced Compute Photon', 'Jobs Compute', 'Jobs Compute Photon', 'DLT Advanced Compute']
+SQL_COMPUTE_TYPES = ['SQL Pro Compute', 'SQL Compute']
+DEV_COMPUTE_TYPES = ['All-Purpose Compute']
+L0_L1_COMPUTE_TYPES = ['DLT Advanced Compute Photon', 'DLT Advanced Compute']
+L2_COMPUTE_TYPES = ['Jobs Compute', 'Jobs Compute Photon']
+
+
+def split_rate_card(data, s3_data):
+    """Splits the raw rate card into the jobs, SQL warehouse, development and S3 frames."""
+    # data for Databricks Jobs/Pipelines
+    df = data[data['Compute type'].isin(JOB_COMPUTE_TYPES)]
+    # data for SQL Warehouses
+    df_sql = data[data['Compute type'].isin(SQL_COMPUTE_TYPES)]
+    # data for develoment cost
+    df_dev = data[data['Compute type'].isin(DEV_COMPUTE_TYPES)]
+    # s3 df
+    s3_df = s3_data.copy()
+    return df, df_sql, df_dev, s3_df
+
+
+def load_rate_card():
+    """
+    Loads the rate card without Streamlit and returns the derived lookup data
+    (the same dict as `state.populate_global_data`). Used by headless callers.
+    """
+    df, df_sql, df_dev, s3_df = split_rate_card(
+        rate_card_cache.load_frame('rate_card'), rate_card_cache.load_frame('s3')
+    )
+    if df.empty or df_sql.empty or df_dev.empty or s3_df.empty:
+        raise ValueError("The rate card data is empty or invalid.")
+    return build_global_data(df, df_sql, df_dev, s3_df)
+
+
+def rate_card_version(*frames):
+    """Content hash of the rate card frames. Changes whenever any rate changes."""
+    digest = hashlib.blake2b(digest_size=16)
+    for frame in frames:
+        digest.update(repr(list(frame.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class RateCard:
+    """
+    Columnar rate card for one group of compute types.
+    Numeric columns are NumPy arrays; instance, compute type and label strings are
+    interned to integer ids, so whole arrays of jobs are priced with lookup()/take().
+    Lookups by instance alone resolve to the last row for that instance, and labels
+    resolve label -> instance -> row, matching the old dict-of-rows behaviour.
+    """
+    __slots__ = (
+        'instances', 'compute_types', 'labels',
+        'instance_codes', 'compute_type_codes', 'label_codes',
+        'vcpu', 'memory_gb', 'dbu_per_hour', 'rate_per_hour', 'ec2_per_hour',
+        '_instance_index', '_compute_type_index', '_label_index',
+        '_instance_rows', '_pair_rows', '_label_rows', '_label_instance_codes', '_label_pair_rows',
+    )
+
+    def __init__(self, df, labels):
+        positions = np.arange(len(df))
+
+        self.instance_codes, instances = pd.factorize(df['Instance'].astype(str))
+        self.compute_type_codes, compute_types = pd.factorize(df['Compute type'].astype(str))
+        self.label_codes, labels = pd.factorize(pd.Series(labels, dtype=str))
+        self.instances = instances.to_numpy(dtype=object)
+        self.compute_types = compute_types.to_numpy(dtype=object)
+        self.labels = labels.to_numpy(dtype=object)
+
+        self.vcpu = df['vCPU'].to_numpy(dtype=float)
+        self.memory_gb = df['Memory (GB)'].to_numpy(dtype=float)
+        self.dbu_per_hour = df['DBU/hour'].to_numpy(dtype=float)
+        self.rate_per_hour = df['Rate/hour'].to_numpy(dtype=float)
+        self.ec2_per_hour = df['onDemandLinuxHr'].to_numpy(dtype=float) if 'onDemandLinuxHr' in df else np.zeros(len(df))
+
+        self._instance_index = pd.Index(self.instances)
+        self._compute_type_index = pd.Index(self.compute_types)
+        self._label_index = pd.Index(self.labels)
+
+        # Last row of each instance and of each (instance, compute type) pair
+        self._instance_rows = np.full(len(self.instances), -1)
+        np.maximum.at(self._instance_rows, self.instance_codes, positions)
+        self._pair_rows = np.full((len(self.instances), len(self.compute_types)), -1)
+        np.maximum.at(self._pair_rows, (self.instance_codes, self.compute_type_codes), positions)
+
+        # A label resolves to the instance of its last row, then to that instance's last row
+        last_label_rows = np.full(len(self.labels), -1)
+        np.maximum.at(last_label_rows, self.label_codes, positions)
+        self._label_instance_codes = self.instance_codes[last_label_rows]
+        self._label_rows = self._instance_rows[self._label_instance_codes]
+        # (label, compute type) -> row of the label's instance at that compute type
+        self._label_pair_rows = self._pair_rows[self._label_instance_codes]
+
+        for array in (self.instance_codes, self.compute_type_codes, self.label_codes, self.vcpu, self.memory_gb,
+                      self.dbu_per_hour, self.rate_per_hour, self.ec2_per_hour, self._instance_rows,
+                      self._pair_rows, self._label_rows, self._label_instance_codes, self._label_pair_rows):
+            array.flags.writeable = False
+
+    def __len__(self):
+        return len(self.vcpu)
+
+    def instance_ids(self, names):
+        """Interned ids of instance names, -1 for names not in the card."""
+        return self._instance_index.get_indexer(pd.Index(names, dtype=object))
+
+    def compute_type_ids(self, names):
+        """Interned ids of compute type names, -1 for names not in the card."""
+        return self._compute_type_index.get_indexer(pd.Index(names, dtype=object))
+
+    def label_ids(self, labels):
+        """Interned ids of UI labels, -1 for labels not in the card."""
+        return self._label_index.get_indexer(pd.Index(labels, dtype=object))
+
+    def lookup(self, instance_ids, compute_type_ids=None):
+        """
+        Row positions for arrays of instance ids (and optionally compute type ids).
+        Without compute types, an instance resolves to its last row. Missing entries are -1.
+        """
+        instance_ids = np.asarray(instance_ids)
+        known = instance_ids >= 0
+        if compute_type_ids is None:
+            rows = self._instance_rows[np.where(known, instance_ids, 0)]
+        else:
+            compute_type_ids = np.asarray(compute_type_ids)
+            known &= compute_type_ids >= 0
+            rows = self._pair_rows[np.where(known, instance_ids, 0), np.where(known, compute_type_ids, 0)]
+        return np.where(known, rows, -1)
+
+    def label_rows(self, labels):
+        """Row positions for UI labels ("m5.xlarge | 4 CPUs | 16GB" style), -1 for unknown labels."""
+        label_ids = self.label_ids(labels)
+        return np.where(label_ids >= 0, self._label_rows[np.where(label_ids >= 0, label_ids, 0)], -1)
+
+    def label_instances(self, label_ids):
+        """Instance names of label ids (object array), None for -1."""
+        label_ids = np.asarray(label_ids)
+        known = label_ids >= 0
+        if not known.any():
+            return np.full(label_ids.shape, None, dtype=object)
+        names = self.instances[self._label_instance_codes[np.where(known, label_ids, 0)]]
+        return np.where(known, names, None)
+
+    def label_pair_rows(self, label_ids, compute_type_ids):
+        """Row positions for arrays of (label id, compute type id): the label's instance at that compute type."""
+        label_ids = np.asarray(label_ids)
+        compute_type_ids = np.asarray(compute_type_ids)
+        known = (label_ids >= 0) & (compute_type_ids >= 0)
+        if not known.any():
+            return np.full(label_ids.shape, -1)
+        rows = self._label_pair_rows[np.where(known, label_ids, 0), np.where(known, compute_type_ids, 0)]
+        return np.where(known, rows, -1)
+
+    def take(self, column, rows, fill=0.0):
+        """Values of a numeric column ('rate_per_hour', ...) at `rows`, `fill` where the row is -1."""
+        values = getattr(self, column)
+        rows = np.asarray(rows)
+        if len(values) == 0:
+            return np.full(rows.shape, fill, dtype=float)
+        return np.where(rows >= 0, values[np.where(rows >= 0, rows, 0)], fill)
+
+    def label_map(self, mask=None):
+        """{label: instance} in row order (last row wins), as used by the UI dropdowns."""
+        label_codes = self.label_codes if mask is None else self.label_codes[mask]
+        instance_codes = self.instance_codes if mask is None else self.instance_codes[mask]
+        return dict(zip(self.labels[label_codes].tolist(), self.instances[instance_codes].tolist()))
+
+    def label_maps_by_compute_type(self, compute_types=None):
+        """{compute type: {label: instance}} for the given compute types (sorted, like a groupby)."""
+        present = sorted(set(self.compute_types.tolist()))
+        if compute_types is not None:
+            present = [ct for ct in present if ct in compute_types]
+        return {
+            ct: self.label_map(self.compute_type_codes == self._compute_type_index.get_loc(ct))
+            for ct in present
+        }
+
+
+def cpu_labels(df):
+    """Job/dev instance labels: "<Instance> | <vCPU> CPUs | <Memory>GB"."""
+    return (df['Instance'].astype(str) + " | " + df['vCPU'].astype(str) + " CPUs | "
+            + df['Memory (GB)'].astype(str) + "GB").to_numpy()
+
+
+def dbu_labels(df):
+    """Development instance labels: "<Instance> | <DBU/hour> DBUs | <Rate/hour>/hr"."""
+    return (df['Instance'].astype(str) + " | " + df['DBU/hour'].astype(str) + " DBUs | "
+            + df['Rate/hour'].astype(str) + "/hr").to_numpy()
+
+
+def sql_size_labels(df):
+    """SQL warehouse size labels: "<Instance> - <DBU/hour> DBUs - $<Rate/hour>/hr"."""
+    return (df['Instance'].astype(str) + " - " + df['DBU/hour'].astype(str) + " DBUs - $"
+            + df['Rate/hour'].astype(str) + "/hr").to_numpy()
+
+
+def build_global_data(df, df_sql, df_dev, s3_df):
+    """
+    Builds the rate cards and the lookup dictionaries and lists used across the app.
+    Rates live in three RateCard objects (jobs, SQL warehouses, development); the dicts
+    only hold the labels the UI dropdowns need.
+    """
+    JOB_RATE_CARD = RateCard(df, cpu_labels(df))
+    SQL_RATE_CARD = RateCard(df_sql, sql_size_labels(df_sql))
+    DEV_RATE_CARD = RateCard(df_dev, dbu_labels(df_dev))
+
+    # === SQL Warehouse Data ===
+    SQL_WAREHOUSE_TYPES_FROM_DATA = df_sql['Compute type'].unique().tolist()
+    SQL_WAREHOUSE_SIZES_BY_TYPE = {
+        ct: SQL_RATE_CARD.label_map(SQL_RATE_CARD.compute_type_codes == SQL_RATE_CARD.compute_type_ids([ct])[0])
+        for ct in SQL_WAREHOUSE_TYPES_FROM_DATA
+    }
+
+    # S3 Pricing Data
+    s3_pricing = {name: {'storage_gb': rate} for name, rate in zip(s3_df['S3_storage'].tolist(), s3_df['Rate/GB'].tolist())}
+
+    return {
+        # Content hash of the rate card, used to key cached results
+        'RATE_CARD_VERSION': rate_card_version(df, df_sql, df_dev, s3_df),
+        'JOB_RATE_CARD': JOB_RATE_CARD,
+        'FLAT_INSTANCE_LIST': JOB_RATE_CARD.label_map(),
+        'INSTANCE_PRICES': JOB_RATE_CARD.label_maps_by_compute_type(),
+        'COMPUTE_TYPE_LIST': df['Compute type'].unique().tolist(),
+
+        # Tier-specific data for Jobs/Pipelines
+        'COMPUTE_TYPES_L0_L1': df[df['Compute type'].isin(L0_L1_COMPUTE_TYPES)]['Compute type'].unique().tolist(),
+        'INSTANCE_PRICES_L0_L1': JOB_RATE_CARD.label_maps_by_compute_type(L0_L1_COMPUTE_TYPES),
+        'COMPUTE_TYPES_L2': df[df['Compute type'].isin(L2_COMPUTE_TYPES)]['Compute type'].unique().tolist(),
+        'INSTANCE_PRICES_L2': JOB_RATE_CARD.label_maps_by_compute_type(L2_COMPUTE_TYPES),
+
+        # SQL Warehouse data
+        'SQL_RATE_CARD': SQL_RATE_CARD,
+        'SQL_FLAT_INSTANCE_LIST': SQL_RATE_CARD.label_map(),
+        'SQL_WAREHOUSE_TYPES_FROM_DATA': SQL_WAREHOUSE_TYPES_FROM_DATA,
+        'SQL_WAREHOUSE_SIZES_BY_TYPE': SQL_WAREHOUSE_SIZES_BY_TYPE,
+
+        # DEVELOPMENT COST DATA
+        'DEV_RATE_CARD': DEV_RATE_CARD,
+        'FLAT_INSTANCE_LIST_DEV': DEV_RATE_CARD.label_map(),
+
+        #S3 data
+        'S3_PRICING': s3_pricing
+    }
+
+
+def freeze_rate_card(value):
+    """
+    Read-only view of a build_global_data() dict, safe to share between sessions:
+    dicts become MappingProxyTypes and lists become tuples (RateCard arrays are already read-only).
+    """
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze_rate_card(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze_rate_card(v) for v in value)
+    return value
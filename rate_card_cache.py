@@ -0,0 +1,181 @@
+# rate_card_cache.py
+import hashlib
+import json
+import os
+import sys
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow is optional, without it we always parse the workbooks
+    pa = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, '.rate_card_cache')
+
+# Workbooks that make up the rate card and the columns the app actually reads from them
+RATE_CARD_SOURCES = {
+    'rate_card': (
+        'final_out.xlsx',
+        ['Compute type', 'Instance', 'vCPU', 'Memory (GB)', 'DBU/hour', 'Rate/hour', 'onDemandLinuxHr']
+    ),
+    's3': (
+        'S3_Storage.xlsx',
+        ['S3_storage', 'Rate/GB']
+    ),
+}
+
+
+def _source_path(name):
+    return os.path.join(BASE_DIR, RATE_CARD_SOURCES[name][0])
+
+
+def _artifact_paths(name):
+    return (
+        os.path.join(CACHE_DIR, f"{name}.arrow"),
+        os.path.join(CACHE_DIR, f"{name}.json"),
+    )
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_manifest(name):
+    _, manifest_path = _artifact_paths(name)
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(name, manifest):
+    _, manifest_path = _artifact_paths(name)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def _parse_source(name):
+    """Parses the source workbook with openpyxl (the slow path)."""
+    _, columns = RATE_CARD_SOURCES[name]
+    return pd.read_excel(_source_path(name), usecols=columns)
+
+
+def compile_frame(name):
+    """
+    Parses one source workbook and writes it to an Arrow IPC file in CACHE_DIR,
+    together with a manifest holding the source hash, size and mtime.
+    Returns the parsed DataFrame.
+    """
+    source_path = _source_path(name)
+    stat = os.stat(source_path)
+    frame = _parse_source(name)
+
+    if pa is None:
+        return frame
+
+    artifact_path, _ = _artifact_paths(name)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        tmp_path = artifact_path + '.tmp'
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, artifact_path)
+        _write_manifest(name, {
+            'source': os.path.basename(source_path),
+            'sha256': _file_sha256(source_path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'rows': len(frame),
+            'columns': list(frame.columns),
+        })
+    except OSError:
+        # Read-only deployments still work, they just keep paying for the xlsx parse
+        pass
+    return frame
+
+
+def _artifact_is_fresh(name, manifest):
+    """
+    Checks the manifest against the source file. A matching size and mtime is
+    trusted as is, otherwise the source is re-hashed so that a touched but
+    unchanged workbook does not trigger a recompile.
+    """
+    artifact_path, _ = _artifact_paths(name)
+    if manifest is None or not os.path.exists(artifact_path):
+        return False
+    if set(manifest.get('columns', [])) != set(RATE_CARD_SOURCES[name][1]):
+        return False
+
+    stat = os.stat(_source_path(name))
+    if manifest.get('size') == stat.st_size and manifest.get('mtime_ns') == stat.st_mtime_ns:
+        return True
+
+    if manifest.get('sha256') != _file_sha256(_source_path(name)):
+        return False
+
+    # Same content, new mtime (e.g. a fresh checkout): refresh the manifest and keep the artifact
+    manifest = dict(manifest, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+    try:
+        _write_manifest(name, manifest)
+    except OSError:
+        pass
+    return True
+
+
+def load_frame(name):
+    """
+    Returns the rate card frame `name` ('rate_card' or 's3').
+    Memory-maps the compiled Arrow artifact when it matches the source workbook
+    and only falls back to parsing the xlsx (and recompiling) when it does not.
+    """
+    if pa is None:
+        return _parse_source(name)
+
+    if _artifact_is_fresh(name, _read_manifest(name)):
+        artifact_path, _ = _artifact_paths(name)
+        try:
+            source = pa.memory_map(artifact_path, 'r')
+            return pa.ipc.open_file(source).read_all().to_pandas()
+        except (OSError, pa.ArrowInvalid):
+            pass  # Corrupt or truncated artifact, rebuild it below
+
+    return compile_frame(name)
+
+
+def source_version():
+    """
+    Cheap identity of the source workbooks (size and mtime, no reads), used to key
+    the once-per-version rate card bootstrap in state.py.
+    """
+    version = []
+    for name in RATE_CARD_SOURCES:
+        try:
+            stat = os.stat(_source_path(name))
+            version.append((name, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            version.append((name, None, None))
+    return tuple(version)
+
+
+def compile_all():
+    """Compiles every rate card workbook. Used as the deploy-time compile step."""
+    return {name: compile_frame(name) for name in RATE_CARD_SOURCES}
+
+
+if __name__ == "__main__":
+    if pa is None:
+        sys.exit("pyarrow is not installed, the rate card cannot be compiled.")
+    for name, frame in compile_all().items():
+        artifact_path, _ = _artifact_paths(name)
+        print(f"{RATE_CARD_SOURCES[name][0]} -> {os.path.relpath(artifact_path, BASE_DIR)} ({len(frame)} rows)")
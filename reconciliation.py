@@ -0,0 +1,385 @@
+# reconciliation.py
+# Reconciles a priced scenario against actual billing exports: Databricks billable usage and
+# the AWS Cost and Usage Report (CSV, Parquet or JSON lines, any size). Exports are streamed
+# in chunks and folded into running group-by sums, so memory depends on the number of
+# (SKU, instance, job) groups rather than on the file size.
+#
+#   python reconciliation.py scenario.json --usage usage/*.csv --cur cur.parquet -o variance.csv
+import argparse
+import glob
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import engine
+import rate_card as rc
+from batch_pricing import load_scenario_file
+from job_importer import read_chunks, read_columns
+
+CHUNK_ROWS = 250_000
+# Partial group-by results kept before they are merged into one
+COMPACT_EVERY = 8
+
+# Accepted column names per field, in priority order; values of all present columns are coalesced.
+# Covers the account console usage download, system.billing.usage exports and CUR (legacy and 2.0).
+USAGE_FIELDS = {
+    'sku': ['sku', 'sku_name'],
+    'instance': ['clusterNodeType', 'node_type', 'usage_metadata.node_type', 'instance_type'],
+    'job': ['job_name', 'usage_metadata.job_name', 'clusterName', 'cluster_name'],
+    'dbus': ['dbus', 'usage_quantity'],
+    'cost': ['cost', 'list_cost', 'usage_usd', 'cost_usd'],
+}
+CUR_FIELDS = {
+    'product': ['lineItem/ProductCode', 'line_item_product_code'],
+    'instance': ['product/instanceType', 'product_instance_type'],
+    'job': [
+        'resourceTags/user:JobName', 'resource_tags_user_job_name',
+        'resourceTags/user:RunName', 'resource_tags_user_run_name',
+        'resourceTags/user:ClusterName', 'resource_tags_user_cluster_name',
+    ],
+    'cost': ['lineItem/UnblendedCost', 'line_item_unblended_cost'],
+}
+UNTAGGED = "(untagged)"
+UNKNOWN = "(unknown)"
+SQL_TIER = "SQL Warehouse"
+UNMATCHED_TIER = "Unmatched"
+
+# Billing SKU (without edition prefix and Photon suffix) -> rate card compute type; " Photon" is appended
+# for Photon SKUs. Types the rate card doesn't have, and SKUs not listed here, are left unpriced.
+SKU_COMPUTE_TYPES = {
+    "JOBS_COMPUTE": "Jobs Compute",
+    "ALL_PURPOSE_COMPUTE": "All-Purpose Compute",
+    "DLT_CORE_COMPUTE": "DLT Core Compute",
+    "DLT_PRO_COMPUTE": "DLT Pro Compute",
+    "DLT_ADVANCED_COMPUTE": "DLT Advanced Compute",
+}
+SKU_EDITIONS = ("STANDARD_", "PREMIUM_", "ENTERPRISE_")
+# Rate cards searched for the (instance, compute type) of unpriced usage; All-Purpose is in the development card
+USAGE_RATE_CARDS = ('JOB_RATE_CARD', 'DEV_RATE_CARD')
+
+VARIANCE_COLUMNS = [
+    "Estimated DBX", "Actual DBX", "Estimated EC2", "Actual EC2",
+    "Estimated Total", "Actual Total", "Variance", "Variance %",
+]
+JOB_VARIANCE_COLUMNS = ["Tier", "Job Name"] + VARIANCE_COLUMNS
+
+
+class GroupAccumulator:
+    """
+    Running group-by sums over a stream of chunks. Each chunk is reduced to one row per
+    group; the partial results are merged every `compact_every` chunks, so memory is
+    bounded by the number of distinct groups.
+    """
+
+    def __init__(self, keys, values, compact_every=COMPACT_EVERY):
+        self.keys = list(keys)
+        self.values = list(values)
+        self.compact_every = compact_every
+        self._parts = []
+
+    def add(self, frame):
+        if frame.empty:
+            return
+        self._parts.append(frame.groupby(self.keys, sort=False)[self.values].sum())
+        if len(self._parts) >= self.compact_every:
+            self._compact()
+
+    def _compact(self):
+        if len(self._parts) > 1:
+            self._parts = [pd.concat(self._parts).groupby(level=self.keys, sort=False).sum()]
+
+    def result(self):
+        """One row per group with the key and value columns."""
+        self._compact()
+        if not self._parts:
+            return pd.DataFrame(columns=self.keys + self.values)
+        return self._parts[0].reset_index()
+
+
+@dataclass(frozen=True)
+class ReconciliationResult:
+    """Actual vs estimated monthly cost per job and per tier."""
+    jobs: pd.DataFrame      # JOB_VARIANCE_COLUMNS
+    tiers: pd.DataFrame     # indexed by tier (plus SQL Warehouse, Unmatched and Total), VARIANCE_COLUMNS
+    usage: pd.DataFrame     # Databricks usage per (SKU, instance, job): DBUs, cost and Unpriced DBUs
+    ec2: pd.DataFrame       # CUR EC2 cost per (instance, job)
+    rows_read: int
+    months: float
+    elapsed_seconds: float
+
+    def by_sku(self):
+        return self.usage.groupby("SKU")[["DBUs", "Cost"]].sum().sort_values("Cost", ascending=False)
+
+    def unpriced(self):
+        """DBUs per SKU that came without a cost and have no price; they are left out of the actuals."""
+        unpriced = self.usage[self.usage["Unpriced DBUs"] > 0]
+        return unpriced.groupby("SKU")["Unpriced DBUs"].sum().sort_values(ascending=False)
+
+    def by_instance(self):
+        dbx = self.usage.groupby("Instance")["Cost"].sum().rename("DBX")
+        ec2 = self.ec2.groupby("Instance")["Cost"].sum().rename("EC2")
+        return pd.concat([dbx, ec2], axis=1).fillna(0).sort_values("DBX", ascending=False)
+
+
+def _field_columns(columns, fields):
+    """{field: [present source columns]} for the fields that the file has."""
+    present = {}
+    for field, aliases in fields.items():
+        matches = [alias for alias in aliases if alias in columns]
+        if matches:
+            present[field] = matches
+    return present
+
+
+def _fields(chunk, present):
+    """One Series per field, coalescing the field's source columns in priority order."""
+    values = {}
+    for field, columns in present.items():
+        value = chunk[columns[0]]
+        for column in columns[1:]:
+            value = value.where(value.notna(), chunk[column])
+        values[field] = value
+    return values
+
+
+def _keys(values, field, fill):
+    if field not in values:
+        return fill
+    text = values[field].astype(str).str.strip()
+    return text.where(values[field].notna() & (text != ""), fill)
+
+
+def _files(paths):
+    files = []
+    for path in paths:
+        files.extend(sorted(glob.glob(path)) or [path])
+    return files
+
+
+def aggregate_usage(paths, chunk_rows=CHUNK_ROWS):
+    """
+    Streams Databricks billable-usage files into DBUs and cost per (SKU, instance, job).
+    'Priced DBUs' are the DBUs whose rows carried a cost; the rest are priced later.
+    Returns (aggregate, rows read).
+    """
+    accumulator = GroupAccumulator(["SKU", "Instance", "Job"], ["DBUs", "Priced DBUs", "Cost"])
+    rows_read = 0
+    for path in _files(paths):
+        present = _field_columns(read_columns(path), USAGE_FIELDS)
+        if 'dbus' not in present:
+            raise ValueError(f"{path}: no DBU column (expected one of {USAGE_FIELDS['dbus']})")
+        columns = [column for names in present.values() for column in names]
+        for chunk in read_chunks(path, chunk_rows=chunk_rows, columns=columns):
+            rows_read += len(chunk)
+            values = _fields(chunk, present)
+            dbus = pd.to_numeric(values['dbus'], errors='coerce').fillna(0)
+            cost = pd.to_numeric(values['cost'], errors='coerce') if 'cost' in values else pd.Series(np.nan, index=chunk.index)
+            accumulator.add(pd.DataFrame({
+                "SKU": _keys(values, 'sku', UNKNOWN),
+                "Instance": _keys(values, 'instance', UNKNOWN),
+                "Job": _keys(values, 'job', UNTAGGED),
+                "DBUs": dbus,
+                "Priced DBUs": dbus.where(cost.notna(), 0),
+                "Cost": cost.fillna(0),
+            }, index=chunk.index))
+    return accumulator.result(), rows_read
+
+
+def aggregate_cur(paths, chunk_rows=CHUNK_ROWS):
+    """Streams AWS CUR files into EC2 instance cost per (instance, job tag). Returns (aggregate, rows read)."""
+    accumulator = GroupAccumulator(["Instance", "Job"], ["Cost"])
+    rows_read = 0
+    for path in _files(paths):
+        present = _field_columns(read_columns(path), CUR_FIELDS)
+        if 'cost' not in present or 'instance' not in present:
+            raise ValueError(f"{path}: CUR files need cost and instance type columns")
+        columns = [column for names in present.values() for column in names]
+        for chunk in read_chunks(path, chunk_rows=chunk_rows, columns=columns):
+            rows_read += len(chunk)
+            values = _fields(chunk, present)
+            # EC2 instance usage only: rows with an instance type, from AmazonEC2 when the product is known
+            keep = values['instance'].notna()
+            if 'product' in values:
+                keep &= values['product'].astype(str) == "AmazonEC2"
+            accumulator.add(pd.DataFrame({
+                "Instance": _keys(values, 'instance', UNKNOWN),
+                "Job": _keys(values, 'job', UNTAGGED),
+                "Cost": pd.to_numeric(values['cost'], errors='coerce').fillna(0),
+            }, index=chunk.index)[keep])
+    return accumulator.result(), rows_read
+
+
+def sku_compute_type(sku):
+    """Rate card compute type of a billing SKU ("PREMIUM_JOBS_COMPUTE_(PHOTON)" -> "Jobs Compute Photon"), None if unknown."""
+    name = "_".join(part for part in "".join(c if c.isalnum() else " " for c in str(sku).upper()).split())
+    photon = name.endswith("_PHOTON")
+    name = name.removesuffix("_PHOTON")
+    for edition in SKU_EDITIONS:
+        name = name.removeprefix(edition)
+    compute_type = SKU_COMPUTE_TYPES.get(name)
+    if compute_type is None:
+        return None
+    return compute_type + " Photon" if photon else compute_type
+
+
+def price_usage(usage, rate_card, sql_price_per_dbu=0.0):
+    """
+    Adds list cost for the DBUs that came without one: job compute at the rate card $/DBU
+    (Rate/hour over DBU/hour) of the instance and the SKU's compute type, SQL SKUs at
+    `sql_price_per_dbu`. DBUs with no such price are not guessed: they are kept as
+    'Unpriced DBUs' (SKUs with no compute type, unknown instances, SQL with no price).
+    """
+    usage = usage.copy()
+    skus, sku_codes = np.unique(usage["SKU"].astype(str).to_numpy(), return_inverse=True)
+    compute_types = np.array([sku_compute_type(sku) for sku in skus], dtype=object)[sku_codes]
+    instances = usage["Instance"].to_numpy()
+    price_per_dbu = np.zeros(len(usage))
+    for key in USAGE_RATE_CARDS:
+        card = rate_card.get(key)
+        if card is None:
+            continue
+        rows = card.lookup(card.instance_ids(instances), card.compute_type_ids(compute_types))
+        dbu_per_hour = card.take('dbu_per_hour', rows)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            card_price = np.where(dbu_per_hour > 0, card.take('rate_per_hour', rows) / dbu_per_hour, 0.0)
+        price_per_dbu = np.where(rows >= 0, card_price, price_per_dbu)
+    is_sql = usage["SKU"].str.contains("SQL", case=False).to_numpy()
+    price_per_dbu = np.where(is_sql, sql_price_per_dbu, price_per_dbu)
+    unpriced_dbus = usage["DBUs"] - usage["Priced DBUs"]
+    usage["Cost"] = usage["Cost"] + unpriced_dbus * price_per_dbu
+    usage["Unpriced DBUs"] = unpriced_dbus.where(price_per_dbu <= 0, 0.0)
+    usage["SQL"] = is_sql
+    return usage
+
+
+def _job_key(names):
+    return names.astype(str).str.strip().str.casefold()
+
+
+def _add_variance(frame):
+    frame["Estimated Total"] = frame["Estimated DBX"] + frame["Estimated EC2"]
+    frame["Actual Total"] = frame["Actual DBX"] + frame["Actual EC2"]
+    frame["Variance"] = frame["Actual Total"] - frame["Estimated Total"]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frame["Variance %"] = np.where(
+            frame["Estimated Total"] > 0, frame["Variance"] / frame["Estimated Total"] * 100, np.nan
+        )
+    return frame
+
+
+def reconcile(result, usage, ec2, months=1):
+    """
+    Joins actual usage (aggregates from aggregate_usage/price_usage and aggregate_cur)
+    onto the estimate of a priced scenario (engine.ScenarioResult, the same figures as
+    calculate_databricks_costs_for_tier and engine.price_sql_warehouses) by job name.
+    Actuals are divided by `months` to compare with the monthly estimate.
+    Returns (jobs, tiers) variance tables.
+    """
+    estimated = [
+        pd.DataFrame({
+            "Tier": tier,
+            "Job Name": tier_result.df["Job Name"].astype(str).to_numpy(),
+            "Estimated DBX": pd.to_numeric(tier_result.df["DBX"], errors='coerce').fillna(0).to_numpy(),
+            "Estimated EC2": pd.to_numeric(tier_result.df["EC2"], errors='coerce').fillna(0).to_numpy(),
+        })
+        for tier, tier_result in result.tiers.items() if not tier_result.df.empty
+    ]
+    estimated = pd.concat(estimated, ignore_index=True) if estimated else pd.DataFrame(
+        columns=["Tier", "Job Name", "Estimated DBX", "Estimated EC2"]
+    )
+    # Jobs sharing a name are reconciled together, under the first tier they appear in
+    estimated["Key"] = _job_key(estimated["Job Name"])
+    estimated = estimated.groupby("Key", sort=False).agg({
+        "Tier": "first", "Job Name": "first", "Estimated DBX": "sum", "Estimated EC2": "sum",
+    })
+
+    jobs_usage = usage[~usage["SQL"]]
+    actual_dbx = jobs_usage.groupby(_job_key(jobs_usage["Job"]))["Cost"].sum().rename("Actual DBX") / months
+    actual_ec2 = ec2.groupby(_job_key(ec2["Job"]))["Cost"].sum().rename("Actual EC2") / months
+    names = pd.concat([jobs_usage.groupby(_job_key(jobs_usage["Job"]))["Job"].first(), ec2.groupby(_job_key(ec2["Job"]))["Job"].first()])
+    names = names[~names.index.duplicated()]
+
+    jobs = estimated.join([actual_dbx, actual_ec2], how='outer')
+    unmatched = jobs["Tier"].isna()
+    jobs.loc[unmatched, "Job Name"] = names.reindex(jobs.index[unmatched]).to_numpy()
+    jobs["Tier"] = jobs["Tier"].fillna(UNMATCHED_TIER)
+    jobs[VARIANCE_COLUMNS[:4]] = jobs[VARIANCE_COLUMNS[:4]].astype(float).fillna(0)
+
+    sql_actual = usage.loc[usage["SQL"], "Cost"].sum() / months
+    sql_row = pd.DataFrame([{
+        "Tier": SQL_TIER, "Job Name": "All warehouses",
+        "Estimated DBX": result.sql.total_cost, "Actual DBX": sql_actual, "Estimated EC2": 0.0, "Actual EC2": 0.0,
+    }])
+    jobs = _add_variance(pd.concat([jobs.reset_index(drop=True), sql_row], ignore_index=True))
+
+    tier_order = list(result.tiers) + [SQL_TIER, UNMATCHED_TIER]
+    tiers = jobs.groupby("Tier")[VARIANCE_COLUMNS[:4]].sum().reindex(tier_order).dropna(how='all')
+    tiers.loc["Total"] = tiers.sum()
+    tiers = _add_variance(tiers)
+
+    jobs["Tier"] = pd.Categorical(jobs["Tier"], categories=tier_order, ordered=True)
+    jobs = jobs.sort_values(["Tier", "Variance"], key=lambda s: s.abs() if s.name == "Variance" else s, ascending=[True, False])
+    jobs["Tier"] = jobs["Tier"].astype(str)
+    return jobs[JOB_VARIANCE_COLUMNS].reset_index(drop=True), tiers[VARIANCE_COLUMNS]
+
+
+def reconcile_files(result, rate_card, usage_paths=(), cur_paths=(), months=1, chunk_rows=CHUNK_ROWS):
+    """Streams the usage and CUR exports and reconciles them against a priced scenario."""
+    start = time.perf_counter()
+    usage, usage_rows = aggregate_usage(usage_paths, chunk_rows) if usage_paths else (
+        pd.DataFrame(columns=["SKU", "Instance", "Job", "DBUs", "Priced DBUs", "Cost"]), 0
+    )
+    ec2, cur_rows = aggregate_cur(cur_paths, chunk_rows) if cur_paths else (
+        pd.DataFrame(columns=["Instance", "Job", "Cost"]), 0
+    )
+    sql_price_per_dbu = result.sql.total_cost / result.sql.total_dbus if result.sql.total_dbus else 0.0
+    usage = price_usage(usage, rate_card, sql_price_per_dbu)
+    jobs, tiers = reconcile(result, usage, ec2, months)
+    return ReconciliationResult(
+        jobs=jobs,
+        tiers=tiers,
+        usage=usage.drop(columns=["Priced DBUs", "SQL"]),
+        ec2=ec2,
+        rows_read=usage_rows + cur_rows,
+        months=months,
+        elapsed_seconds=time.perf_counter() - start,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reconcile a scenario's estimate against billing exports.")
+    parser.add_argument('scenario', help="Scenario file (JSON, YAML or CSV), as for batch_pricing.py.")
+    parser.add_argument('--usage', nargs='*', default=[], help="Databricks billable-usage exports or glob patterns.")
+    parser.add_argument('--cur', nargs='*', default=[], help="AWS Cost and Usage Report exports or glob patterns.")
+    parser.add_argument('--months', type=float, default=1, help="Months covered by the exports.")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help="Rows read per chunk.")
+    parser.add_argument('-o', '--output', help="Per-job variance file, .csv or .parquet.")
+    args = parser.parse_args(argv)
+    if not args.usage and not args.cur:
+        parser.error("give at least one --usage or --cur file")
+
+    rate_card = rc.load_rate_card()
+    result = engine.price_scenario(load_scenario_file(args.scenario), rate_card)
+    reconciliation = reconcile_files(result, rate_card, args.usage, args.cur, args.months, args.chunk_rows)
+
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.float_format', '{:,.2f}'.format):
+        print(reconciliation.tiers)
+    unpriced = reconciliation.unpriced()
+    if not unpriced.empty:
+        print(f"{unpriced.sum():,.2f} DBUs came without a cost and have no price (SKU without a rate card "
+              f"compute type, unknown instance, or SQL with no warehouses in the scenario); left out of Actual:")
+        print(unpriced.to_string(float_format='{:,.2f}'.format))
+    print(f"{reconciliation.rows_read:,} export rows in {reconciliation.elapsed_seconds:.2f}s")
+    if args.output:
+        if args.output.endswith('.parquet'):
+            reconciliation.jobs.to_parquet(args.output, index=False)
+        else:
+            reconciliation.jobs.to_csv(args.output, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
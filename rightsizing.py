@@ -0,0 +1,156 @@
+# rightsizing.py
+# Instance right-sizing: for every job, the cheapest instance of the same compute type (and
+# its node count) that still gives the job's current cluster vCPU and memory. All jobs of a
+# compute type are solved at once as a (jobs x candidate instances) array. Headless, like engine.py.
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Upper bound on jobs x candidates evaluated at once
+BATCH_ELEMENTS = 4_000_000
+# Suggestions saving less than this ($/month) are not worth a change
+MIN_SAVINGS = 0.01
+
+SUGGESTION_COLUMNS = [
+    "Job Name", "Instance Type", "Nodes", "Monthly Cost",
+    "Suggested Instance", "Suggested Nodes", "Suggested Cost", "Savings", "Savings %",
+]
+
+
+@dataclass(frozen=True)
+class CandidateSet:
+    """Instance labels of one compute type, sorted by vCPU then memory, with their rates."""
+    labels: np.ndarray
+    vcpu: np.ndarray
+    memory_gb: np.ndarray
+    rate_per_hour: np.ndarray
+    ec2_per_hour: np.ndarray
+
+
+def _dominated(vcpu, memory_gb, rate_per_hour, ec2_per_hour):
+    """
+    Candidates that can never be the cheapest: another one is at least as large and at
+    most as expensive (per hour and EC2), so it needs no more nodes at no higher cost.
+    Among identical candidates the first one (the smaller, after sorting) is kept.
+    """
+    at_least = (
+        (vcpu[None, :] >= vcpu[:, None]) & (memory_gb[None, :] >= memory_gb[:, None])
+        & (rate_per_hour[None, :] <= rate_per_hour[:, None]) & (ec2_per_hour[None, :] <= ec2_per_hour[:, None])
+    )
+    strictly = (
+        (vcpu[None, :] > vcpu[:, None]) | (memory_gb[None, :] > memory_gb[:, None])
+        | (rate_per_hour[None, :] < rate_per_hour[:, None]) | (ec2_per_hour[None, :] < ec2_per_hour[:, None])
+        | np.tri(len(vcpu), k=-1, dtype=bool)
+    )
+    return (at_least & strictly).any(axis=1)
+
+
+def build_index(rate_card):
+    """
+    {compute type: CandidateSet} from the loaded rate card (the dict built by
+    rate_card.build_global_data). Labels are priced the way the engine prices them,
+    through JOB_RATE_CARD.label_rows, so suggested costs match the tier totals.
+    Instances without vCPU or memory data cannot be sized and are left out, and so are
+    instances dominated by a larger, cheaper one, which keeps the search arrays small.
+    """
+    card = rate_card['JOB_RATE_CARD']
+    index = {}
+    for compute_type, labels in rate_card.get('INSTANCE_PRICES', {}).items():
+        labels = np.array(list(labels), dtype=object)
+        rows = card.label_rows(labels)
+        vcpu = card.take('vcpu', rows)
+        memory_gb = card.take('memory_gb', rows)
+        rate_per_hour = card.take('rate_per_hour', rows)
+        ec2_per_hour = card.take('ec2_per_hour', rows)
+
+        usable = np.flatnonzero((rows >= 0) & (vcpu > 0) & (memory_gb > 0))
+        order = usable[np.lexsort((memory_gb[usable], vcpu[usable]))]
+        keep = order[~_dominated(vcpu[order], memory_gb[order], rate_per_hour[order], ec2_per_hour[order])]
+        index[compute_type] = CandidateSet(
+            labels=labels[keep],
+            vcpu=vcpu[keep],
+            memory_gb=memory_gb[keep],
+            rate_per_hour=rate_per_hour[keep],
+            ec2_per_hour=ec2_per_hour[keep],
+        )
+    return index
+
+
+def _cheapest(candidates, required_vcpu, required_memory, monthly_hours):
+    """Best candidate position and node count (driver included) per job, for one compute type."""
+    best_position = np.zeros(len(required_vcpu), dtype=int)
+    best_count = np.zeros(len(required_vcpu))
+    best_cost = np.zeros(len(required_vcpu))
+    batch = max(1, BATCH_ELEMENTS // max(len(candidates.labels), 1))
+    for start in range(0, len(required_vcpu), batch):
+        part = slice(start, start + batch)
+        # Smallest cluster of each candidate that covers both the vCPU and memory requirement
+        count = np.maximum(
+            np.ceil(required_vcpu[part, None] / candidates.vcpu[None, :]),
+            np.ceil(required_memory[part, None] / candidates.memory_gb[None, :]),
+        )
+        count = np.maximum(count, 1)
+        cost = count * (candidates.rate_per_hour[None, :] * monthly_hours[part, None] + candidates.ec2_per_hour[None, :])
+        # Candidates are sorted by size, so ties go to the smaller instance
+        position = cost.argmin(axis=1)
+        rows = np.arange(len(position))
+        best_position[part] = position
+        best_count[part] = count[rows, position]
+        best_cost[part] = cost[rows, position]
+    return best_position, best_count, best_cost
+
+
+def suggest_instances(jobs_df, rate_card, index=None):
+    """
+    Right-sizing suggestions for a tier's jobs, one row per job (same index as `jobs_df`).
+    The requirement is the job's current cluster, (Nodes + 1) x the instance's vCPU and memory;
+    costs use the engine formula rate * (Nodes + 1) * runtime * runs + ec2 * (Nodes + 1).
+    Jobs on an instance without size data, or with no cheaper option, get no suggestion (NaN).
+    """
+    if index is None:
+        index = build_index(rate_card)
+    card = rate_card['JOB_RATE_CARD']
+    suggestions = pd.DataFrame(index=jobs_df.index, columns=SUGGESTION_COLUMNS)
+    if jobs_df.empty:
+        return suggestions
+
+    rows = card.label_rows(jobs_df['Instance Type'].to_numpy())
+    node_count = pd.to_numeric(jobs_df["Nodes"], errors='coerce').fillna(0).to_numpy(dtype=float) + 1
+    monthly_hours = (
+        pd.to_numeric(jobs_df["Runtime (hrs)"], errors='coerce').fillna(0).to_numpy(dtype=float)
+        * pd.to_numeric(jobs_df["Runs/Month"], errors='coerce').fillna(0).to_numpy(dtype=float)
+    )
+    current_cost = node_count * (card.take('rate_per_hour', rows) * monthly_hours + card.take('ec2_per_hour', rows))
+    required_vcpu = node_count * card.take('vcpu', rows)
+    required_memory = node_count * card.take('memory_gb', rows)
+
+    suggested_label = np.full(len(jobs_df), None, dtype=object)
+    suggested_count = np.full(len(jobs_df), np.nan)
+    suggested_cost = np.full(len(jobs_df), np.nan)
+
+    compute_types = jobs_df['Compute type'].to_numpy()
+    sizable = (rows >= 0) & (required_vcpu > 0) & (required_memory > 0)
+    for compute_type in pd.unique(compute_types[sizable]):
+        candidates = index.get(compute_type)
+        if candidates is None or len(candidates.labels) == 0:
+            continue
+        jobs = np.flatnonzero(sizable & (compute_types == compute_type))
+        position, count, cost = _cheapest(candidates, required_vcpu[jobs], required_memory[jobs], monthly_hours[jobs])
+        suggested_label[jobs] = candidates.labels[position]
+        suggested_count[jobs] = count
+        suggested_cost[jobs] = cost
+
+    savings = current_cost - suggested_cost
+    better = savings >= MIN_SAVINGS
+    suggestions["Job Name"] = jobs_df["Job Name"].to_numpy() if "Job Name" in jobs_df else None
+    suggestions["Instance Type"] = jobs_df['Instance Type'].to_numpy()
+    suggestions["Nodes"] = node_count - 1
+    suggestions["Monthly Cost"] = current_cost
+    suggestions["Suggested Instance"] = np.where(better, suggested_label, None)
+    suggestions["Suggested Nodes"] = np.where(better, suggested_count - 1, np.nan)
+    suggestions["Suggested Cost"] = np.where(better, suggested_cost, np.nan)
+    suggestions["Savings"] = np.where(better, savings, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        suggestions["Savings %"] = np.where(better & (current_cost > 0), savings / current_cost * 100, np.nan)
+    return suggestions
@@ -0,0 +1,185 @@
+# simulation.py
+# Monte Carlo uncertainty mode for Databricks jobs. Each job can carry a distribution for
+# its runtime and runs per month; costs are sampled in batched NumPy arrays and reduced to
+# P50/P90/P99 per tier and in total. Headless, like engine.py.
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+DISTRIBUTIONS = ["Fixed", "Uniform", "Triangular", "Lognormal"]
+# Optional job columns read by the simulation. Missing columns/values mean "Fixed".
+UNCERTAINTY_COLUMNS = ["Distribution", "Runtime Min (hrs)", "Runtime Max (hrs)", "Runs Min", "Runs Max"]
+PERCENTILES = (50, 90, 99)
+DEFAULT_SAMPLES = 5_000
+# Upper bound on samples x jobs drawn at once, keeps each batch at a few tens of MB
+BATCH_ELEMENTS = 2_000_000
+# Lognormal fit: Min/Max are read as the P10/P90 of the distribution, the point value as its median
+Z_P90 = 1.2815515655446004
+
+
+@dataclass(frozen=True)
+class SimulationResult:
+    """Percentiles of the monthly Databricks cost (DBX + EC2) per tier and in total."""
+    # One row per tier plus 'Total', columns 'Mean' and 'P50', 'P90', 'P99'
+    percentiles: pd.DataFrame
+    samples: int
+    uncertain_jobs: int
+    elapsed_seconds: float
+
+    def total(self, percentile):
+        return self.percentiles.at['Total', f"P{percentile}"]
+
+
+def _numeric(df, column, default):
+    if column not in df:
+        return np.full(len(df), default, dtype=float)
+    return pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float)
+
+
+def _bounds(point, low, high):
+    """Missing bounds collapse onto the point value; bounds are ordered around it."""
+    low = np.where(np.isnan(low), point, np.minimum(low, point))
+    high = np.where(np.isnan(high), point, np.maximum(high, point))
+    return low, high
+
+
+def _lognormal_sigma(point, low, high):
+    """Sigma of a lognormal with median `point` and P10/P90 at `low`/`high` (averaged if both are given)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        upper = np.where((high > point) & (point > 0), np.log(high / point) / Z_P90, np.nan)
+        lower = np.where((low < point) & (low > 0), np.log(point / low) / Z_P90, np.nan)
+    fits = np.vstack([upper, lower])
+    given = np.isfinite(fits).sum(axis=0)
+    return np.where(given > 0, np.nansum(fits, axis=0) / np.maximum(given, 1), 0.0)
+
+
+def _uniform(u, low, high):
+    """Scales standard uniforms onto [low, high] per column, in place."""
+    u *= (high - low).astype(np.float32)
+    u += low.astype(np.float32)
+    return u
+
+
+def _triangular(u, v, low, mode, high):
+    """
+    Triangular samples per column, in place on `u`: for two standard uniforms,
+    (1 - c) * min + c * max is triangular on [0, 1] with mode c.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        c = np.where(high > low, (mode - low) / (high - low), 0.0).astype(np.float32)
+    smaller = np.minimum(u, v)
+    np.maximum(u, v, out=u)
+    u *= c
+    smaller *= 1 - c
+    u += smaller
+    return _uniform(u, low, high)
+
+
+def job_parameters(jobs_df, rate_card):
+    """
+    Per-job arrays for the simulation: the cost of one node-hour set (rate * (Nodes + 1)),
+    the fixed EC2 cost (ec2 * (Nodes + 1)), point values, bounds and the distribution.
+    """
+    rows = rate_card.label_rows(jobs_df['Instance Type'].to_numpy())
+    node_count = _numeric(jobs_df, "Nodes", 0) + 1
+    runtime = _numeric(jobs_df, "Runtime (hrs)", 0)
+    runs = _numeric(jobs_df, "Runs/Month", 0)
+    runtime_low, runtime_high = _bounds(runtime, _numeric(jobs_df, "Runtime Min (hrs)", np.nan), _numeric(jobs_df, "Runtime Max (hrs)", np.nan))
+    runs_low, runs_high = _bounds(runs, _numeric(jobs_df, "Runs Min", np.nan), _numeric(jobs_df, "Runs Max", np.nan))
+
+    distribution = (
+        jobs_df["Distribution"].fillna("Fixed").astype(str).to_numpy()
+        if "Distribution" in jobs_df else np.full(len(jobs_df), "Fixed")
+    )
+    return {
+        'hourly': rate_card.take('rate_per_hour', rows) * node_count,
+        'fixed': rate_card.take('ec2_per_hour', rows) * node_count,
+        'runtime': runtime, 'runtime_low': runtime_low, 'runtime_high': runtime_high,
+        'runs': runs, 'runs_low': runs_low, 'runs_high': runs_high,
+        'distribution': distribution,
+    }
+
+
+def _draw_batch(rng, params, distribution, size):
+    """Samples of runtime * runs for the jobs in `params` (all with `distribution`), shape `size`."""
+    p = params
+    if distribution == "Lognormal":
+        # Product of two lognormals is lognormal: one normal draw per job and sample
+        sigma = np.sqrt(
+            _lognormal_sigma(p['runtime'], p['runtime_low'], p['runtime_high']) ** 2
+            + _lognormal_sigma(p['runs'], p['runs_low'], p['runs_high']) ** 2
+        ).astype(np.float32)
+        z = rng.standard_normal(size, dtype=np.float32)
+        z *= sigma
+        np.exp(z, out=z)
+        return z * (p['runtime'] * p['runs']).astype(np.float32)
+
+    runtime = rng.random(size, dtype=np.float32)
+    runs = rng.random(size, dtype=np.float32)
+    if distribution == "Triangular":
+        _triangular(runtime, rng.random(size, dtype=np.float32), p['runtime_low'], p['runtime'], p['runtime_high'])
+        _triangular(runs, rng.random(size, dtype=np.float32), p['runs_low'], p['runs'], p['runs_high'])
+    else:  # Uniform
+        _uniform(runtime, p['runtime_low'], p['runtime_high'])
+        _uniform(runs, p['runs_low'], p['runs_high'])
+    runtime *= runs
+    return runtime
+
+
+def simulate_costs(dbx_jobs, rate_card, active_tiers=None, samples=DEFAULT_SAMPLES, seed=0):
+    """
+    Monte Carlo of the monthly Databricks cost. `dbx_jobs` maps tier -> jobs DataFrame
+    and `rate_card` is the job RateCard. Uses the same formula as engine.price_databricks_tier
+    (DBX = rate * (Nodes + 1) * runtime * runs, EC2 = ec2 * (Nodes + 1)) with runtime and
+    runs drawn per job and sample. Jobs without a distribution add their point cost.
+    """
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    tiers = list(active_tiers) if active_tiers is not None else list(dbx_jobs)
+
+    tier_samples = np.zeros((samples, len(tiers)))
+    uncertain_jobs = 0
+    for t, tier in enumerate(tiers):
+        jobs_df = dbx_jobs.get(tier)
+        if jobs_df is None or len(jobs_df) == 0:
+            continue
+        params = job_parameters(jobs_df, rate_card)
+        point_cost = params['hourly'] * params['runtime'] * params['runs'] + params['fixed']
+
+        for distribution in DISTRIBUTIONS[1:]:
+            mask = params['distribution'] == distribution
+            if distribution != "Lognormal":
+                # Jobs whose bounds all equal the point values have nothing to sample
+                mask &= (params['runtime_low'] < params['runtime_high']) | (params['runs_low'] < params['runs_high'])
+            if not mask.any():
+                continue
+            uncertain_jobs += int(mask.sum())
+            point_cost[mask] = params['fixed'][mask]
+            subset = {k: v[mask] for k, v in params.items()}
+            hourly = subset['hourly'].astype(np.float32)
+
+            batch = max(1, BATCH_ELEMENTS // len(hourly))
+            for offset in range(0, samples, batch):
+                size = (min(batch, samples - offset), len(hourly))
+                hours = _draw_batch(rng, subset, distribution, size)
+                tier_samples[offset:offset + size[0], t] += hours @ hourly
+
+        tier_samples[:, t] += point_cost.sum()
+
+    totals = tier_samples.sum(axis=1)
+    all_samples = np.column_stack([tier_samples, totals])
+    percentiles = pd.DataFrame(
+        np.percentile(all_samples, PERCENTILES, axis=0).T,
+        index=tiers + ['Total'],
+        columns=[f"P{p}" for p in PERCENTILES],
+    )
+    percentiles.insert(0, 'Mean', all_samples.mean(axis=0))
+
+    return SimulationResult(
+        percentiles=percentiles,
+        samples=samples,
+        uncertain_jobs=uncertain_jobs,
+        elapsed_seconds=time.perf_counter() - start,
+    )
@@ -1,31 +1,29 @@
 # state.py
 import streamlit as st
 import pandas as pd
+import rate_card_cache
+import rate_card as rc
+import tracing
 
 TIERS = ["L0 / Raw", "L1 / Curated", "L2 / Data Product"]
 
+# Rate card work done by this process. A warm rerun must leave these unchanged.
+BOOTSTRAP_COUNTERS = {'rate_card_loads': 0, 'global_data_builds': 0}
 
-@st.cache_data
-def load_rate_card_data():
-    """Loads the Databricks rate card from a specific Excel file."""
+
+@st.cache_data(show_spinner=False, max_entries=2)
+@tracing.traced
+def load_rate_card_data(source_version=None):
+    """
+    Loads the Databricks rate card from a specific Excel file.
+    `source_version` (rate_card_cache.source_version()) keys the cache, so an edited workbook is reloaded.
+    """
+    BOOTSTRAP_COUNTERS['rate_card_loads'] += 1
     try:
-        data = pd.read_excel(
-            'final_out.xlsx',
-            usecols=['Compute type', 'Instance', 'vCPU', 'Memory (GB)', 'DBU/hour', 'Rate/hour', 'onDemandLinuxHr']
-        ) 
-        s3_data = pd.read_excel(
-            'S3_Storage.xlsx',
-            usecols=['S3_storage', 'Rate/GB']
-        )
-        # data for Databricks Jobs/Pipelines
-        df = data[data['Compute type'].isin([ 'DLT Advanced Compute Photon', 'Jobs Compute', 'Jobs Compute Photon', 'DLT Advanced Compute'])] # Filter for Photon and All-Purpose compute types
-        # data for SQL Warehouses
-        df_sql = data[data['Compute type'].isin(['SQL Pro Compute', 'SQL Compute'])]
-       # data for develoment cost
-        df_dev = data[data['Compute type'].isin(['All-Purpose Compute'])]
-        # s3 df
-        s3_df = s3_data.copy()
-        print(s3_df)
+        # Served from the compiled Arrow artifact when it is up to date with the workbooks
+        data = rate_card_cache.load_frame('rate_card')
+        s3_data = rate_card_cache.load_frame('s3')
+        df, df_sql, df_dev, s3_df = rc.split_rate_card(data, s3_data)
         if df.empty or df_sql.empty or df_dev.empty or s3_df.empty:
             st.error("The data is empty or invalid.")
             return None, None, None, None
@@ -39,128 +37,47 @@ def load_rate_card_data():
     
 
 
+@tracing.traced
 def populate_global_data(df, df_sql, df_dev, s3_df):
     """
-    Populates global dictionaries and lists from the loaded DataFrame.
-    This includes grouping instances by their compute type.
+    Builds the read-only global_data dict (lookups by rate_card.build_global_data) from the
+    loaded DataFrames. Callers read it through st.session_state.global_data.
     """
-    global FLAT_RATE_CARD, FLAT_INSTANCE_LIST, INSTANCE_PRICES, COMPUTE_TYPE_LIST, SQL_WAREHOUSE_SIZES_BY_TYPE, SQL_WAREHOUSE_TYPES_FROM_DATA
-
-    FLAT_RATE_CARD = {
-        row['Instance']: row for _, row in df.iterrows()
-    }
-    FLAT_INSTANCE_LIST = {
-        f"{row['Instance']} | {row['vCPU']} CPUs | {row['Memory (GB)']}GB": row['Instance']
-        for _, row in df.iterrows()
-    }
-
-    COMPUTE_TYPE_LIST = df['Compute type'].unique().tolist()
-    
-    INSTANCE_PRICES = {}
-    for compute_type, group in df.groupby('Compute type'):
-        INSTANCE_PRICES[compute_type] = {
-            f"{row['Instance']} | {row['vCPU']} CPUs | {row['Memory (GB)']}GB": row['Instance']
-            for _, row in group.iterrows()
-        }
-    # === SQL Warehouse Data - Updated Logic ===
-    # Create a mapping from the old names to the new ones
-    type_name_map = {
-        'SQL Compute': 'SQL Compute',
-        'SQL Pro Compute': 'SQL Pro Compute'
-    }
-    
-    seen_types = set()
-    SQL_WAREHOUSE_TYPES_FROM_DATA = []
-    
-    for t in df_sql['Compute type'].unique().tolist():
-        new_name = type_name_map.get(t, t)
-        if new_name not in seen_types:
-            SQL_WAREHOUSE_TYPES_FROM_DATA.append(new_name)
-            seen_types.add(new_name)
-    
-    SQL_RATES_BY_TYPE_AND_INSTANCE = {}
-    SQL_WAREHOUSE_SIZES_BY_TYPE = {}
-    SQL_FLAT_INSTANCE_LIST = {}
-
-    for _, row in df_sql.iterrows():
-        compute_type_original = row['Compute type']
-        compute_type_mapped = type_name_map.get(compute_type_original, compute_type_original)
-        instance_name = row['Instance']
-        formatted_size_string = f"{instance_name} - {row['DBU/hour']} DBUs - ${row['Rate/hour']}/hr"
-        
-        # 1. Populate the nested rate card
-        if compute_type_mapped not in SQL_RATES_BY_TYPE_AND_INSTANCE:
-            SQL_RATES_BY_TYPE_AND_INSTANCE[compute_type_mapped] = {}
-        SQL_RATES_BY_TYPE_AND_INSTANCE[compute_type_mapped][instance_name] = row.to_dict()
-
-        # 2. Populate the sizes for the UI dropdown
-        if compute_type_mapped not in SQL_WAREHOUSE_SIZES_BY_TYPE:
-            SQL_WAREHOUSE_SIZES_BY_TYPE[compute_type_mapped] = {}
-        SQL_WAREHOUSE_SIZES_BY_TYPE[compute_type_mapped][formatted_size_string] = instance_name
+    return rc.freeze_rate_card(rc.build_global_data(df, df_sql, df_dev, s3_df))
 
-        # 3. Populate the flat list for calculation lookups
-        SQL_FLAT_INSTANCE_LIST[formatted_size_string] = instance_name
-
-        #==> Deveplopment Cost Data
-    FLAT_RATE_CARD_DEV = {
-        row['Instance']: row for _, row in df_dev.iterrows()
-    }
-    FLAT_INSTANCE_LIST_DEV= {
-        f"{row['Instance']} | {row['DBU/hour']} DBUs | {row['Rate/hour']}/hr": row['Instance']
-        for _, row in df_dev.iterrows()
-    }
-    
-    # S3 Pricing Data
-    s3_pricing = {row['S3_storage']: {'storage_gb': row['Rate/GB']} for _, row in s3_df.iterrows()}
-
-    return {
-        'FLAT_RATE_CARD': FLAT_RATE_CARD,
-        'FLAT_INSTANCE_LIST': FLAT_INSTANCE_LIST,
-        'INSTANCE_PRICES': INSTANCE_PRICES,
-        'COMPUTE_TYPE_LIST': COMPUTE_TYPE_LIST,
-        
-        # Store the new tier-specific data for Jobs/Pipelines
-        'COMPUTE_TYPES_L0_L1': df[df['Compute type'].isin(['DLT Advanced Compute Photon', 'DLT Advanced Compute'])]['Compute type'].unique().tolist(),
-        'INSTANCE_PRICES_L0_L1': {ct: {f"{row['Instance']} | {row['vCPU']} CPUs | {row['Memory (GB)']}GB": row['Instance'] for _, row in group.iterrows()} for ct, group in df[df['Compute type'].isin(['DLT Advanced Compute Photon', 'DLT Advanced Compute'])].groupby('Compute type')},
-        'COMPUTE_TYPES_L2': df[df['Compute type'].isin(['Jobs Compute', 'Jobs Compute Photon'])]['Compute type'].unique().tolist(),
-        'INSTANCE_PRICES_L2': {ct: {f"{row['Instance']} | {row['vCPU']} CPUs | {row['Memory (GB)']}GB": row['Instance'] for _, row in group.iterrows()} for ct, group in df[df['Compute type'].isin(['Jobs Compute', 'Jobs Compute Photon'])].groupby('Compute type')},
-
-        # Add the new SQL Warehouse data here
-    #     'SQL_FLAT_RATE_CARD': SQL_FLAT_RATE_CARD,
-    #     'SQL_FLAT_INSTANCE_LIST': SQL_FLAT_INSTANCE_LIST,
-    #     'SQL_WAREHOUSE_TYPES_FROM_DATA': SQL_WAREHOUSE_TYPES_FROM_DATA,
-    #     'SQL_WAREHOUSE_SIZES_BY_TYPE': SQL_WAREHOUSE_SIZES_BY_TYPE
-    # }
-        # ... other return values ...
-        'SQL_RATES_BY_TYPE_AND_INSTANCE': SQL_RATES_BY_TYPE_AND_INSTANCE,
-        'SQL_FLAT_INSTANCE_LIST': SQL_FLAT_INSTANCE_LIST,
-        'SQL_WAREHOUSE_TYPES_FROM_DATA': SQL_WAREHOUSE_TYPES_FROM_DATA,
-        'SQL_WAREHOUSE_SIZES_BY_TYPE': SQL_WAREHOUSE_SIZES_BY_TYPE
-
-        # DEVELOPMENT COST DATA
-        ,'FLAT_RATE_CARD_DEV': FLAT_RATE_CARD_DEV,
-        'FLAT_INSTANCE_LIST_DEV': FLAT_INSTANCE_LIST_DEV,
-
-        #S3 data
-        'S3_PRICING': s3_pricing
-    }
+@st.cache_resource(show_spinner=False, max_entries=2, validate=lambda global_data: global_data is not None)
+def shared_global_data(source_version=None):
+    """
+    Builds the rate card lookups once per process and rate card version and shares them,
+    read-only, with every session. Sessions only keep a reference in st.session_state.global_data.
+    """
+    df, df_sql, df_dev, s3_df = load_rate_card_data(source_version)
+    if df is None or df_sql.empty:
+        return None
+    BOOTSTRAP_COUNTERS['global_data_builds'] += 1
+    return populate_global_data(df, df_sql, df_dev, s3_df)
 
+@tracing.traced
 def initialize_state():
+    """
+    The app's single bootstrap stage, called once at the top of every run.
+    Idempotent: the rate card is only loaded and derived once per rate card version
+    (shared by all sessions), and session defaults are only set when missing.
+    """
     
     # Load and populate global data first
-    if 'global_data_populated' not in st.session_state or not st.session_state.global_data_populated:
-        df, df_sql,df_dev, s3_df = load_rate_card_data()
-        # if df is None or df_sql :
-        #     # Handle the error gracefully, don't proceed with initialization
-        #     return
-        # Corrected line
-        if df is None or df_sql.empty:
+    source_version = rate_card_cache.source_version()
+    if (not st.session_state.get('global_data_populated')
+            or st.session_state.get('rate_card_source_version') != source_version):
+        global_data = shared_global_data(source_version)
+        if global_data is None:
         # Handle the error gracefully
             st.error("The jobs or SQL dataframes are empty. Please check your data source.")
             return
             
-        # Populate the global data dictionary in session state
-        st.session_state.global_data = populate_global_data(df, df_sql, df_dev, s3_df)
+        # Reference the process-wide rate card instead of storing a copy per session
+        st.session_state.global_data = global_data
+        st.session_state.rate_card_source_version = source_version
         st.session_state.global_data_populated = True
 
     # --- FIX: Ensure dbx_jobs and other state variables are always initialized ---
@@ -181,7 +98,7 @@ def initialize_state():
                 default_compute_type = None
                 instance_prices_for_tier = {}
 
-            default_instance_list = list(INSTANCE_PRICES.get(default_compute_type, {}).keys())
+            default_instance_list = list(global_data['INSTANCE_PRICES'].get(default_compute_type, {}).keys())
             default_instance = default_instance_list[0] if default_instance_list else None
             
             # Use a DataFrame instead of a list of dicts for easier editing
@@ -290,7 +207,6 @@ def initialize_state():
             "Nodes": 1,
             "hr_per_month": 0, 
             "no_of_Month": 0,
-            "DBX": 0.0,
         }])
     #---------------------------------------------------------------
     #Ensure existing SQL warehouses have 'type'
@@ -302,6 +218,14 @@ def initialize_state():
     if 'monthly_growth_percent' not in st.session_state:
         st.session_state.monthly_growth_percent = 0.0
 
+    # Projection tab: horizon and growth of the components without their own growth input
+    if 'projection_months' not in st.session_state:
+        st.session_state.projection_months = 12
+    if 'sql_growth_percent' not in st.session_state:
+        st.session_state.sql_growth_percent = 0.0
+    if 's3_growth_percent' not in st.session_state:
+        st.session_state.s3_growth_percent = 0.0
+
     # Theme state
     if 'theme' not in st.session_state:
         st.session_state.theme = 'Dark' if st.session_state.get('dark_mode', False) else 'Light'
\ No newline at end of file
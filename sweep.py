@@ -0,0 +1,146 @@
+# sweep.py
+# What-if parameter sweeps: prices a tier's jobs on every combination of worker node count,
+# runtime multiplier and instance type as one broadcast NumPy tensor. Headless, like engine.py.
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+SWEEP_COLUMNS = ["Worker Nodes", "Runtime x", "Instance Type", "Monthly Cost", "DBX", "EC2"]
+
+
+@dataclass(frozen=True)
+class SweepResult:
+    """
+    Monthly cost of the swept jobs for every grid cell. `dbx` and `ec2` have shape
+    (len(nodes), len(runtime_multipliers), len(instances)).
+    """
+    nodes: np.ndarray
+    runtime_multipliers: np.ndarray
+    instances: np.ndarray
+    dbx: np.ndarray
+    ec2: np.ndarray
+    # Cost of the jobs as currently configured, for comparison
+    current_cost: float
+
+    @property
+    def costs(self):
+        return self.dbx + self.ec2
+
+    @property
+    def cells(self):
+        return self.dbx.size
+
+    def surface(self, instance=None):
+        """
+        Nodes x runtime multiplier cost surface for one instance, or the cheapest
+        instance of each cell when `instance` is None.
+        """
+        if instance is None:
+            values = self.costs.min(axis=2)
+        else:
+            values = self.costs[:, :, list(self.instances).index(instance)]
+        return pd.DataFrame(
+            values,
+            index=pd.Index(self.nodes, name="Worker Nodes"),
+            columns=pd.Index(self.runtime_multipliers, name="Runtime x"),
+        )
+
+    def cheapest_by_cell(self):
+        """The cheapest instance for every (nodes, runtime multiplier) cell."""
+        position = self.costs.argmin(axis=2)
+        n, m = np.meshgrid(np.arange(len(self.nodes)), np.arange(len(self.runtime_multipliers)), indexing='ij')
+        return pd.DataFrame({
+            "Worker Nodes": self.nodes[n.ravel()],
+            "Runtime x": self.runtime_multipliers[m.ravel()],
+            "Instance Type": self.instances[position.ravel()],
+            "Monthly Cost": self.costs[n, m, position].ravel(),
+            "vs Current": self.costs[n, m, position].ravel() - self.current_cost,
+        })
+
+    def cheapest(self, top=10, runtime_multiplier=None):
+        """The `top` cheapest grid cells, optionally at a single runtime multiplier."""
+        costs = self.costs
+        multipliers = np.arange(len(self.runtime_multipliers))
+        if runtime_multiplier is not None:
+            multipliers = np.flatnonzero(np.isclose(self.runtime_multipliers, runtime_multiplier))
+            costs = costs[:, multipliers, :]
+        flat = costs.ravel()
+        top = min(top, flat.size)
+        best = np.argpartition(flat, top - 1)[:top] if top else np.array([], dtype=int)
+        best = best[np.argsort(flat[best], kind='stable')]
+        n, m, i = np.unravel_index(best, costs.shape)
+        m = multipliers[m]
+        return pd.DataFrame({
+            "Worker Nodes": self.nodes[n],
+            "Runtime x": self.runtime_multipliers[m],
+            "Instance Type": self.instances[i],
+            "Monthly Cost": self.costs[n, m, i],
+            "DBX": self.dbx[n, m, i],
+            "EC2": self.ec2[n, m, i],
+            "vs Current": self.costs[n, m, i] - self.current_cost,
+        })
+
+    def to_frame(self):
+        """Long format, one row per grid cell."""
+        n, m, i = np.meshgrid(
+            np.arange(len(self.nodes)), np.arange(len(self.runtime_multipliers)), np.arange(len(self.instances)),
+            indexing='ij',
+        )
+        return pd.DataFrame({
+            "Worker Nodes": self.nodes[n.ravel()],
+            "Runtime x": self.runtime_multipliers[m.ravel()],
+            "Instance Type": self.instances[i.ravel()],
+            "Monthly Cost": self.costs.ravel(),
+            "DBX": self.dbx.ravel(),
+            "EC2": self.ec2.ravel(),
+        })[SWEEP_COLUMNS]
+
+
+def multiplier_range(start, stop, step):
+    """Runtime multipliers from `start` to `stop` inclusive, e.g. (0.5, 2, 0.25)."""
+    count = int(np.floor((stop - start) / step + 1e-9)) + 1
+    return np.round(start + step * np.arange(max(count, 1)), 6)
+
+
+def sweep_costs(jobs_df, rate_card, nodes, runtime_multipliers, instances):
+    """
+    Prices `jobs_df` with every job moved to the same (worker nodes, runtime multiplier,
+    instance) configuration, for every combination of the three axes. Uses the formulas of
+    engine.price_databricks_tier, DBX = rate * (nodes + 1) * runtime * runs and
+    EC2 = ec2 * (nodes + 1), broadcast over a (nodes x multipliers x instances) tensor.
+    `rate_card` is the job RateCard; `instances` are instance labels.
+    """
+    nodes = np.asarray(nodes, dtype=float)
+    runtime_multipliers = np.asarray(runtime_multipliers, dtype=float)
+    instances = np.asarray(list(instances), dtype=object)
+
+    runtime = pd.to_numeric(jobs_df["Runtime (hrs)"], errors='coerce').fillna(0).to_numpy(dtype=float)
+    runs = pd.to_numeric(jobs_df["Runs/Month"], errors='coerce').fillna(0).to_numpy(dtype=float)
+    # Summed over the jobs up front: the tier's monthly hours at 1x runtime and its job count
+    monthly_hours = (runtime * runs).sum()
+    job_count = len(jobs_df)
+
+    rows = rate_card.label_rows(instances)
+    rate_per_hour = rate_card.take('rate_per_hour', rows)
+    ec2_per_hour = rate_card.take('ec2_per_hour', rows)
+
+    node_count = (nodes + 1)[:, None, None]
+    dbx = node_count * runtime_multipliers[None, :, None] * (rate_per_hour * monthly_hours)[None, None, :]
+    ec2 = np.broadcast_to(node_count * (ec2_per_hour * job_count)[None, None, :], dbx.shape)
+
+    current_rows = rate_card.label_rows(jobs_df['Instance Type'].to_numpy()) if job_count else np.zeros(0, dtype=int)
+    current_nodes = pd.to_numeric(jobs_df["Nodes"], errors='coerce').fillna(0).to_numpy(dtype=float) + 1 if job_count else np.zeros(0)
+    current_cost = float((
+        rate_card.take('rate_per_hour', current_rows) * current_nodes * runtime * runs
+        + rate_card.take('ec2_per_hour', current_rows) * current_nodes
+    ).sum())
+
+    return SweepResult(
+        nodes=nodes.astype(int) if np.all(nodes == nodes.round()) else nodes,
+        runtime_multipliers=runtime_multipliers,
+        instances=instances,
+        dbx=dbx,
+        ec2=np.ascontiguousarray(ec2),
+        current_cost=current_cost,
+    )
@@ -0,0 +1,44 @@
+# tests/test_bootstrap.py
+# Startup: a cold run loads and builds the rate card, warm reruns (same session or a new
+# session in the same process) do no rate card work at all.
+import sys
+from pathlib import Path
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import state  # noqa: E402
+
+TIMEOUT = 120
+
+
+def _app():
+    return AppTest.from_file(str(ROOT / "main.py"), default_timeout=TIMEOUT)
+
+
+def test_warm_reruns_do_no_rate_card_work():
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    before = dict(state.BOOTSTRAP_COUNTERS)
+
+    app = _app()
+    app.run()
+    assert not app.exception
+    cold = dict(state.BOOTSTRAP_COUNTERS)
+    assert cold['rate_card_loads'] == before['rate_card_loads'] + 1
+    assert cold['global_data_builds'] == before['global_data_builds'] + 1
+
+    # Warm rerun of the same session
+    app.run()
+    assert not app.exception
+    assert state.BOOTSTRAP_COUNTERS == cold
+
+    # A second session shares the process-wide rate card
+    other = _app()
+    other.run()
+    assert not other.exception
+    assert state.BOOTSTRAP_COUNTERS == cold
+    assert other.session_state['global_data'] is app.session_state['global_data']
@@ -0,0 +1,171 @@
+# tests/test_engine.py
+# The headless engine against the baseline formulas, computed by hand on a small rate card:
+# tier DBU/DBX/EC2, unknown instances, SQL warehouses, development clusters and S3, plus
+# the per-tier memo and the job editor's normalization.
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import engine  # noqa: E402
+import job_schema  # noqa: E402
+import rate_card as rc  # noqa: E402
+from data import DEFAULT_KB_PER_RECORD_PER_COLUMN  # noqa: E402
+from tier_cache import TierCostCache  # noqa: E402
+
+RATE_COLUMNS = ['Instance', 'Compute type', 'vCPU', 'Memory (GB)', 'DBU/hour', 'Rate/hour', 'onDemandLinuxHr']
+RATES = pd.DataFrame([
+    ("m5.xlarge", "Jobs Compute", 4, 16, 0.69, 0.138, 0.192),
+    ("r5.2xlarge", "Jobs Compute Photon", 8, 64, 2.74, 0.548, 0.504),
+    ("i3.xlarge", "DLT Advanced Compute", 4, 30, 1.0, 0.36, 0.312),
+    ("Small", "SQL Pro Compute", 0, 0, 12.0, 6.6, 0.0),
+    ("Medium", "SQL Pro Compute", 0, 0, 24.0, 13.2, 0.0),
+    ("m5.large", "All-Purpose Compute", 2, 8, 0.34, 0.187, 0.096),
+    ("m5.2xlarge", "All-Purpose Compute", 8, 32, 1.37, 0.7535, 0.384),
+], columns=RATE_COLUMNS)
+S3_RATES = pd.DataFrame({"S3_storage": ["Standard", "Glacier"], "Rate/GB": [0.023, 0.004]})
+
+
+@pytest.fixture(scope="module")
+def global_data():
+    return rc.build_global_data(*rc.split_rate_card(RATES, S3_RATES))
+
+
+def _label(instance, labels=rc.cpu_labels):
+    return labels(RATES[RATES["Instance"] == instance])[0]
+
+
+def _jobs(*rows):
+    return pd.DataFrame(rows, columns=job_schema.EDITOR_COLUMNS)
+
+
+def test_tier_matches_baseline_formula(global_data):
+    jobs = _jobs(
+        ("a", 2.0, 10, "Jobs Compute", _label("m5.xlarge"), 3, False, False),
+        ("b", 0.5, 30, "Jobs Compute Photon", _label("r5.2xlarge"), 1, True, False),
+    )
+    df, dbx, ec2, dbus = engine.price_databricks_tier(jobs, global_data['JOB_RATE_CARD'])
+
+    # node count is the workers plus the driver; hours are runtime x runs per month
+    assert df["DBU"].tolist() == pytest.approx([0.69 * 4 * 20, 2.74 * 2 * 15])
+    assert df["DBX"].tolist() == pytest.approx([0.138 * 4 * 20, 0.548 * 2 * 15])
+    assert df["EC2"].tolist() == pytest.approx([0.192 * 4, 0.504 * 2])
+    assert dbx == pytest.approx(0.138 * 4 * 20 + 0.548 * 2 * 15)
+    assert ec2 == pytest.approx(0.192 * 4 + 0.504 * 2)
+    assert dbus == pytest.approx(0.69 * 4 * 20 + 2.74 * 2 * 15)
+    assert df.attrs['unknown_instances'] == []
+    assert "DBX" not in jobs
+
+
+def test_unknown_instances_cost_nothing_and_are_reported(global_data):
+    jobs = _jobs(
+        ("a", 1.0, 10, "Jobs Compute", _label("m5.xlarge"), 1, False, False),
+        ("b", 1.0, 10, "Jobs Compute", "x9.huge | 1 CPUs | 1GB", 1, False, False),
+        ("c", 1.0, 10, "Jobs Compute", "x9.huge | 1 CPUs | 1GB", 2, False, False),
+    )
+    df, dbx, _, _ = engine.price_databricks_tier(jobs, global_data['JOB_RATE_CARD'])
+
+    assert df["DBX"].tolist() == pytest.approx([0.138 * 2 * 10, 0.0, 0.0])
+    assert dbx == pytest.approx(0.138 * 2 * 10)
+    assert df.attrs['unknown_instances'] == ["x9.huge | 1 CPUs | 1GB"]
+
+
+def test_sql_warehouses_match_baseline_formula(global_data):
+    small, medium = (_label(size, rc.sql_size_labels) for size in ("Small", "Medium"))
+    warehouses = [
+        {"name": "bi", "type": "SQL Pro Compute", "size": small, "SQL_nodes": 2, "hours_per_day": 8, "days_per_month": 22},
+        {"name": "etl", "type": "SQL Pro Compute", "size": medium, "SQL_nodes": 1, "hours_per_day": 4, "days_per_month": 30},
+        {"name": "idle", "type": "SQL Pro Compute", "size": medium, "SQL_nodes": 1, "hours_per_day": 0, "days_per_month": 30},
+    ]
+    result = engine.price_sql_warehouses(warehouses, global_data)
+
+    # rate x hours per day x days per month x nodes
+    assert result.warehouses["Monthly Cost ($)"].tolist() == pytest.approx([6.6 * 8 * 22 * 2, 13.2 * 4 * 30, 0.0])
+    assert result.total_cost == pytest.approx(6.6 * 8 * 22 * 2 + 13.2 * 4 * 30)
+    assert result.total_dbus == pytest.approx(12 * 8 * 22 * 2 + 24 * 4 * 30)
+    assert result.warehouses["Instance"].tolist() == ["Small", "Medium", "Medium"]
+
+
+def test_dev_costs_match_baseline_formula(global_data):
+    small, large = (_label(instance, rc.dbu_labels) for instance in ("m5.large", "m5.2xlarge"))
+    dev = pd.DataFrame({
+        "Compute_type": "All-Purpose Compute",
+        "Driver type": [small, large],
+        "Worker Type": [large, "unknown"],
+        "Nodes": [2, 3],
+        "hr_per_month": [40, 10],
+        "no_of_Month": [3, 1],
+    })
+    result = engine.price_dev_costs(dev, global_data)
+
+    # (driver rate x nodes + 1) + (worker rate x nodes + 1), per hour, over hours and months
+    expected = [
+        ((0.187 * 2 + 1) + (0.7535 * 2 + 1)) * 40 * 3,
+        ((0.7535 * 3 + 1) + (0.0 * 3 + 1)) * 10 * 1,
+    ]
+    assert result.df["DBX"].tolist() == pytest.approx(expected)
+    assert result.total_cost == pytest.approx(sum(expected))
+    assert "DBX" not in dev
+
+
+def test_s3_table_based_matches_baseline_formula(global_data):
+    tables = {
+        "L0 / Raw": [{"Table Name": "t", "Records": 1_000_000, "Columns": 20, "Table": 3}],
+        "L1 / Curated": [{"Table Name": "Catalog c", "Records": 10, "Columns": 10, "Table": 4, "Estimated GB": 2.5}],
+    }
+    result = engine.price_s3("Table-Based", {}, tables, global_data)
+
+    raw_gb = 1_000_000 * 20 * DEFAULT_KB_PER_RECORD_PER_COLUMN / (1024 * 1024) * 3
+    assert result.costs_per_zone["L0 / Raw"] == pytest.approx(raw_gb * 0.023)
+    # A catalog size replaces Records x Columns
+    assert result.costs_per_zone["L1 / Curated"] == pytest.approx(2.5 * 4 * 0.023)
+    assert result.total_cost == pytest.approx((raw_gb + 10) * 0.023)
+
+
+def test_tier_cache_counts_hits_and_misses(global_data):
+    card = global_data['JOB_RATE_CARD']
+    cache = TierCostCache(max_entries=1)
+    jobs = _jobs(("a", 2.0, 10, "Jobs Compute", _label("m5.xlarge"), 3, False, False))
+    edited = jobs.assign(Nodes=5)
+    calls = []
+
+    def price(frame):
+        return cache.get_or_compute(
+            frame, global_data['RATE_CARD_VERSION'],
+            lambda: calls.append(1) or engine.price_databricks_tier(frame, card),
+        )
+
+    first = price(jobs)
+    again = price(jobs.copy())
+    assert again[1] == first[1]
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'entries': 1}
+
+    price(edited)
+    price(jobs)  # evicted by the edited frame
+    assert len(calls) == 3
+    assert cache.stats() == {'hits': 1, 'misses': 3, 'entries': 1}
+
+
+def test_normalize_jobs_fills_defaults_and_fixes_instances(global_data):
+    choices = job_schema.tier_choices(global_data, "L2 / Data Product")
+    jobs = _jobs(
+        (None, None, 5, None, None, None, None, True),
+        ("b", 1.5, None, "Jobs Compute", "not offered", 2, True, None),
+    )
+    job_schema.normalize_jobs(jobs, "L2 / Data Product", choices)
+
+    first_type = choices.compute_options[0]
+    assert jobs["Job Name"].tolist() == ["L2   Data Product Job 1", "b"]
+    assert jobs["Runtime (hrs)"].tolist() == [0.0, 1.5]
+    assert jobs["Runs/Month"].tolist() == [5.0, 0.0]
+    assert jobs["Nodes"].tolist() == [1, 2]
+    assert jobs["Compute type"].tolist() == [first_type, "Jobs Compute"]
+    assert jobs["Instance Type"].tolist() == [choices.first_instance[first_type], choices.first_instance["Jobs Compute"]]
+    assert jobs["Photon"].tolist() == [False, True]
+    assert jobs["Spot"].tolist() == [True, False]
+    assert np.isfinite(engine.price_databricks_tier(jobs, global_data['JOB_RATE_CARD'])[1])
@@ -0,0 +1,67 @@
+# tier_cache.py
+# Memoization of per-tier Databricks results, keyed by a content hash of the tier's jobs
+# frame plus the rate card version, so an unchanged tier is never priced twice.
+import hashlib
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def frame_fingerprint(df):
+    """
+    Cheap content hash of a DataFrame (columns, dtypes, index and values).
+    Returns None when the frame holds values pandas cannot hash (e.g. lists).
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode())
+    try:
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    except TypeError:
+        return None
+    return digest.hexdigest()
+
+
+class TierCostCache:
+    """
+    Bounded LRU cache of tier results with hit/miss counters.
+    One instance lives in each Streamlit session (see calculations.tier_cost_cache).
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get_or_compute(self, jobs_df, rate_card_version, compute):
+        """
+        Returns the cached (df, dbx_cost, ec2_cost, dbus) for this jobs frame, or calls
+        `compute()` and stores its result. The returned df is a shallow copy so callers
+        can add display columns without touching the cached entry.
+        """
+        fingerprint = frame_fingerprint(jobs_df)
+        if fingerprint is None or rate_card_version is None:
+            self.misses += 1
+            return compute()
+
+        key = (fingerprint, rate_card_version)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        else:
+            self.misses += 1
+            entry = compute()
+            self._entries[key] = entry
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        df, dbx_cost, ec2_cost, dbus = entry
+        return df.copy(deep=False), dbx_cost, ec2_cost, dbus
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = self.misses = 0
@@ -0,0 +1,181 @@
+# tracing.py
+# Per-rerun timing spans. main.py opens a trace at the top of each rerun; stages, calculations
+# and render functions record nested spans into it, and the finished rerun is appended to a
+# rotating JSON-lines log. Without an open trace (tracing disabled) a span is a single
+# thread-local lookup, so the instrumentation can stay in place.
+#
+#   DBU_TRACE=1 streamlit run main.py      (or open the app with ?trace=1)
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+ENABLED = os.environ.get('DBU_TRACE', '').lower() in ('1', 'true', 'yes')
+LOG_PATH = os.environ.get('DBU_TRACE_LOG', 'traces.jsonl')
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+# Reruns kept per session for the developer panel
+HISTORY_SIZE = 20
+
+# Streamlit runs each session's script in its own thread, so the open trace is per thread
+_local = threading.local()
+_logger = None
+_logger_lock = threading.Lock()
+
+
+class Trace:
+    """Spans of one rerun as [name, depth, start_ms, duration_ms], in start order."""
+    __slots__ = ('session_id', 'rerun', 'started_at', 'started', 'spans', 'depth')
+
+    def __init__(self, session_id=None, rerun=None):
+        self.session_id = session_id
+        self.rerun = rerun
+        self.started_at = datetime.now(timezone.utc)
+        self.started = time.perf_counter()
+        self.spans = []
+        self.depth = 0
+
+
+class _Span:
+    __slots__ = ('trace', 'entry', 'start')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.entry = [name, trace.depth, 0.0, 0.0]
+
+    def __enter__(self):
+        trace = self.trace
+        trace.spans.append(self.entry)
+        trace.depth += 1
+        self.start = time.perf_counter()
+        self.entry[2] = (self.start - trace.started) * 1000
+        return self
+
+    def __exit__(self, *exc):
+        self.entry[3] = (time.perf_counter() - self.start) * 1000
+        self.trace.depth -= 1
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def start_rerun(enabled=None, session_id=None, rerun=None):
+    """Opens this thread's trace for a new rerun and returns it (None, and no trace, when tracing is off)."""
+    enabled = ENABLED if enabled is None else enabled
+    _local.trace = Trace(session_id, rerun) if enabled else None
+    return _local.trace
+
+
+def active():
+    return getattr(_local, 'trace', None) is not None
+
+
+def span(name):
+    """Context manager timing a block as a span of the current rerun."""
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        return _NULL_SPAN
+    return _Span(trace, name)
+
+
+def traced(func=None, name=None):
+    """Decorator recording every call of a function as a span (named after the function)."""
+    if func is None:
+        return lambda f: traced(f, name)
+    span_name = name or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        trace = getattr(_local, 'trace', None)
+        if trace is None:
+            return func(*args, **kwargs)
+        with _Span(trace, span_name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def _get_logger():
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            logger = logging.getLogger('dbu_calculator.tracing')
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            handler = RotatingFileHandler(LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+            _logger = logger
+    return _logger
+
+
+def finish_rerun(trace=None, interrupted=False, write=True):
+    """
+    Closes `trace` (default: this thread's) and returns the rerun record (None without a trace):
+    {'time', 'session', 'rerun', 'interrupted', 'total_ms', 'spans': [{'name', 'depth', 'start_ms', 'ms'}]}.
+    `interrupted` marks a rerun cut short by st.rerun()/st.stop(), closed when the next one starts;
+    its total runs to the last recorded span. The record is appended to LOG_PATH unless `write` is False.
+    """
+    if trace is None:
+        trace = getattr(_local, 'trace', None)
+        if trace is None:
+            return None
+    if getattr(_local, 'trace', None) is trace:
+        _local.trace = None
+    if interrupted:
+        total_ms = max((start + duration for _, _, start, duration in trace.spans), default=0.0)
+    else:
+        total_ms = (time.perf_counter() - trace.started) * 1000
+    record = {
+        'time': trace.started_at.isoformat(timespec='milliseconds'),
+        'session': trace.session_id,
+        'rerun': trace.rerun,
+        'interrupted': interrupted,
+        'total_ms': round(total_ms, 3),
+        'spans': [
+            {'name': name, 'depth': depth, 'start_ms': round(start, 3), 'ms': round(duration, 3)}
+            for name, depth, start, duration in trace.spans
+        ],
+    }
+    if write:
+        try:
+            _get_logger().info(json.dumps(record))
+        except OSError:
+            # A read-only working directory must not break the app
+            pass
+    return record
+
+
+def breakdown(records):
+    """
+    Span durations (ms) of several rerun records as rows like '  price_scenario'
+    (indented by depth) x one column per rerun, in first-seen order. Repeated spans are summed.
+    """
+    import pandas as pd
+
+    columns = {}
+    order = []
+    for record in records:
+        totals = {}
+        for item in record['spans']:
+            label = "  " * item['depth'] + item['name']
+            if label not in totals and label not in order:
+                order.append(label)
+            totals[label] = totals.get(label, 0.0) + item['ms']
+        totals['Total'] = record['total_ms']
+        columns[f"#{record['rerun']}" + (" (interrupted)" if record.get('interrupted') else "")] = totals
+    return pd.DataFrame(columns, index=order + ['Total']).fillna(0.0)
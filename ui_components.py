@@ -1,52 +1,68 @@
 # ui_components.py
+import copy
+from collections import OrderedDict
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
+from streamlit.errors import StreamlitAPIException
 #from data import  S3_STORAGE_CLASSES
 import state as s
-from file_exportor import generate_consolidated_excel_export
-from calculations import calculate_databricks_costs_for_tier
+import tracing
+from file_exportor import EXPORT_FORMATS, get_cached_export, scenario_fingerprint
+from calculations import (
+    calculate_databricks_costs_for_tier, suggest_right_sizing, normalize_tier_jobs, simulate_databricks_costs,
+    session_scenario, mark_scenario_stale,
+)
+from simulation import DISTRIBUTIONS, UNCERTAINTY_COLUMNS
+from projection import MAX_MONTHS, DATABRICKS, S3, SQL, DEVELOPMENT
+from dependency_graph import DEV_DERIVED_COLUMNS
+from sweep import sweep_costs, multiplier_range
+from job_importer import IMPORT_EXTENSIONS, TierRule, import_jobs, merge_jobs
+from catalog_importer import DEFAULT_COMPRESSION_RATIO, ZoneRule, import_catalog, merge_catalog_rows
 
-def render_summary_column(total_cost, databricks_cost, s3_cost, sql_cost, projected_s3_cost_12_months):
-    """Renders the right-hand summary column with the donut chart."""
+@tracing.traced
+def render_summary_column(total_cost, databricks_cost, s3_cost, sql_cost, projected_s3_cost_12_months, simulation=None, dev_cost=0):
+    """
+    Renders the right-hand summary column with the donut chart.
+    `simulation` (a simulation.SimulationResult) adds the P50/P90/P99 of the monthly cost.
+    """
     st.header("📈 Monthly Total")
     st.metric("Total Cloud Cost", f"${total_cost:,.2f}")
     st.divider()
 
-    # Calculate 12-month projected cost (still uses st.session_state.monthly_growth_percent for Databricks)
-    projected_cost_12_months = 0
-    current_dbx_cost = databricks_cost
-    sql_warehouse_cost_fixed = sql_cost # SQL warehouse cost is assumed not to grow with this percentage
-
-    # Re-calculate Databricks 12-month projection using the value from session state
-    # (which can be set in state.py or manipulated elsewhere if needed)
-    if st.session_state.monthly_growth_percent > 0:
-        growth_factor_dbx = 1 + (st.session_state.monthly_growth_percent / 100)
-        if growth_factor_dbx != 1:
-            projected_dbx_cost_12_months = current_dbx_cost * (growth_factor_dbx**12 - 1) / (growth_factor_dbx - 1)
-        else:
-            projected_dbx_cost_12_months = current_dbx_cost * 12
-    else:
-        projected_dbx_cost_12_months = current_dbx_cost * 12
-
-    # Total 12-month projection includes Databricks, SQL, and S3 projections
-    #projected_cost_12_months = projected_dbx_cost_12_months + sql_warehouse_cost_fixed * 12 + projected_s3_cost_12_months
+    if simulation is not None:
+        st.header("Cost Uncertainty")
+        # Only Databricks costs are simulated, S3, SQL Warehouse and development costs are added as fixed amounts
+        fixed_cost = total_cost - databricks_cost
+        p50_col, p90_col, p99_col = st.columns(3)
+        p50_col.metric("P50", f"${simulation.total(50) + fixed_cost:,.0f}")
+        p90_col.metric("P90", f"${simulation.total(90) + fixed_cost:,.0f}")
+        p99_col.metric("P99", f"${simulation.total(99) + fixed_cost:,.0f}")
+        st.dataframe(
+            simulation.percentiles.drop(columns='Mean'),
+            column_config={col: st.column_config.NumberColumn(col, format="$%.0f") for col in simulation.percentiles.columns},
+            use_container_width=True,
+        )
+        st.caption(f"Databricks & Compute, {simulation.samples:,} samples, {simulation.uncertain_jobs} jobs with a distribution.")
+        st.divider()
 
-    #st.metric("12-Month Projected Total", f"${projected_cost_12_months:,.2f}")
-    #st.divider()
+    # Multi-month projections (with growth) live in the Projection tab, see render_projection_tab
 
     st.header("Cost Distribution")
     cost_data = {
         "Databricks & Compute": databricks_cost,
         "S3 Storage": s3_cost,
         "SQL Warehouse": sql_cost,
+        "Development": dev_cost,
     }
     non_zero_costs = {k: v for k, v in cost_data.items() if v > 0}
+    colors = {"Databricks & Compute": '#FF8C00', "S3 Storage": '#3CB371', "SQL Warehouse": '#1E90FF', "Development": '#9370DB'}
 
     if non_zero_costs:
         fig = go.Figure(data=[go.Pie(
             labels=list(non_zero_costs.keys()), values=list(non_zero_costs.values()), hole=.6,
-            marker_colors=['#FF8C00', '#3CB371', '#1E90FF'], hoverinfo="label+percent",
+            marker_colors=[colors[k] for k in non_zero_costs], hoverinfo="label+percent",
             textinfo="percent", textfont_size=14
         )])
         fig.update_layout(
@@ -75,8 +91,53 @@ def render_summary_column(total_cost, databricks_cost, s3_cost, sql_cost, projec
     - Use appropriate **S3 storage classes** for data to optimize storage costs.
     """)
 
+# --- Fragment reruns ---
+# Each tier editor, S3 zone, SQL warehouse card and the development editor is an st.fragment.
+# An edit reruns only that section, which reprices the scenario (only the edited section's
+# cost nodes are recomputed, see dependency_graph.py), and then the keyed fragments below
+# that show its totals. Nothing else on the page reruns.
+SUMMARY = "summary"
+DATABRICKS_TOTALS = "databricks_totals"
+S3_TOTALS = "s3_totals"
+SQL_TOTALS = "sql_totals"
+DEV_COSTS = "dev_costs"
+
+def _rerun_fragments(*keys):
+    """Widget callback: reruns the edited section's fragment, then the totals fragments, in that order."""
+    st.rerun(list(keys))
+
+def _rerun_section(*inputs):
+    """In a section fragment, after its edit of `inputs` was written to the session: reprice and redraw the section."""
+    mark_scenario_stale(*inputs)
+    st.session_state.summary_stale = True
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        # Fragment-scoped reruns are only allowed on fragment reruns, not during a full rerun
+        st.rerun()
+
+@st.fragment(key=SUMMARY)
+@tracing.traced
+def render_summary(active_tiers):
+    """The summary column, from the priced scenario. Reruns after an edit in a tier, S3, SQL or development section."""
+    result, projection = session_scenario()
+    # Monte Carlo percentiles of the Databricks cost, only in uncertainty mode
+    simulation = simulate_databricks_costs(active_tiers) if st.session_state.get('uncertainty_mode') else None
+    render_summary_column(
+        result.total_cost, result.databricks_total_cost, result.s3.total_cost, result.sql.total_cost,
+        result.s3.projected_cost_12_months, simulation, result.dev.total_cost,
+    )
+    # The export button is not rerun with the sections, point its download at the edited scenario
+    export_inputs = st.session_state.get('export_inputs')
+    if st.session_state.pop('summary_stale', False) and export_inputs is not None:
+        export_inputs.update(_export_inputs(
+            result.dbx_data(), st.session_state.s3_calc_method, st.session_state.s3_direct,
+            st.session_state.s3_table_based, st.session_state.sql_warehouses, projection,
+        ))
+
 # --- UI Rendering Component ---
 #def render_databricks_tab(FLAT_RATE_CARD, FLAT_INSTANCE_LIST, INSTANCE_PRICES, COMPUTE_TYPE_LIST):
+@tracing.traced
 def render_databricks_tab():
     """Renders the main Streamlit UI using st.data_editor for inputs, now with tabs."""
     #print(type(FLAT_INSTANCE_LIST))
@@ -84,12 +145,6 @@ def render_databricks_tab():
     st.write('Configure jobs across different tiers. Specify the number of jobs and configure them in the table below.')
     st.write('---')
 
-    # Calculate the grand total for all active tiers
-    grand_total_dbx_cost = 0
-    grand_total_dbu = 0
-    grand_total_ec2_cost = 0
-    total_jobs = 0
-
     # MODIFIED: Moved active_tiers calculation before the metric to use its value
     active_tiers = s.TIERS.copy()
     if 'enable_RAW' in st.session_state and not st.session_state.enable_RAW:
@@ -101,16 +156,32 @@ def render_databricks_tab():
         if not isinstance(jobs_data, pd.DataFrame):
             jobs_data = pd.DataFrame(jobs_data)
             st.session_state.dbx_jobs[tier] = jobs_data
-            
-        jobs_df = jobs_data             
-        
-        _, tier_dbx_cost, tier_ec2_cost, tier_dbu_used = calculate_databricks_costs_for_tier(jobs_df)
-        grand_total_dbx_cost += tier_dbx_cost
-        grand_total_ec2_cost += tier_ec2_cost
-        grand_total_dbu += tier_dbu_used
-        total_jobs += len(jobs_df)
 
-    # ADDED: New capsule at the top for summary metrics
+    # ADDED: New capsule at the top for summary metrics, rerun after an edit in a tier editor
+    render_databricks_totals(active_tiers)
+
+    # MODIFIED: Replaced st.checkbox with st.toggle and moved its position
+    st.toggle("Enable L0 / RAW", value=True, key='enable_RAW')
+    uncertainty_mode = st.toggle(
+        "Uncertainty mode", key='uncertainty_mode',
+        help="Give jobs a runtime and runs/month range to see P50/P90/P99 monthly costs in the summary."
+    )
+    render_job_import()
+
+    for tier in active_tiers:
+        st.fragment(render_tier_editor, key=f"tier_{tier}")(tier, uncertainty_mode)
+
+    render_sweep_section(active_tiers)
+           
+            
+@st.fragment(key=DATABRICKS_TOTALS)
+@tracing.traced
+def render_databricks_totals(active_tiers):
+    result = session_scenario()[0]
+    tier_results = [result.tiers[tier] for tier in active_tiers if tier in result.tiers]
+    total_jobs = sum(len(st.session_state.dbx_jobs.get(tier, [])) for tier in active_tiers)
+    grand_total_dbx_cost = sum(r.dbx_cost for r in tier_results)
+    grand_total_ec2_cost = sum(r.ec2_cost for r in tier_results)
     with st.container(border=True):
         col1, col2, col3, col4= st.columns(4)
         col1.metric("Total Jobs", total_jobs)
@@ -118,115 +189,256 @@ def render_databricks_tab():
         col3.metric("EC2 Costs", f"${grand_total_ec2_cost:,.2f}")
         col4.metric("Monthly Total", f"${grand_total_dbx_cost + grand_total_ec2_cost:,.2f}")
 
-    # MODIFIED: Replaced st.checkbox with st.toggle and moved its position
-    st.toggle("Enable L0 / RAW", value=True, key='enable_RAW')
-        
-    for tier in active_tiers:
-        with st.container(border=True):
-            st.subheader(f"{tier}")
+@tracing.traced
+def render_tier_editor(tier, uncertainty_mode):
+    """One tier's job editor, run as the fragment f"tier_{tier}"."""
+    rerun_keys = (f"tier_{tier}", DATABRICKS_TOTALS, SUMMARY)
+    with st.container(border=True):
+        st.subheader(f"{tier}")
+        jobs_df = st.session_state.dbx_jobs.get(tier, pd.DataFrame())
+
+        # Uncertainty mode edits the distribution columns, missing ones start as "Fixed"
+        if uncertainty_mode and not jobs_df.empty:
+            for col in UNCERTAINTY_COLUMNS:
+                if col not in jobs_df.columns:
+                    jobs_df[col] = "Fixed" if col == "Distribution" else float('nan')
+
+        # This is the original dataframe used to check for changes
+        original_jobs_df = jobs_df.copy()
+
+        # Dynamically select the correct compute and instance lists ---
+        global_data = st.session_state.global_data
+        if tier in ["L0 / Raw", "L1 / Curated"]:
+            compute_options = global_data['COMPUTE_TYPES_L0_L1']
+            all_instances_for_tier = list(global_data['FLAT_INSTANCE_LIST'].keys())
+        elif tier == "L2 / Data Product":
+            compute_options = global_data['COMPUTE_TYPES_L2']
+            all_instances_for_tier = list(global_data['FLAT_INSTANCE_LIST'].keys())
+        else:
+            compute_options = []
+            all_instances_for_tier = []
+
+        # Fill in default values for new rows and fix instances the compute type does not offer
+        normalize_tier_jobs(tier, jobs_df)
+
+        # Get the full DataFrame with calculated costs
+        calculated_df, _, _,_ = calculate_databricks_costs_for_tier(jobs_df)
+        unknown_instances = calculated_df.attrs.get('unknown_instances', [])
+        if unknown_instances:
+            st.warning(f"Not in the rate card, priced at $0: {', '.join(map(str, unknown_instances))}")
+
+        # ADDED: Auto-incrementing Job_Number column on the display DataFrame only.
+        calculated_df.insert(1, 'Job_Number', range(1, len(calculated_df) + 1))
+
+        # --- st.data_editor for Job Input and Output ---
+        column_config = {
+            "Job Name": st.column_config.TextColumn("Job Name"),
+            "Job_Number": st.column_config.NumberColumn("Job Number", disabled=True),
+            "Runtime (hrs)": st.column_config.NumberColumn("Runtime (hrs)"),
+            "Runs/Month": st.column_config.NumberColumn("Runs/Month"),
+             # FIX: Set options to the tier-specific list and make it editable
+            "Compute type": st.column_config.SelectboxColumn("Compute type", options=compute_options, disabled=False),
+            
+            # FIX: Use the dynamic helper function to get instance options
+            "Instance Type": st.column_config.SelectboxColumn("Instance Type", options=all_instances_for_tier, required=True),
+
+            #"Compute type": st.column_config.SelectboxColumn("Compute type", options= s.COMPUTE_TYPE_LIST, disabled=False),
+            ##"Instance Type": st.column_config.SelectboxColumn("Instance Type", options=list(s.FLAT_INSTANCE_LIST.keys())),
+            "Nodes": st.column_config.NumberColumn("Worker_Nodes"),
+            "Photon": st.column_config.CheckboxColumn("Photon", disabled =tier in ["L0 / Raw", "L1 / Curated"]),
+            "Spot": st.column_config.CheckboxColumn("Spot", disabled =tier in ["L0 / Raw", "L1 / Curated"]),
+            "DBU": st.column_config.NumberColumn("DBU", disabled=True, format="%.2f"),
+            #"EC2": st.column_config.NumberColumn("EC2", disabled=True, format="$%.2f"),
+            "DBX": st.column_config.NumberColumn("DBX", disabled=True, format="$%.2f"),
+            "EC2": st.column_config.NumberColumn("EC2", disabled=True, format="$%.2f"),
+            "Distribution": st.column_config.SelectboxColumn("Distribution", options=DISTRIBUTIONS),
+            "Runtime Min (hrs)": st.column_config.NumberColumn("Runtime Min (hrs)", min_value=0.0),
+            "Runtime Max (hrs)": st.column_config.NumberColumn("Runtime Max (hrs)", min_value=0.0),
+            "Runs Min": st.column_config.NumberColumn("Runs Min", min_value=0.0),
+            "Runs Max": st.column_config.NumberColumn("Runs Max", min_value=0.0),
+        }
+        column_order = [
+            "Job Name", "Job_Number", "Runtime (hrs)", "Runs/Month", "Compute type",
+            "Instance Type", "Nodes", "Photon", "Spot","DBU", "DBX", "EC2"]
+        if uncertainty_mode:
+            column_order += UNCERTAINTY_COLUMNS
+
+        edited_df = st.data_editor(
+            calculated_df,
+            column_config=column_config,
+            hide_index=True,
+            key=f"data_editor_{tier}",
+            use_container_width=True,
+            num_rows="dynamic" ,   
+            column_order=column_order,
+            on_change=_rerun_fragments, args=rerun_keys)
+
+        # Update session state with the edited DataFrame's editable columns
+        # editable_cols = ["Job Name", "Runtime (hrs)", "Runs/Month", "Compute type", "Instance Type", "Nodes", "Photon", "Spot"]
+        # st.session_state.dbx_jobs[tier] = edited_df[editable_cols]
+        editable_cols = ["Job Name", "Runtime (hrs)", "Runs/Month", "Compute type", "Instance Type", "Nodes", "Photon", "Spot"]
+        editable_cols += [col for col in UNCERTAINTY_COLUMNS if col in edited_df.columns and col in original_jobs_df.columns]
+        if not edited_df[editable_cols].equals(original_jobs_df[editable_cols]):
+             st.session_state.dbx_jobs[tier] = edited_df[editable_cols]
+             _rerun_section(f"jobs/{tier}")
+
+        render_right_sizing(tier, jobs_df, rerun_keys)
+
+@tracing.traced
+def render_right_sizing(tier, jobs_df, rerun_keys=()):
+    """Right-sizing suggestions for a tier's jobs, with a button that applies them."""
+    if jobs_df.empty:
+        return
+    suggestions = suggest_right_sizing(jobs_df)
+    suggestions = suggestions[suggestions["Suggested Instance"].notna()]
+    if suggestions.empty:
+        return
+
+    total_savings = suggestions["Savings"].sum()
+    with st.expander(f"💡 Right-sizing: save ${total_savings:,.2f}/month on {len(suggestions)} job(s)"):
+        st.caption("Cheapest instance of the same compute type with at least the current cluster's vCPU and memory.")
+        st.dataframe(
+            suggestions,
+            column_config={
+                "Nodes": st.column_config.NumberColumn("Worker_Nodes", format="%d"),
+                "Suggested Nodes": st.column_config.NumberColumn("Suggested Worker_Nodes", format="%d"),
+                "Monthly Cost": st.column_config.NumberColumn("Monthly Cost", format="$%.2f"),
+                "Suggested Cost": st.column_config.NumberColumn("Suggested Cost", format="$%.2f"),
+                "Savings": st.column_config.NumberColumn("Savings", format="$%.2f"),
+                "Savings %": st.column_config.NumberColumn("Savings %", format="%.1f%%"),
+            },
+            hide_index=True,
+            use_container_width=True,
+        )
+        if st.button("Apply suggestions", key=f"apply_right_sizing_{tier}", on_click=_rerun_fragments, args=rerun_keys):
+            updated_df = st.session_state.dbx_jobs[tier].copy()
+            updated_df.loc[suggestions.index, 'Instance Type'] = suggestions["Suggested Instance"]
+            updated_df.loc[suggestions.index, 'Nodes'] = suggestions["Suggested Nodes"].astype(int)
+            st.session_state.dbx_jobs[tier] = updated_df
+            _rerun_section(f"jobs/{tier}")
+
+def _parse_pairs(text, separator):
+    """'left <separator> right' lines -> {left: right}, skipping blank or malformed lines."""
+    pairs = {}
+    for line in text.splitlines():
+        if separator in line:
+            left, right = line.split(separator, 1)
+            if left.strip() and right.strip():
+                pairs[left.strip()] = right.strip()
+    return pairs
+
+@tracing.traced
+def render_job_import():
+    """Bulk import of a job inventory file into the tier tables (see job_importer.py)."""
+    with st.expander("📥 Import Jobs"):
+        st.caption(
+            "CSV, Parquet or JSON-lines job inventories. Columns such as job_name, node_type_id or "
+            "num_workers are recognised; map any others below as 'source column = Job Name'."
+        )
+        uploaded = st.file_uploader("Job inventory", type=[ext.lstrip('.') for ext in IMPORT_EXTENSIONS], key="job_import_file")
+        mapping_text = st.text_area("Column mapping", placeholder="duration_hours = Runtime (hrs)", key="job_import_mapping")
+        i_col1, i_col2 = st.columns(2)
+        tier_column = i_col1.text_input("Tier column", value="Tier", key="job_import_tier_column")
+        default_tier = i_col2.selectbox("Default tier", ["(reject)"] + s.TIERS, key="job_import_default_tier")
+        patterns_text = st.text_area(
+            "Tier by job name", placeholder="bronze|ingest => L0 / Raw\nsilver => L1 / Curated",
+            help="Regular expressions, first match wins. Applied to rows without a value in the tier column.",
+            key="job_import_patterns",
+        )
+        replace = st.toggle("Replace existing jobs in imported tiers", key="job_import_replace")
+
+        if st.button("Import", disabled=uploaded is None, key="job_import_button"):
+            rule = TierRule(
+                column=tier_column.strip() or "Tier",
+                patterns=_parse_pairs(patterns_text, "=>"),
+                default=None if default_tier == "(reject)" else default_tier,
+            )
+            try:
+                result = import_jobs(uploaded, st.session_state.global_data, rule, _parse_pairs(mapping_text, "="))
+            except Exception as e:
+                st.error(f"Could not import {uploaded.name}: {e}")
+                return
+            st.session_state.dbx_jobs = merge_jobs(st.session_state.dbx_jobs, result.jobs, replace)
+            st.session_state.job_import_result = result
+            st.rerun()
+
+        result = st.session_state.get('job_import_result')
+        if result is None:
+            return
+        st.success(f"Imported {result.rows_imported:,} of {result.rows_read:,} rows.")
+        if not result.rejects.empty:
+            st.warning(f"{len(result.rejects):,} rows were rejected.")
+            st.dataframe(result.rejects.head(100), hide_index=True, use_container_width=True)
+            st.download_button(
+                "Download rejects", result.rejects.to_csv(index=False), file_name="job_import_rejects.csv",
+                mime="text/csv", key="job_import_rejects_download",
+            )
+
+@tracing.traced
+def render_sweep_section(active_tiers):
+    """What-if sweep over worker nodes x runtime multiplier x instance type for one tier (see sweep.py)."""
+    with st.expander("🔬 What-if Sweep"):
+        st.caption("Prices every job of a tier on each combination of the axes below, without editing the jobs.")
+        global_data = st.session_state.global_data
+        all_instances = list(global_data['FLAT_INSTANCE_LIST'].keys())
+
+        with st.form("sweep_form"):
+            tier = st.selectbox("Tier", active_tiers, key="sweep_tier")
+            node_range = st.slider("Worker Nodes", min_value=0, max_value=64, value=(1, 32), key="sweep_nodes")
+            m_col1, m_col2, m_col3 = st.columns(3)
+            multiplier_start = m_col1.number_input("Runtime x from", min_value=0.05, value=0.5, step=0.05, key="sweep_multiplier_start")
+            multiplier_stop = m_col2.number_input("Runtime x to", min_value=0.05, value=2.0, step=0.05, key="sweep_multiplier_stop")
+            multiplier_step = m_col3.number_input("Step", min_value=0.05, value=0.25, step=0.05, key="sweep_multiplier_step")
             jobs_df = st.session_state.dbx_jobs.get(tier, pd.DataFrame())
+            current_instances = [i for i in pd.unique(jobs_df['Instance Type'].dropna()) if i in all_instances] if not jobs_df.empty else []
+            instances = st.multiselect("Instance Types", all_instances, default=current_instances[:20], key="sweep_instances")
+            submitted = st.form_submit_button("Run sweep")
 
-            # This is the original dataframe used to check for changes
-            original_jobs_df = jobs_df.copy()
-
-            # Dynamically select the correct compute and instance lists ---
-            global_data = st.session_state.global_data
-            if tier in ["L0 / Raw", "L1 / Curated"]:
-                compute_options = global_data['COMPUTE_TYPES_L0_L1']
-                all_instances_for_tier = list(global_data['FLAT_INSTANCE_LIST'].keys())
-                instance_prices_for_tier = global_data['INSTANCE_PRICES_L0_L1']
-            elif tier == "L2 / Data Product":
-                compute_options = global_data['COMPUTE_TYPES_L2']
-                instance_prices_for_tier = global_data['INSTANCE_PRICES_L2']
-                all_instances_for_tier = list(global_data['FLAT_INSTANCE_LIST'].keys())
+        if submitted:
+            if jobs_df.empty or not instances:
+                st.warning("The sweep needs at least one job in the tier and one instance type.")
+                st.session_state.pop('sweep_result', None)
             else:
-                compute_options = []
-                instance_prices_for_tier = {}
-                all_instances_for_tier = []
-
-            # --- MODIFIED: Logic to fill in all columns with default values for new rows ---
-            for j, row in jobs_df.iterrows():
-                # Assign default values for empty numeric columns
-                if pd.isna(row['Runtime (hrs)']):
-                    jobs_df.at[j, 'Runtime (hrs)'] = 0.0
-                if pd.isna(row['Runs/Month']):
-                    jobs_df.at[j, 'Runs/Month'] = 0.0
-                if pd.isna(row['Nodes']):
-                    jobs_df.at[j, 'Nodes'] = 1
-                if pd.isna(row['Photon']):
-                    jobs_df.at[j, 'Photon'] = tier in ["L0 / Raw", "L1 / Curated"]
-                if pd.isna(row['Spot']):
-                    jobs_df.at[j, 'Spot'] = tier in ["L0 / Raw", "L1 / Curated"]
-                # Assign default value for 'Job Name' if it is empty
-                if pd.isna(row['Job Name']) or row['Job Name'] == "":
-                    jobs_df.at[j, 'Job Name'] = f"{tier.replace('/', ' ')} Job {j + 1}"
-                if pd.isna(row['Compute type']) and compute_options:
-                    jobs_df.at[j, 'Compute type'] = compute_options[0]
-                selected_compute_type = jobs_df.at[j, 'Compute type']
-                selected_instance_type = jobs_df.at[j, 'Instance Type']
-                available_instances = list(instance_prices_for_tier.get(selected_compute_type, {}).keys())
-
-                if tier in ["L0 / Raw", "L1 / Curated"]:
-                    jobs_df['Photon'] = False
-                if tier in ["L0 / Raw", "L1 / Curated"]:
-                    jobs_df['Spot'] = False 
+                st.session_state.sweep_result = (tier, sweep_costs(
+                    jobs_df, global_data['JOB_RATE_CARD'],
+                    np.arange(node_range[0], node_range[1] + 1),
+                    multiplier_range(multiplier_start, max(multiplier_stop, multiplier_start), multiplier_step),
+                    instances,
+                ))
 
-                
-                if pd.isna(selected_instance_type) or selected_instance_type not in available_instances:
-                    new_instance_type = available_instances[0] if available_instances else None
-                    jobs_df.at[j, 'Instance Type'] = new_instance_type             
-            
-            # Get the full DataFrame with calculated costs
-            calculated_df, _, _,_ = calculate_databricks_costs_for_tier(jobs_df)
-            
-            # ADDED: Auto-incrementing Job_Number column on the display DataFrame only.
-            calculated_df.insert(1, 'Job_Number', range(1, len(calculated_df) + 1))
-
-            # --- st.data_editor for Job Input and Output ---
-            column_config = {
-                "Job Name": st.column_config.TextColumn("Job Name"),
-                "Job_Number": st.column_config.NumberColumn("Job Number", disabled=True),
-                "Runtime (hrs)": st.column_config.NumberColumn("Runtime (hrs)"),
-                "Runs/Month": st.column_config.NumberColumn("Runs/Month"),
-                 # FIX: Set options to the tier-specific list and make it editable
-                "Compute type": st.column_config.SelectboxColumn("Compute type", options=compute_options, disabled=False),
-                
-                # FIX: Use the dynamic helper function to get instance options
-                "Instance Type": st.column_config.SelectboxColumn("Instance Type", options=all_instances_for_tier, required=True),
-
-                #"Compute type": st.column_config.SelectboxColumn("Compute type", options= s.COMPUTE_TYPE_LIST, disabled=False),
-                ##"Instance Type": st.column_config.SelectboxColumn("Instance Type", options=list(s.FLAT_INSTANCE_LIST.keys())),
-                "Nodes": st.column_config.NumberColumn("Worker_Nodes"),
-                "Photon": st.column_config.CheckboxColumn("Photon", disabled =tier in ["L0 / Raw", "L1 / Curated"]),
-                "Spot": st.column_config.CheckboxColumn("Spot", disabled =tier in ["L0 / Raw", "L1 / Curated"]),
-                "DBU": st.column_config.NumberColumn("DBU", disabled=True, format="%.2f"),
-                #"EC2": st.column_config.NumberColumn("EC2", disabled=True, format="$%.2f"),
-                "DBX": st.column_config.NumberColumn("DBX", disabled=True, format="$%.2f"),
-                "EC2": st.column_config.NumberColumn("EC2", disabled=True, format="$%.2f"),
-            }
-
-            edited_df = st.data_editor(
-                calculated_df,
-                column_config=column_config,
-                hide_index=True,
-                key=f"data_editor_{tier}",
-                use_container_width=True,
-                num_rows="dynamic" ,   
-                column_order=[
-                    "Job Name", "Job_Number", "Runtime (hrs)", "Runs/Month", "Compute type", 
-                    "Instance Type", "Nodes", "Photon", "Spot","DBU", "DBX", "EC2"])
-
-            # Update session state with the edited DataFrame's editable columns
-            # editable_cols = ["Job Name", "Runtime (hrs)", "Runs/Month", "Compute type", "Instance Type", "Nodes", "Photon", "Spot"]
-            # st.session_state.dbx_jobs[tier] = edited_df[editable_cols]
-            editable_cols = ["Job Name", "Runtime (hrs)", "Runs/Month", "Compute type", "Instance Type", "Nodes", "Photon", "Spot"]
-            if not edited_df[editable_cols].equals(original_jobs_df[editable_cols]):
-                 st.session_state.dbx_jobs[tier] = edited_df[editable_cols]
-                 st.rerun()
-           
-            
-def render_s3_tab(s3_costs_per_zone, total_s3_cost, projected_s3_cost_12_months):
-    """Renders the S3 Storage tab UI with a vertical layout and summary."""
+        if 'sweep_result' not in st.session_state:
+            return
+        tier, result = st.session_state.sweep_result
+        st.markdown(f"**{tier}**: {result.cells:,} configurations, currently ${result.current_cost:,.2f}/month")
+
+        surface_instance = st.selectbox("Surface", ["Cheapest instance"] + list(result.instances), key="sweep_surface_instance")
+        surface = result.surface(None if surface_instance == "Cheapest instance" else surface_instance)
+        fig = go.Figure(data=[go.Heatmap(
+            z=surface.values, x=[f"{m:g}x" for m in surface.columns], y=surface.index,
+            colorscale="Viridis", colorbar=dict(title="$/month"),
+            hovertemplate="Runtime %{x}<br>Worker Nodes %{y}<br>$%{z:,.2f}<extra></extra>"
+        )])
+        fig.update_layout(xaxis=dict(title="Runtime multiplier"), yaxis=dict(title="Worker Nodes"), margin=dict(t=10, b=0, l=0, r=0), height=350)
+        st.plotly_chart(fig, use_container_width=True)
+
+        # Runtime is an assumption rather than a choice, so rank at today's runtime when it was swept
+        at_current_runtime = bool(np.isclose(result.runtime_multipliers, 1.0).any())
+        st.markdown("**Cheapest configurations**" + (" at 1x runtime" if at_current_runtime else ""))
+        st.dataframe(
+            result.cheapest(top=10, runtime_multiplier=1.0 if at_current_runtime else None),
+            column_config={
+                "Monthly Cost": st.column_config.NumberColumn("Monthly Cost", format="$%.2f"),
+                "DBX": st.column_config.NumberColumn("DBX", format="$%.2f"),
+                "EC2": st.column_config.NumberColumn("EC2", format="$%.2f"),
+                "vs Current": st.column_config.NumberColumn("vs Current", format="$%.2f"),
+            },
+            hide_index=True,
+            use_container_width=True,
+        )
+
+@tracing.traced
+def render_s3_tab():
+    """Renders the S3 Storage tab UI with a vertical layout and summary, one fragment per zone."""
     st.header("AWS S3 Storage Costs")
     st.radio("Calculation Method", ["Direct Storage", "Table-Based"], key="s3_calc_method", horizontal=True)
     
@@ -234,52 +446,8 @@ def render_s3_tab(s3_costs_per_zone, total_s3_cost, projected_s3_cost_12_months)
     # The S3_STORAGE_CLASSES list is assumed to be in the state.py file or a data.py file
     S3_STORAGE_CLASSES = list(st.session_state.global_data.get('S3_PRICING', {}).keys())
     if st.session_state.s3_calc_method == "Direct Storage":
-        for zone, config in st.session_state.s3_direct.items():
-            with st.container(border=True):
-                st.subheader(zone)
-
-                # Get costs from session state for display
-                monthly_cost = s3_costs_per_zone.get(zone, 0)
-                quarterly_cost = config.get('quarterly_cost', 0)
-                half_yearly_cost = config.get('half_yearly_cost', 0)
-                
-                # Create a row of metrics for cost projections
-                metric_col1, metric_col2, metric_col3 = st.columns(3)
-                metric_col1.metric("Monthly Cost", f"${monthly_cost:,.2f}")
-                metric_col2.metric("Quarterly Cost", f"${quarterly_cost:,.2f}")
-                metric_col3.metric("Half-Yearly Cost", f"${half_yearly_cost:,.2f}")
-
-                st.divider()
-                
-                # Create a row of columns for user inputs
-                input_col1, input_col2, input_col3, input_col4 = st.columns(4)
-                
-                new_class = input_col1.selectbox(
-                    "Storage Class", 
-                    options=S3_STORAGE_CLASSES, 
-                    key=f"s3_class_{zone}", 
-                    index=S3_STORAGE_CLASSES.index(config["class"]) if config["class"] in S3_STORAGE_CLASSES else 0
-                )
-                new_amount = input_col2.number_input("Storage Amount", min_value=0, key=f"s3_amount_{zone}", value=config["amount"])
-                new_unit = input_col3.selectbox("Unit", ["GB", "TB"], key=f"s3_unit_{zone}", index=["GB", "TB"].index(config["unit"]))
-                new_growth_percent = input_col4.number_input(
-                    "Monthly Growth %", 
-                    min_value=0.0, max_value=100.0, 
-                    value=config.get("monthly_growth_percent", 0.0), 
-                    step=0.1, format="%.1f", 
-                    key=f"s3_growth_{zone}"
-                )
-
-                if (new_class != config["class"] or
-                    new_amount != config["amount"] or
-                    new_unit != config["unit"] or
-                    new_growth_percent != config["monthly_growth_percent"]):
-
-                    st.session_state.s3_direct[zone]["class"] = new_class
-                    st.session_state.s3_direct[zone]["amount"] = new_amount
-                    st.session_state.s3_direct[zone]["unit"] = new_unit
-                    st.session_state.s3_direct[zone]["monthly_growth_percent"] = new_growth_percent
-                    st.rerun()
+        for zone in list(st.session_state.s3_direct):
+            st.fragment(render_s3_zone, key=f"s3_zone_{zone}")(zone, S3_STORAGE_CLASSES)
     # else: # Table-Based
     #     st.markdown("Configure S3 storage based on the number of records and columns per table.")
 
@@ -391,55 +559,195 @@ def render_s3_tab(s3_costs_per_zone, total_s3_cost, projected_s3_cost_12_months)
 
     else: # Table-Based
         st.markdown("Configure S3 storage based on the number of records and columns per table.")
-        for zone_name, zone_config in st.session_state.s3_table_based.items():
-            with st.container(border=True):
-                st.subheader(zone_name)
-                
-                # Use a single, clean approach to get the DataFrame
-                display_df = pd.DataFrame(st.session_state.s3_table_based[zone_name])
-                
-                # Render the data editor
-                edited_df_zone = st.data_editor(
-                    display_df,
-                    column_config={
-                        "Table Name": st.column_config.TextColumn("Table Name", required=True),
-                        "Records": st.column_config.NumberColumn("Records", min_value=0, format="%d"),
-                        "Columns": st.column_config.NumberColumn("Columns", min_value=0, format="%d"),
-                        "Table": st.column_config.NumberColumn("Number of Tables", min_value=0, format="%d"),
-                    },
-                    hide_index=True,
-                    num_rows="dynamic",
-                    key=f"s3_table_editor_{zone_name}",
-                    use_container_width=True
-                )
-                
-                # ✅ KEY CHANGE: This is the ONLY place you should check and trigger a rerun.
-                # Only compare the edited DataFrame with the original session state data.
-                if not edited_df_zone.equals(display_df):
-                    # Sanitize the edited DataFrame before storing it
-                    edited_df_zone["Records"] = pd.to_numeric(edited_df_zone["Records"], errors='coerce').fillna(0).astype(int)
-                    edited_df_zone["Columns"] = pd.to_numeric(edited_df_zone["Columns"], errors='coerce').fillna(0).astype(int)
-                    edited_df_zone["Table"] = pd.to_numeric(edited_df_zone["Table"], errors='coerce').fillna(0).astype(int)
-                    edited_df_zone["Table Name"] = edited_df_zone["Table Name"].fillna('')
-                    
-                    # Filter out empty rows
-                    sanitized_df = edited_df_zone[
-                        (edited_df_zone["Table Name"] != "") |
-                        (edited_df_zone["Records"] != 0) |
-                        (edited_df_zone["Columns"] != 0) |
-                        (edited_df_zone["Table"] != 0)
-                    ].reset_index(drop=True)
-
-                    st.session_state.s3_table_based[zone_name] = sanitized_df.to_dict(orient='records')
-                    st.rerun()
+        render_catalog_import()
+        for zone_name in list(st.session_state.s3_table_based):
+            st.fragment(render_s3_table_zone, key=f"s3_table_zone_{zone_name}")(zone_name)
     st.divider()
 
+    render_s3_totals()
+
+@st.fragment(key=S3_TOTALS)
+@tracing.traced
+def render_s3_totals():
+    result = session_scenario()[0]
     with st.container(border=True):
             st.subheader("Total S3 Storage Cost")
-            st.markdown(f"<h2 style='text-align: center;'>${total_s3_cost:,.2f}/month</h2>", unsafe_allow_html=True)                
+            st.markdown(f"<h2 style='text-align: center;'>${result.s3.total_cost:,.2f}/month</h2>", unsafe_allow_html=True)
+
+@tracing.traced
+def render_s3_zone(zone, S3_STORAGE_CLASSES):
+    """One zone's Direct Storage card, run as the fragment f"s3_zone_{zone}"."""
+    config = st.session_state.s3_direct.get(zone)
+    if config is None:
+        return
+    rerun_keys = (f"s3_zone_{zone}", S3_TOTALS, SUMMARY)
+    with st.container(border=True):
+        st.subheader(zone)
+
+        # Get costs from the priced scenario for display
+        s3_result = session_scenario()[0].s3
+        monthly_cost = s3_result.costs_per_zone.get(zone, 0)
+        quarterly_cost = s3_result.quarterly_cost_per_zone.get(zone, config.get('quarterly_cost', 0))
+        half_yearly_cost = s3_result.half_yearly_cost_per_zone.get(zone, config.get('half_yearly_cost', 0))
+        
+        # Create a row of metrics for cost projections
+        metric_col1, metric_col2, metric_col3 = st.columns(3)
+        metric_col1.metric("Monthly Cost", f"${monthly_cost:,.2f}")
+        metric_col2.metric("Quarterly Cost", f"${quarterly_cost:,.2f}")
+        metric_col3.metric("Half-Yearly Cost", f"${half_yearly_cost:,.2f}")
 
-def render_sql_warehouse_tab(total_sql_cost, total_DBUs):
-    """Renders the SQL Warehouse tab UI with a total cost summary."""
+        st.divider()
+        
+        # Create a row of columns for user inputs
+        input_col1, input_col2, input_col3, input_col4 = st.columns(4)
+        
+        new_class = input_col1.selectbox(
+            "Storage Class", 
+            options=S3_STORAGE_CLASSES, 
+            key=f"s3_class_{zone}", on_change=_rerun_fragments, args=rerun_keys, 
+            index=S3_STORAGE_CLASSES.index(config["class"]) if config["class"] in S3_STORAGE_CLASSES else 0
+        )
+        new_amount = input_col2.number_input("Storage Amount", min_value=0, key=f"s3_amount_{zone}", on_change=_rerun_fragments, args=rerun_keys, value=config["amount"])
+        new_unit = input_col3.selectbox("Unit", ["GB", "TB"], key=f"s3_unit_{zone}", on_change=_rerun_fragments, args=rerun_keys, index=["GB", "TB"].index(config["unit"]))
+        new_growth_percent = input_col4.number_input(
+            "Monthly Growth %", 
+            min_value=0.0, max_value=100.0, 
+            value=config.get("monthly_growth_percent", 0.0), 
+            step=0.1, format="%.1f", 
+            key=f"s3_growth_{zone}",
+            on_change=_rerun_fragments, args=rerun_keys,
+        )
+
+        if (new_class != config["class"] or
+            new_amount != config["amount"] or
+            new_unit != config["unit"] or
+            new_growth_percent != config["monthly_growth_percent"]):
+
+            st.session_state.s3_direct[zone]["class"] = new_class
+            st.session_state.s3_direct[zone]["amount"] = new_amount
+            st.session_state.s3_direct[zone]["unit"] = new_unit
+            st.session_state.s3_direct[zone]["monthly_growth_percent"] = new_growth_percent
+            _rerun_section("s3")
+
+@tracing.traced
+def render_catalog_import():
+    """Sizes the table-based zones from a metastore / information_schema export (see catalog_importer.py)."""
+    with st.expander("📥 Import Catalog"):
+        st.caption(
+            "CSV, Parquet or JSON-lines exports of information_schema.columns with each table's row count "
+            "(num_rows). Columns are sized from their data types; each zone gets one row for its imported tables."
+        )
+        uploaded = st.file_uploader("Catalog export", type=[ext.lstrip('.') for ext in IMPORT_EXTENSIONS], key="catalog_import_file")
+        mapping_text = st.text_area("Column mapping", placeholder="row_estimate = Records", key="catalog_import_mapping")
+        zones = list(st.session_state.s3_table_based)
+        c_col1, c_col2, c_col3 = st.columns(3)
+        zone_column = c_col1.text_input("Zone column", value="Zone", key="catalog_import_zone_column")
+        default_zone = c_col2.selectbox("Default zone", ["(reject)"] + zones, key="catalog_import_default_zone")
+        compression_ratio = c_col3.number_input(
+            "Compression ratio", min_value=1.0, max_value=20.0, value=DEFAULT_COMPRESSION_RATIO, step=0.5,
+            help="Raw size / stored size, about 3-4 for Parquet and Delta.", key="catalog_import_compression",
+        )
+        patterns_text = st.text_area(
+            "Zone by table name", placeholder="bronze => L0 / Raw\nsilver => L1 / Curated",
+            help="Regular expressions on catalog.schema.table, first match wins. Applied to rows without a value in the zone column.",
+            key="catalog_import_patterns",
+        )
+        replace = st.toggle("Replace existing tables in imported zones", key="catalog_import_replace")
+
+        if st.button("Import", disabled=uploaded is None, key="catalog_import_button"):
+            rule = ZoneRule(
+                column=zone_column.strip() or "Zone",
+                patterns=_parse_pairs(patterns_text, "=>"),
+                default=None if default_zone == "(reject)" else default_zone,
+            )
+            try:
+                result = import_catalog(uploaded, zones, rule, _parse_pairs(mapping_text, "="), compression_ratio)
+            except Exception as e:
+                st.error(f"Could not import {uploaded.name}: {e}")
+                return
+            st.session_state.s3_table_based = merge_catalog_rows(st.session_state.s3_table_based, result, replace)
+            # Only the aggregates and the samples are kept, not the catalog
+            st.session_state.catalog_import_result = result
+            st.rerun()
+
+        result = st.session_state.get('catalog_import_result')
+        if result is None:
+            return
+        st.success(f"Sized {result.tables_imported:,} tables from {result.rows_read:,} rows.")
+        st.dataframe(
+            result.zones, hide_index=True, use_container_width=True,
+            column_config={col: st.column_config.NumberColumn(col, format="%.2f") for col in ("Raw GB", "Estimated GB")},
+        )
+        if result.unknown_types:
+            st.caption(f"Sized as strings: {', '.join(result.unknown_types)}")
+        st.caption(f"First {len(result.sample):,} tables")
+        st.dataframe(result.sample, hide_index=True, use_container_width=True)
+        if result.rows_rejected:
+            st.warning(f"{result.rows_rejected:,} rows were rejected.")
+            st.dataframe(result.rejects, hide_index=True, use_container_width=True)
+            st.dataframe(result.reject_sample, hide_index=True, use_container_width=True)
+
+@tracing.traced
+def render_s3_table_zone(zone_name):
+    """One zone's table editor, run as the fragment f"s3_table_zone_{zone_name}"."""
+    if zone_name not in st.session_state.s3_table_based:
+        return
+    rerun_keys = (f"s3_table_zone_{zone_name}", S3_TOTALS, SUMMARY)
+    with st.container(border=True):
+        st.subheader(zone_name)
+        
+        # Use a single, clean approach to get the DataFrame
+        display_df = pd.DataFrame(st.session_state.s3_table_based[zone_name])
+        
+        # Render the data editor
+        edited_df_zone = st.data_editor(
+            display_df,
+            column_config={
+                "Table Name": st.column_config.TextColumn("Table Name", required=True),
+                "Records": st.column_config.NumberColumn("Records", min_value=0, format="%d"),
+                "Columns": st.column_config.NumberColumn("Columns", min_value=0, format="%d"),
+                "Table": st.column_config.NumberColumn("Number of Tables", min_value=0, format="%d"),
+                "Estimated GB": st.column_config.NumberColumn("Estimated GB per Table", disabled=True, format="%.3f"),
+            },
+            hide_index=True,
+            num_rows="dynamic",
+            key=f"s3_table_editor_{zone_name}",
+            use_container_width=True,
+            on_change=_rerun_fragments, args=rerun_keys,
+        )
+        
+        if "Estimated GB" in display_df:
+            st.caption("Estimated GB comes from a catalog import. Editing a row's Records or Columns sizes it from them instead.")
+
+        # ✅ KEY CHANGE: This is the ONLY place you should check and trigger a rerun.
+        # Only compare the edited DataFrame with the original session state data.
+        if not edited_df_zone.equals(display_df):
+            # Sanitize the edited DataFrame before storing it
+            edited_df_zone["Records"] = pd.to_numeric(edited_df_zone["Records"], errors='coerce').fillna(0).astype(int)
+            edited_df_zone["Columns"] = pd.to_numeric(edited_df_zone["Columns"], errors='coerce').fillna(0).astype(int)
+            if "Estimated GB" in edited_df_zone:
+                # An imported size no longer holds once its row's Records or Columns are edited
+                kept = edited_df_zone.index.intersection(display_df.index)
+                before = display_df.loc[kept, ["Records", "Columns"]].apply(pd.to_numeric, errors='coerce').fillna(0).astype(int)
+                resized = kept[(edited_df_zone.loc[kept, ["Records", "Columns"]] != before).any(axis=1).to_numpy()]
+                edited_df_zone.loc[resized, "Estimated GB"] = np.nan
+            edited_df_zone["Table"] = pd.to_numeric(edited_df_zone["Table"], errors='coerce').fillna(0).astype(int)
+            edited_df_zone["Table Name"] = edited_df_zone["Table Name"].fillna('')
+            
+            # Filter out empty rows
+            sanitized_df = edited_df_zone[
+                (edited_df_zone["Table Name"] != "") |
+                (edited_df_zone["Records"] != 0) |
+                (edited_df_zone["Columns"] != 0) |
+                (edited_df_zone["Table"] != 0)
+            ].reset_index(drop=True)
+
+            st.session_state.s3_table_based[zone_name] = sanitized_df.to_dict(orient='records')
+            _rerun_section("s3")
+
+@tracing.traced
+def render_sql_warehouse_tab():
+    """Renders the SQL Warehouse tab UI with a total cost summary, one fragment per warehouse."""
     # Retrieve data consistently from session state
     global_data = st.session_state.get('global_data', {})
     sql_warehouse_types = global_data.get('SQL_WAREHOUSE_TYPES_FROM_DATA', [])
@@ -469,95 +777,114 @@ def render_sql_warehouse_tab(total_sql_cost, total_DBUs):
         st.divider()
         return
 
-    for i, warehouse in enumerate(st.session_state.sql_warehouses):
-        with st.container(border=True):
-            sql_details_col, actions_col = st.columns([4, 1])
-
-            with sql_details_col:
-                st.subheader(warehouse["name"])
-                
-                selected_size_str = warehouse.get("size")
-                if selected_size_str is None:
-                    st.warning("No size selected for this warehouse.")
-                    dbt_per_hr = 0
-                    rate_per_hr = 0
-                else:
-
-                    # Parse DBUs and Rate from the size string
-                    try:
-                        parts = selected_size_str.split(" - ")
-                        dbt_per_hr = float(parts[1].split(" ")[0]) if len(parts) > 1 else 0
-                        rate_per_hr = float(parts[2].split("$")[1].split("/")[0]) if len(parts) > 2 else 0
-                    except (IndexError, ValueError):
-                        dbt_per_hr = 0
-                        rate_per_hr = 0
-
-                st.caption(f"{dbt_per_hr} DBUs • ${rate_per_hr}/hr • {warehouse['hours_per_day']}h/day • {warehouse['days_per_month']} days/month")
-            
-            with actions_col:
-                if st.button("🗑️ Delete", key=f"delete_sql_warehouse_{i}"):
-                    st.session_state.sql_warehouses.pop(i)
-                    st.rerun()
-            
-            st.markdown("---")
-
-            c1, c2, c3, c4, c5, c6 = st.columns(6)
+    for i in range(len(st.session_state.sql_warehouses)):
+        st.fragment(render_sql_warehouse_card, key=f"sql_warehouse_{i}")(i)
 
-            with c1:
-                new_name = st.text_input("Name", value=warehouse.get("name", "New Warehouse"), key=f"sql_name_{i}")
-            
-            with c2:
-                current_type = warehouse.get("type")
-                type_index = sql_warehouse_types.index(current_type) if current_type in sql_warehouse_types else 0
-                new_type = st.selectbox("Compute Type", sql_warehouse_types, index=type_index, key=f"sql_type_{i}")
-
-            with c3:
-                available_sizes = list(sql_warehouse_sizes_by_type.get(new_type, {}).keys())
-                current_size = warehouse.get("size")
-                
-                size_index = available_sizes.index(current_size) if current_size in available_sizes else 0
-                
-                new_size = st.selectbox("Instance", available_sizes, index=size_index, key=f"sql_size_{i}")
-            
-            with c4:
-                new_nodes = st.number_input("Nodes", min_value=0, max_value=24, value=warehouse.get('SQL_nodes', 1), key=f"sql_nodes_{i}")
-            with c5:
-                new_hours_per_day = st.number_input("Hours/Day", min_value=0.0, max_value=24.0, value=float(warehouse.get('hours_per_day', 0.0)), step=0.5, format="%.1f", key=f"sql_hours_{i}")
-            with c6:    
-                new_days_per_month = st.number_input("Days/Month", min_value=0, max_value=31, value=warehouse.get("days_per_month", 0), key=f"sql_days_{i}")
-            
-            if (new_name != warehouse.get("name") or 
-                new_type != warehouse.get("type") or
-                new_size != warehouse.get("size") or
-                new_nodes != warehouse.get("SQL_nodes") or
-                new_hours_per_day != warehouse.get("hours_per_day") or
-                new_days_per_month != warehouse.get("days_per_month")):
-                
-                # Update session state with the new values
-                warehouse["name"] = new_name
-                warehouse["type"] = new_type
-                warehouse["size"] = new_size
-                warehouse["SQL_nodes"] = new_nodes
-                warehouse["hours_per_day"] = new_hours_per_day
-                warehouse["days_per_month"] = new_days_per_month
-                
-                st.rerun()
+    render_sql_totals()
 
+@st.fragment(key=SQL_TOTALS)
+@tracing.traced
+def render_sql_totals():
+    result = session_scenario()[0]
     with st.container(border=True):
         c1, c2 = st.columns(2)
         with c1:
             st.markdown("<h3 style='text-align: center;'>Total SQL Warehouse Cost</h3>", unsafe_allow_html=True)
             warehouse_count = len(st.session_state.sql_warehouses)
-            st.markdown(f"<h2 style='text-align: center;'>${total_sql_cost:,.2f}/month</h2>", unsafe_allow_html=True)
+            st.markdown(f"<h2 style='text-align: center;'>${result.sql.total_cost:,.2f}/month</h2>", unsafe_allow_html=True)
             st.caption(f"{warehouse_count} warehouse(s) configured")
         with c2:
             st.markdown("<h3 style='text-align: center;'>Total DBUs</h3>", unsafe_allow_html=True)
             #warehouse_count = len(st.session_state.sql_warehouses)
-            st.markdown(f"<h2 style='text-align: center;'>{total_DBUs:,.2f}</h2>", unsafe_allow_html=True)
-            #st.caption(f"{warehouse_count} warehouse(s) configured")   
+            st.markdown(f"<h2 style='text-align: center;'>{result.sql.total_dbus:,.2f}</h2>", unsafe_allow_html=True)
+            #st.caption(f"{warehouse_count} warehouse(s) configured")
+
+@tracing.traced
+def render_sql_warehouse_card(i):
+    """One warehouse's card, run as the fragment f"sql_warehouse_{i}"."""
+    if i >= len(st.session_state.sql_warehouses):
+        return
+    warehouse = st.session_state.sql_warehouses[i]
+    rerun_keys = (f"sql_warehouse_{i}", SQL_TOTALS, SUMMARY)
+    global_data = st.session_state.get('global_data', {})
+    sql_warehouse_types = global_data.get('SQL_WAREHOUSE_TYPES_FROM_DATA', [])
+    sql_warehouse_sizes_by_type = global_data.get('SQL_WAREHOUSE_SIZES_BY_TYPE', {})
+
+    with st.container(border=True):
+        sql_details_col, actions_col = st.columns([4, 1])
 
+        with sql_details_col:
+            st.subheader(warehouse["name"])
+            
+            # DBUs and rate from the priced warehouse table (see engine.price_sql_warehouses)
+            priced = session_scenario()[0].sql.warehouses
+            if warehouse.get("size") is None:
+                st.warning("No size selected for this warehouse.")
+                dbt_per_hr = 0
+                rate_per_hr = 0
+            elif i < len(priced):
+                dbt_per_hr = priced["DBUs per Hour"].iat[i]
+                rate_per_hr = priced["Hourly Rate ($)"].iat[i]
+            else:
+                dbt_per_hr = 0
+                rate_per_hr = 0
+
+            st.caption(f"{dbt_per_hr} DBUs • ${rate_per_hr}/hr • {warehouse['hours_per_day']}h/day • {warehouse['days_per_month']} days/month")
+        
+        with actions_col:
+            if st.button("🗑️ Delete", key=f"delete_sql_warehouse_{i}"):
+                st.session_state.sql_warehouses.pop(i)
+                # The cards after this one move up an index, so the whole tab reruns
+                st.rerun()
+        
+        st.markdown("---")
+
+        c1, c2, c3, c4, c5, c6 = st.columns(6)
+
+        with c1:
+            new_name = st.text_input("Name", value=warehouse.get("name", "New Warehouse"), key=f"sql_name_{i}", on_change=_rerun_fragments, args=rerun_keys)
+        
+        with c2:
+            current_type = warehouse.get("type")
+            type_index = sql_warehouse_types.index(current_type) if current_type in sql_warehouse_types else 0
+            new_type = st.selectbox("Compute Type", sql_warehouse_types, index=type_index, key=f"sql_type_{i}", on_change=_rerun_fragments, args=rerun_keys)
+
+        with c3:
+            available_sizes = list(sql_warehouse_sizes_by_type.get(new_type, {}).keys())
+            current_size = warehouse.get("size")
+            
+            size_index = available_sizes.index(current_size) if current_size in available_sizes else 0
+            
+            new_size = st.selectbox("Instance", available_sizes, index=size_index, key=f"sql_size_{i}", on_change=_rerun_fragments, args=rerun_keys)
+        
+        with c4:
+            new_nodes = st.number_input("Nodes", min_value=0, max_value=24, value=warehouse.get('SQL_nodes', 1), key=f"sql_nodes_{i}", on_change=_rerun_fragments, args=rerun_keys)
+        with c5:
+            new_hours_per_day = st.number_input("Hours/Day", min_value=0.0, max_value=24.0, value=float(warehouse.get('hours_per_day', 0.0)), step=0.5, format="%.1f", key=f"sql_hours_{i}", on_change=_rerun_fragments, args=rerun_keys)
+        with c6:    
+            new_days_per_month = st.number_input("Days/Month", min_value=0, max_value=31, value=warehouse.get("days_per_month", 0), key=f"sql_days_{i}", on_change=_rerun_fragments, args=rerun_keys)
+        
+        if (new_name != warehouse.get("name") or 
+            new_type != warehouse.get("type") or
+            new_size != warehouse.get("size") or
+            new_nodes != warehouse.get("SQL_nodes") or
+            new_hours_per_day != warehouse.get("hours_per_day") or
+            new_days_per_month != warehouse.get("days_per_month")):
+            
+            # Update session state with the new values
+            warehouse["name"] = new_name
+            warehouse["type"] = new_type
+            warehouse["size"] = new_size
+            warehouse["SQL_nodes"] = new_nodes
+            warehouse["hours_per_day"] = new_hours_per_day
+            warehouse["days_per_month"] = new_days_per_month
+            
+            _rerun_section("sql_warehouses")
+
+@st.fragment(key=DEV_COSTS)
+@tracing.traced
 def render_devepoment_tools():
-        """Renders the UI for the Development Cost tab."""
+        """Renders the UI for the Development Cost tab. A fragment: an edit reruns this tab and the summary."""
         st.header("Development & All-Purpose Compute")
         
         # Retrieve data and define columns
@@ -574,11 +901,10 @@ def render_devepoment_tools():
             "DBX": st.column_config.NumberColumn("DBX", disabled=True, format="$%.2f"),
         }
         
-        # Create a local copy to perform calculations
-        dev_df = st.session_state.dev_costs.copy()
-        
-        # The calculation is now in calculations.py
-        
+        # The editor shows the priced clusters, the session keeps only their inputs
+        dev_df = session_scenario()[0].dev.df
+        original_inputs = st.session_state.dev_costs.drop(columns=DEV_DERIVED_COLUMNS, errors='ignore')
+
         # Display the data editor
         edited_df = st.data_editor(
             dev_df,
@@ -586,14 +912,65 @@ def render_devepoment_tools():
             hide_index=True,
             num_rows="dynamic",
             use_container_width=True,
-            key="dev_cost_editor"
+            key="dev_cost_editor",
+            on_change=_rerun_fragments, args=(DEV_COSTS, SUMMARY)
         )
 
-        # Update session state if the edited DataFrame is different
-        if not edited_df.equals(st.session_state.dev_costs):
-            st.session_state.dev_costs = edited_df
-            st.rerun()
+        # Update session state if the edited inputs are different (DBX is calculated, not compared)
+        edited_inputs = edited_df.drop(columns=DEV_DERIVED_COLUMNS, errors='ignore')
+        if not edited_inputs.equals(original_inputs):
+            st.session_state.dev_costs = edited_inputs
+            _rerun_section("dev_costs")
            
+@tracing.traced
+def render_projection_tab(projection):
+    """Renders the N-month projection of every cost component (see projection.py)."""
+    st.header("Cost Projection")
+
+    horizon_col, dbx_col, s3_col, sql_col = st.columns(4)
+    horizon_col.number_input("Months", min_value=1, max_value=MAX_MONTHS, step=1, key="projection_months")
+    dbx_col.number_input("Databricks Growth %/month", min_value=0.0, max_value=100.0, step=0.1, format="%.1f", key="monthly_growth_percent")
+    s3_col.number_input(
+        "S3 Growth %/month", min_value=0.0, max_value=100.0, step=0.1, format="%.1f", key="s3_growth_percent",
+        disabled=st.session_state.s3_calc_method == "Direct Storage",
+        help="Direct Storage zones use the growth set per zone in the S3 Storage tab."
+    )
+    sql_col.number_input("SQL Growth %/month", min_value=0.0, max_value=100.0, step=0.1, format="%.1f", key="sql_growth_percent")
+
+    by_component = projection.by_component()
+    cumulative_total = projection.total(cumulative=True)
+
+    with st.container(border=True):
+        col1, col2, col3 = st.columns(3)
+        col1.metric("First Month", f"${projection.total().iloc[0]:,.2f}")
+        col2.metric(f"Month {projection.months}", f"${projection.total().iloc[-1]:,.2f}")
+        col3.metric(f"{projection.months}-Month Total", f"${cumulative_total.iloc[-1]:,.2f}")
+
+    fig = go.Figure()
+    colors = {DATABRICKS: '#FF8C00', S3: '#3CB371', SQL: '#1E90FF', DEVELOPMENT: '#9370DB'}
+    for component, series in by_component.iterrows():
+        fig.add_trace(go.Bar(x=series.index, y=series.values, name=component, marker_color=colors.get(component)))
+    fig.add_trace(go.Scatter(
+        x=cumulative_total.index, y=cumulative_total.values, name="Cumulative", yaxis="y2",
+        mode="lines", line=dict(color="#888888")
+    ))
+    fig.update_layout(
+        barmode="stack",
+        xaxis=dict(title="Month"),
+        yaxis=dict(title="Monthly Cost ($)"),
+        yaxis2=dict(title="Cumulative Cost ($)", overlaying="y", side="right", showgrid=False),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
+        margin=dict(t=30, b=0, l=0, r=0),
+        height=380
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+    with st.expander("Monthly breakdown"):
+        table = projection.monthly.copy()
+        table.columns = [f"Month {m}" for m in table.columns]
+        st.dataframe(table, use_container_width=True)
+
+@tracing.traced
 def render_configuration_guide():
     """Renders the configuration guide expander at the bottom of a tab."""
     with st.expander("ℹ️ Configuration Guide", expanded=True):
@@ -613,26 +990,96 @@ def render_configuration_guide():
             **Instance Families** Choose instance types based on workload: General Purpose (`m5`), Compute Optimized (`c5`), Memory Optimized (`r5`/`r5d`).
             """)
 
-def render_export_button(calculated_dbx_data, s3_calc_method, s3_direct_config, s3_table_based_config, sql_warehouses_config):
+@tracing.traced
+def render_export_button(calculated_dbx_data, s3_calc_method, s3_direct_config, s3_table_based_config, sql_warehouses_config, projection=None):
     """
-    Renders the Excel export button. This function is called from main.py.
-    It orchestrates the data collection from session state and passes it
-    to the excel_exporter for file generation.
+    Renders the export button. This function is called from main.py.
+    The file is only generated when the download is requested, streamed tier by tier
+    (xlsx, or zipped CSV/Parquet for very large inventories), and cached by the
+    scenario's content hash so an unchanged scenario is built once.
     """
-    # Generate Excel file content
-    excel_file_bytes = generate_consolidated_excel_export(
-        calculated_dbx_data,
+    if 'export_cache' not in st.session_state:
+        st.session_state.export_cache = OrderedDict()
+    export_cache = st.session_state.export_cache
+    global_data = st.session_state.get('global_data', {})
+
+    # The download callback reads the inputs at download time; render_summary updates them
+    # after an edit in a section fragment, as the button itself is not rerun then
+    export_inputs = _export_inputs(calculated_dbx_data, s3_calc_method, s3_direct_config, s3_table_based_config, sql_warehouses_config, projection)
+    st.session_state.export_inputs = export_inputs
+
+    with st.popover("📊 Export"):
+        format_labels = {"Excel (.xlsx)": 'xlsx', "CSV (.zip)": 'csv', "Parquet (.zip)": 'parquet'}
+        export_format = format_labels[st.radio("Format", list(format_labels), key="export_format")]
+        file_name, mime = EXPORT_FORMATS[export_format]
+
+        trace_export = tracing.active()
+        trace_session = st.session_state.get('trace_session_id')
+
+        def build_export_file():
+            # Runs on the download thread after the rerun, so it is traced as its own record
+            trace = tracing.start_rerun(trace_export, trace_session, 'export')
+            try:
+                with tracing.span('export'):
+                    return get_cached_export(
+                        export_cache, export_inputs['fingerprint'], export_format, *export_inputs['args'],
+                        global_data=global_data, projection=export_inputs['projection'],
+                    )
+            finally:
+                tracing.finish_rerun(trace)
+
+        # Export Button (visible)
+        st.download_button(
+            label="Download",
+            data=build_export_file,
+            file_name=file_name,
+            mime=mime,
+            key="export_consolidated_excel_button"
+        )
+
+def _export_inputs(calculated_dbx_data, s3_calc_method, s3_direct_config, s3_table_based_config, sql_warehouses_config, projection=None):
+    # Snapshot the inputs, the download callback runs on another thread after this rerun
+    export_args = (
+        dict(calculated_dbx_data),
         s3_calc_method,
-        s3_direct_config,
-        s3_table_based_config,
-        sql_warehouses_config
+        copy.deepcopy(s3_direct_config),
+        copy.deepcopy(s3_table_based_config),
+        copy.deepcopy(sql_warehouses_config),
     )
+    global_data = st.session_state.get('global_data', {})
+    fingerprint = scenario_fingerprint(*export_args, rate_card_version=global_data.get('RATE_CARD_VERSION'), projection=projection)
+    return {'args': export_args, 'fingerprint': fingerprint, 'projection': projection}
 
-    # Export Button (visible)
-    st.download_button(
-        label="📊 Export Excel",
-        data=excel_file_bytes,
-        file_name="cloud_cost_report.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        key="export_consolidated_excel_button"
-    )
+def render_developer_panel(trace_history, graph_stats=None):
+    """
+    Developer panel (tracing enabled only): span timings of the last reruns, the cost nodes
+    recomputed by this rerun (dependency_graph.py) and the session's memory.
+    """
+    with st.expander("🛠️ Developer: rerun timings"):
+        if graph_stats:
+            st.caption(
+                f"Cost nodes this rerun: {graph_stats['recomputed']} recomputed, {graph_stats['reused']} reused"
+                f" ({graph_stats['recomputed_total']} / {graph_stats['reused_total']} this session)"
+                + (f": {', '.join(graph_stats['recomputed_nodes'])}" if graph_stats['recomputed_nodes'] else "")
+            )
+        if not trace_history:
+            st.caption("No traced reruns yet.")
+            return
+        records = list(trace_history)
+        st.caption(f"Last {len(records)} reruns, milliseconds per span (nested spans are included in their parent). Log: {tracing.LOG_PATH}")
+        st.dataframe(tracing.breakdown(records).style.format("{:,.1f}"), use_container_width=True)
+
+        latest = records[-1]
+        top_level = [item for item in latest['spans'] if item['depth'] == 0]
+        fig = go.Figure(data=[go.Bar(
+            x=[item['ms'] for item in top_level], y=[item['name'] for item in top_level], orientation='h',
+            hovertemplate="%{y}: %{x:,.1f} ms<extra></extra>"
+        )])
+        fig.update_layout(xaxis=dict(title="ms"), yaxis=dict(autorange="reversed"), margin=dict(t=10, b=0, l=0, r=0), height=300)
+        st.plotly_chart(fig, use_container_width=True)
+
+        # Walking the whole session is slow, so only on request
+        if st.toggle("Session memory", key="developer_memory_report"):
+            from memory_report import session_footprint
+            footprint = session_footprint(st.session_state, st.session_state.get('global_data'))
+            st.dataframe(footprint, hide_index=True, use_container_width=True)
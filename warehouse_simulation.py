@@ -0,0 +1,363 @@
+# warehouse_simulation.py
+# Replays a query history against the scenario's SQL warehouses: per-minute concurrency drives
+# autoscaling between min and max clusters, and idle warehouses suspend after their timeout.
+# All warehouses are simulated at once on a (warehouses x minutes) grid with array operations.
+# The billed cluster hours give DBUs and cost, next to the static hours x days x nodes estimate.
+#
+# The history is either one row per query (warehouse, start time, end time or duration), e.g.
+# a system.query.history export, or a concurrency profile (warehouse, time, concurrency) at
+# minute or hourly resolution. CSV, Parquet or JSON lines, streamed in chunks.
+#
+#   python warehouse_simulation.py scenario.json --history query_history.csv -o simulated.csv
+import argparse
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # pyarrow is optional, without it timestamps are parsed by pandas
+    pa = None
+
+import engine
+import rate_card as rc
+from batch_pricing import load_scenario_file
+from job_importer import read_chunks, read_columns
+
+CHUNK_ROWS = 250_000
+# Concurrent queries one cluster runs before the warehouse scales out
+DEFAULT_QUERIES_PER_CLUSTER = 10
+# Minutes an upscaled cluster is kept after the load drops
+DEFAULT_SCALE_DOWN_AFTER = 15
+# Auto-suspend timeout (minutes) of configs without one
+DEFAULT_SUSPEND_AFTER = 10
+# Longest history simulated; the grid holds one cell per warehouse and minute
+MAX_PROFILE_DAYS = 92
+# Shorter histories are still scaled to a month, but flagged as too short to represent one
+MIN_PROFILE_DAYS = 1
+DAYS_PER_MONTH = 365.25 / 12
+_MINUTE_US = 60_000_000
+_EPOCH = pd.Timestamp(0, tz='UTC')
+
+# Accepted column names per field, in priority order
+HISTORY_FIELDS = {
+    'warehouse': ['warehouse_name', 'warehouse', 'warehouse_id', 'compute.warehouse_id', 'endpoint_id'],
+    'start': ['start_time', 'query_start_time', 'execution_start_time'],
+    'end': ['end_time', 'query_end_time'],
+    'duration_ms': ['total_duration_ms', 'duration_ms', 'execution_duration_ms'],
+    'time': ['timestamp', 'time', 'minute', 'hour', 'period_start'],
+    'concurrency': ['concurrency', 'running_queries', 'concurrent_queries'],
+}
+
+SIMULATION_COLUMNS = [
+    "Name", "Type", "Size", "Min Clusters", "Max Clusters", "Auto Suspend", "Suspend After (min)",
+    "Peak Concurrency", "Busy Hours", "Running Hours", "Cluster Hours", "DBUs", "Cost",
+    "Monthly Cost", "Estimated Monthly Cost", "Difference", "Profile Days",
+]
+
+
+@dataclass(frozen=True)
+class ConcurrencyProfile:
+    """Running queries per warehouse (rows, config order) and minute (columns, from `start`)."""
+    concurrency: np.ndarray
+    warehouses: tuple       # config positions of the rows
+    start: pd.Timestamp
+    unmatched: tuple        # history warehouses not in the scenario
+    rows_read: int
+
+    @property
+    def days(self):
+        return self.concurrency.shape[1] / (24 * 60)
+
+
+@dataclass(frozen=True)
+class WarehouseSimulationResult:
+    warehouses: pd.DataFrame    # SIMULATION_COLUMNS, one row per simulated warehouse
+    unmatched: tuple
+    profile_days: float
+    rows_read: int
+    elapsed_seconds: float
+
+
+def _present(columns, fields):
+    """{field: first present source column}."""
+    return {field: next(alias for alias in aliases if alias in columns)
+            for field, aliases in fields.items() if any(alias in columns for alias in aliases)}
+
+
+def _parse_times(values):
+    """
+    UTC microseconds since the epoch of datetime strings (int64) and a validity mask.
+    ISO 8601 text (with or without an offset, naive times are UTC) goes through pyarrow's
+    parser, anything else through pandas.
+    """
+    text = None
+    if pa is not None and pd.api.types.is_string_dtype(values):
+        try:
+            text = pa.array(values, type=pa.string(), from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+    if text is not None:
+        for target in (pa.timestamp('us', tz='UTC'), pa.timestamp('us')):
+            try:
+                times = pc.cast(text, target)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                continue
+            valid = times.is_valid().to_numpy(zero_copy_only=False)
+            micros = times.cast(pa.int64()).fill_null(0).to_numpy()
+            return micros, valid
+    times = pd.to_datetime(values, utc=True, errors='coerce')
+    valid = times.notna().to_numpy()
+    micros = ((times - _EPOCH).fillna(pd.Timedelta(0)) // pd.Timedelta(microseconds=1)).to_numpy(dtype='int64')
+    return micros, valid
+
+
+def _minutes(micros, ceil=False):
+    """Whole minutes since the epoch, rounded down (or up) from microseconds."""
+    return -(-micros // _MINUTE_US) if ceil else micros // _MINUTE_US
+
+
+def _warehouse_positions(keys, warehouses):
+    """Config positions of history warehouse keys, matched on id then name (case-insensitive); -1 when unknown."""
+    lookup = {}
+    for position, warehouse in reversed(list(enumerate(warehouses))):
+        for field in ('name', 'id'):
+            value = warehouse.get(field)
+            if value is not None:
+                lookup[str(value).strip().casefold()] = position
+    codes, uniques = pd.factorize(keys)
+    found = np.array([lookup.get(str(key).strip().casefold(), -1) for key in uniques], dtype='int64')
+    return np.where(codes >= 0, found[np.where(codes >= 0, codes, 0)], -1)
+
+
+def _hold(values, minutes):
+    """Running max over the current and the previous `minutes` columns (doubling the window per step)."""
+    values = values.copy()
+    span = 1
+    while span <= minutes:
+        step = min(span, minutes + 1 - span)
+        np.maximum(values[:, step:], values[:, :-step].copy(), out=values[:, step:])
+        span += step
+    return values
+
+
+def load_profile(paths, warehouses, chunk_rows=CHUNK_ROWS):
+    """
+    Streams query-history files into a ConcurrencyProfile for the scenario's `warehouses`
+    (configs as in st.session_state.sql_warehouses). A query counts in every minute it
+    overlaps; a profile sample holds for the profile's step (the smallest gap between samples).
+    The files must all be query-level or all be concurrency profiles. The grid ends with the
+    longest auto-suspend timeout, so the idle minutes after the last query are billed.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    layouts = []
+    for path in paths:
+        present = _present(read_columns(path), HISTORY_FIELDS)
+        is_profile = 'concurrency' in present and 'time' in present
+        if 'warehouse' not in present or not (is_profile or ('start' in present and ({'end', 'duration_ms'} & set(present)))):
+            raise ValueError(
+                f"{path}: expected a warehouse column and either start/end (or duration) times "
+                f"or time/concurrency columns, see HISTORY_FIELDS"
+            )
+        layouts.append((path, present, is_profile))
+    if len({is_profile for _, _, is_profile in layouts}) > 1:
+        profiles = [path for path, _, is_profile in layouts if is_profile]
+        raise ValueError(
+            f"The history mixes query-level files with concurrency profiles ({', '.join(map(str, profiles))}), "
+            f"simulate them separately"
+        )
+
+    queries, samples = [], []
+    unmatched = set()
+    rows_read = 0
+    for path, present, is_profile in layouts:
+        for chunk in read_chunks(path, chunk_rows=chunk_rows, columns=list(present.values())):
+            rows_read += len(chunk)
+            positions = _warehouse_positions(chunk[present['warehouse']], warehouses)
+            unmatched.update(chunk[present['warehouse']][positions < 0].astype(str).unique())
+            if is_profile:
+                micros, valid = _parse_times(chunk[present['time']])
+                minute = _minutes(micros)
+                value = pd.to_numeric(chunk[present['concurrency']], errors='coerce').fillna(0).to_numpy()
+                keep = valid & (positions >= 0)
+                samples.append((positions[keep], minute[keep], value[keep]))
+                continue
+            start_micros, valid = _parse_times(chunk[present['start']])
+            if 'end' in present:
+                end_micros, end_valid = _parse_times(chunk[present['end']])
+            else:
+                duration = pd.to_numeric(chunk[present['duration_ms']], errors='coerce').to_numpy(dtype=float)
+                end_valid = ~np.isnan(duration)
+                end_micros = start_micros + np.where(end_valid, duration * 1000, 0).astype('int64')
+            start, end = _minutes(start_micros), _minutes(end_micros, ceil=True)
+            keep = valid & end_valid & (positions >= 0)
+            # Queries within one minute still occupy that minute
+            queries.append((positions[keep], start[keep], np.maximum(end[keep], start[keep] + 1)))
+
+    parts = queries or samples
+    rows = np.concatenate([p[0] for p in parts]) if parts else np.empty(0, dtype='int64')
+    if len(rows) == 0:
+        return ConcurrencyProfile(np.zeros((0, 0), dtype='int32'), (), None, tuple(sorted(unmatched)), rows_read)
+
+    simulated = np.unique(rows)
+    grid_rows = np.searchsorted(simulated, rows)
+    if queries:
+        starts = np.concatenate([p[1] for p in queries])
+        ends = np.concatenate([p[2] for p in queries])
+        origin, length = starts.min(), ends.max() - starts.min()
+    else:
+        minutes = np.concatenate([p[1] for p in samples])
+        values = np.concatenate([p[2] for p in samples])
+        distinct = np.unique(minutes)
+        step = int(np.diff(distinct).min()) if len(distinct) > 1 else 60
+        origin, length = distinct[0], distinct[-1] + step - distinct[0]
+
+    # Warehouses stay up for their suspend timeout after the last query, the grid covers that tail
+    configs = [warehouses[p] for p in simulated]
+    auto_suspend = _config_array(configs, 'auto_suspend', lambda w: True).astype(bool)
+    suspend_after = _config_array(configs, 'suspend_after', lambda w: DEFAULT_SUSPEND_AFTER).astype(int)
+    length += int(suspend_after[auto_suspend].max()) if auto_suspend.any() else 0
+    if length > MAX_PROFILE_DAYS * 24 * 60:
+        raise ValueError(f"The history covers {length / (24 * 60):,.0f} days, at most {MAX_PROFILE_DAYS} are simulated")
+
+    if queries:
+        # +1 at each query's first minute, -1 after its last, summed along time
+        width = length + 1
+        cells = len(simulated) * width
+        delta = (np.bincount(grid_rows * width + (starts - origin), minlength=cells)
+                 - np.bincount(grid_rows * width + (ends - origin), minlength=cells))
+        concurrency = np.cumsum(delta.reshape(len(simulated), width)[:, :-1], axis=1, dtype='int32')
+    else:
+        concurrency = np.zeros((len(simulated), length), dtype='int32')
+        np.maximum.at(concurrency, (grid_rows, minutes - origin), np.ceil(values).astype('int32'))
+        concurrency = _hold(concurrency, step - 1)
+
+    return ConcurrencyProfile(
+        concurrency=concurrency,
+        warehouses=tuple(simulated.tolist()),
+        start=_EPOCH + pd.Timedelta(minutes=int(origin)),
+        unmatched=tuple(sorted(unmatched)),
+        rows_read=rows_read,
+    )
+
+
+def _config_array(warehouses, field, default):
+    values = [w.get(field) for w in warehouses]
+    return np.array([default(w) if v is None else v for v, w in zip(values, warehouses)])
+
+
+def simulate_warehouses(profile, sql_warehouses, rate_card,
+                        queries_per_cluster=DEFAULT_QUERIES_PER_CLUSTER, scale_down_after=DEFAULT_SCALE_DOWN_AFTER):
+    """
+    Billed hours and cost of the profiled warehouses. Each minute a warehouse runs
+    ceil(concurrency / queries_per_cluster) clusters within [min_clusters, max_clusters]
+    (defaults 1 and SQL_nodes), keeping upscaled clusters for `scale_down_after` minutes.
+    With auto_suspend it starts on the first query and stops `suspend_after` idle minutes
+    after the last one; without it, it runs for the whole profile. Returns a DataFrame
+    with SIMULATION_COLUMNS, the monthly figures scaled from the profile's length ("Profile Days").
+    """
+    sql_warehouses = list(sql_warehouses)
+    priced = engine.price_sql_warehouses(sql_warehouses, rate_card).warehouses
+    positions = list(profile.warehouses)
+    if not positions:
+        return pd.DataFrame(columns=SIMULATION_COLUMNS)
+    configs = [sql_warehouses[p] for p in positions]
+    table = priced.iloc[positions].reset_index(drop=True)
+
+    max_clusters = np.maximum(_config_array(configs, 'max_clusters', lambda w: w.get('SQL_nodes') or 1).astype(int), 1)
+    min_clusters = np.clip(_config_array(configs, 'min_clusters', lambda w: 1).astype(int), 0, max_clusters)
+    auto_suspend = _config_array(configs, 'auto_suspend', lambda w: True).astype(bool)
+    suspend_after = _config_array(configs, 'suspend_after', lambda w: DEFAULT_SUSPEND_AFTER).astype(int)
+
+    concurrency = profile.concurrency
+    busy = concurrency > 0
+    clusters = np.clip(-(-concurrency // queries_per_cluster), min_clusters[:, None], max_clusters[:, None])
+    if scale_down_after > 0:
+        clusters = _hold(clusters, scale_down_after)
+
+    minute = np.arange(concurrency.shape[1])
+    last_busy = np.maximum.accumulate(np.where(busy, minute, -1), axis=1)
+    running = (last_busy >= 0) & (minute - last_busy <= suspend_after[:, None])
+    running |= ~auto_suspend[:, None]
+    cluster_hours = np.where(running, clusters, 0).sum(axis=1) / 60
+
+    dbus = table["DBUs per Hour"].to_numpy() * cluster_hours
+    cost = table["Hourly Rate ($)"].to_numpy() * cluster_hours
+    monthly_cost = cost / profile.days * DAYS_PER_MONTH if profile.days else cost
+    estimated = table["Monthly Cost ($)"].to_numpy()
+    return pd.DataFrame({
+        "Name": table["name"],
+        "Type": table["type"],
+        "Size": table["Instance"],
+        "Min Clusters": min_clusters,
+        "Max Clusters": max_clusters,
+        "Auto Suspend": auto_suspend,
+        "Suspend After (min)": suspend_after,
+        "Peak Concurrency": concurrency.max(axis=1),
+        "Busy Hours": busy.sum(axis=1) / 60,
+        "Running Hours": running.sum(axis=1) / 60,
+        "Cluster Hours": cluster_hours,
+        "DBUs": dbus,
+        "Cost": cost,
+        "Monthly Cost": monthly_cost,
+        "Estimated Monthly Cost": estimated,
+        "Difference": monthly_cost - estimated,
+        "Profile Days": profile.days,
+    }, columns=SIMULATION_COLUMNS)
+
+
+def simulate_files(sql_warehouses, rate_card, paths, queries_per_cluster=DEFAULT_QUERIES_PER_CLUSTER,
+                   scale_down_after=DEFAULT_SCALE_DOWN_AFTER, chunk_rows=CHUNK_ROWS):
+    """Streams the query history and simulates the warehouses it covers."""
+    start = time.perf_counter()
+    sql_warehouses = list(sql_warehouses)
+    profile = load_profile(paths, sql_warehouses, chunk_rows)
+    warehouses = simulate_warehouses(profile, sql_warehouses, rate_card, queries_per_cluster, scale_down_after)
+    return WarehouseSimulationResult(
+        warehouses=warehouses,
+        unmatched=profile.unmatched,
+        profile_days=profile.days,
+        rows_read=profile.rows_read,
+        elapsed_seconds=time.perf_counter() - start,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate SQL warehouse autoscaling and auto-suspend from a query history.")
+    parser.add_argument('scenario', help="Scenario file (JSON or YAML) with sql_warehouses, as for batch_pricing.py.")
+    parser.add_argument('--history', nargs='+', required=True, help="Query history or concurrency profile files.")
+    parser.add_argument('--queries-per-cluster', type=int, default=DEFAULT_QUERIES_PER_CLUSTER, help="Concurrent queries per cluster.")
+    parser.add_argument('--scale-down-after', type=int, default=DEFAULT_SCALE_DOWN_AFTER, help="Minutes upscaled clusters are kept.")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help="Rows read per chunk.")
+    parser.add_argument('-o', '--output', help="Per-warehouse results file, .csv or .parquet.")
+    args = parser.parse_args(argv)
+
+    scenario = load_scenario_file(args.scenario)
+    result = simulate_files(
+        scenario.sql_warehouses, rc.load_rate_card(), args.history,
+        args.queries_per_cluster, args.scale_down_after, args.chunk_rows,
+    )
+
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.float_format', '{:,.2f}'.format):
+        print(result.warehouses)
+    if result.unmatched:
+        print(f"Not in the scenario: {', '.join(result.unmatched[:20])}" + (" ..." if len(result.unmatched) > 20 else ""))
+    if result.profile_days < MIN_PROFILE_DAYS:
+        print(f"The history covers only {result.profile_days * 24:,.1f} hours: Monthly Cost and Difference "
+              f"extrapolate it to a month and may not be representative.")
+    print(f"{result.rows_read:,} history rows, {result.profile_days:,.1f} days, in {result.elapsed_seconds:.2f}s")
+    if args.output:
+        if args.output.endswith('.parquet'):
+            result.warehouses.to_parquet(args.output, index=False)
+        else:
+            result.warehouses.to_csv(args.output, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())